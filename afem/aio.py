@@ -0,0 +1,252 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018  Laughlin Research, LLC (info@laughlinresearch.com)
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import asyncio
+import multiprocessing
+from multiprocessing import cpu_count
+from weakref import WeakKeyDictionary
+
+from afem.config import Settings
+from afem.exchange import serialize
+from afem.exchange.step import StepRead
+from afem.exchange.vsp import ImportVSP
+from afem.misc.progress import ProgressMonitor
+from afem.structure.group import GroupAPI, _save_parts
+from afem.topology.entities import Shape
+from afem.topology.parallel import _BOPS
+
+__all__ = ["read_step", "import_vsp", "bop", "save_model"]
+
+# Concurrency limit of each event loop
+_limits = WeakKeyDictionary()
+
+# Interval in seconds to check on worker processes
+_POLL = 0.05
+
+
+def _limit():
+    """
+    Get the semaphore that limits the number of worker processes of the
+    running event loop. This must be called from a coroutine.
+    """
+    max_workers = Settings.max_workers
+    if max_workers is None:
+        max_workers = cpu_count()
+    max_workers = max(1, max_workers)
+
+    loop = asyncio.get_running_loop()
+    size, sem = _limits.get(loop, (None, None))
+    if size != max_workers:
+        sem = asyncio.Semaphore(max_workers)
+        _limits[loop] = (max_workers, sem)
+    return sem
+
+
+def _target(conn, func, args):
+    """
+    Run a function in a worker process, sending progress events and the
+    result back through the connection.
+    """
+
+    def _send_progress(fraction, message):
+        conn.send(('progress', fraction, message))
+
+    monitor = ProgressMonitor(_send_progress)
+    try:
+        result = func(monitor, *args)
+    except Exception as e:
+        conn.send(('error', '{}: {}'.format(e.__class__.__name__, e)))
+    else:
+        conn.send(('done', result))
+    finally:
+        conn.close()
+
+
+async def _run(func, args, progress):
+    """
+    Run a function in a worker process. The process is terminated if the
+    task is cancelled.
+    """
+    async with _limit():
+        recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+        proc = multiprocessing.Process(target=_target,
+                                       args=(send_conn, func, args))
+        proc.daemon = True
+        proc.start()
+        send_conn.close()
+
+        try:
+            while True:
+                while recv_conn.poll():
+                    msg = recv_conn.recv()
+                    if msg[0] == 'progress':
+                        if progress is not None:
+                            progress(msg[1], msg[2])
+                    elif msg[0] == 'done':
+                        return msg[1]
+                    else:
+                        raise RuntimeError(msg[1])
+                if not proc.is_alive() and not recv_conn.poll():
+                    msg = ('Worker process exited with code {} and no '
+                           'result.'.format(proc.exitcode))
+                    raise RuntimeError(msg)
+                await asyncio.sleep(_POLL)
+        finally:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+            recv_conn.close()
+
+
+def _read_step(monitor, fn, units):
+    """
+    Read a STEP file in a worker process.
+    """
+    Settings.units = units
+    shape = StepRead(fn, monitor).shape
+    return serialize.dumps(shape)
+
+
+def _import_vsp(monitor, fn, kwargs):
+    """
+    Import an OpenVSP model in a worker process.
+    """
+    monitor.update(0., 'Importing OpenVSP model')
+    vsp = ImportVSP(fn, **kwargs)
+    monitor.update(1., 'Finished importing OpenVSP model')
+    return serialize.dumps(vsp)
+
+
+def _bop(monitor, op, data, kwargs):
+    """
+    Run a Boolean operation in a worker process.
+    """
+    args, tools = serialize.loads(data)
+    tool = _BOPS[op](**kwargs)
+    tool.set_args(args)
+    tool.set_tools(tools)
+    tool.build(monitor)
+    if not tool.is_done:
+        raise RuntimeError('Boolean operation is not done.')
+    return serialize.dumps(tool.shape)
+
+
+def _save_model(monitor, data, fn, binary):
+    """
+    Save parts to a document in a worker process.
+    """
+    parts = serialize.loads(data)
+    monitor.update(0., 'Saving model')
+    status = _save_parts(parts, fn, binary)
+    monitor.update(1., 'Finished saving model')
+    return status
+
+
+async def read_step(fn, progress=None):
+    """
+    Read the main shape of a STEP file in a worker process.
+
+    :param str fn: The file to read.
+    :param progress: Optional function called with the fraction complete and
+        a message each time progress is reported.
+    :type progress: collections.Callable or None
+
+    :return: The main shape.
+    :rtype: afem.topology.entities.Shape
+
+    :raise RuntimeError: If the file cannot be read.
+    """
+    data = await _run(_read_step, (fn, Settings.units), progress)
+    return serialize.loads(data)
+
+
+async def import_vsp(fn, progress=None, **kwargs):
+    """
+    Import an OpenVSP model in a worker process.
+
+    :param str fn: The file to import.
+    :param progress: Optional function called with the fraction complete and
+        a message each time progress is reported.
+    :type progress: collections.Callable or None
+    :param kwargs: Other keyword arguments passed to
+        :class:`.ImportVSP`.
+
+    :return: The importer with the translated bodies.
+    :rtype: afem.exchange.vsp.ImportVSP
+
+    :raise RuntimeError: If the model cannot be imported.
+    """
+    data = await _run(_import_vsp, (fn, kwargs), progress)
+    return serialize.loads(data)
+
+
+async def bop(op, shape1, shape2, progress=None, **kwargs):
+    """
+    Run a Boolean operation in a worker process.
+
+    :param str op: The operation name. This is *fuse*, *cut*, *common*,
+        *intersect*, or *split*.
+    :param shape1: The argument(s).
+    :type shape1: afem.topology.entities.Shape or
+        list(afem.topology.entities.Shape)
+    :param shape2: The tool(s).
+    :type shape2: afem.topology.entities.Shape or
+        list(afem.topology.entities.Shape)
+    :param progress: Optional function called with the fraction complete and
+        a message each time progress is reported.
+    :type progress: collections.Callable or None
+    :param kwargs: Other keyword arguments passed to the operation (e.g.,
+        *fuzzy_val*).
+
+    :return: The resulting shape.
+    :rtype: afem.topology.entities.Shape
+
+    :raise KeyError: If the operation is unknown.
+    :raise RuntimeError: If the operation is not done.
+    """
+    if op not in _BOPS:
+        raise KeyError('Unknown Boolean operation: {}'.format(op))
+    args, tools = shape1, shape2
+    if isinstance(args, Shape):
+        args = [args]
+    if isinstance(tools, Shape):
+        tools = [tools]
+    data = serialize.dumps((list(args), list(tools)))
+    data = await _run(_bop, (op, data, kwargs), progress)
+    return serialize.loads(data)
+
+
+async def save_model(fn, binary=True, progress=None):
+    """
+    Save the model in a worker process. The parts of the master group are
+    sent to the worker when this is called, so later changes to the model do
+    not affect the saved document.
+
+    :param str fn: The filename.
+    :param bool binary: If *True*, the document will be saved in a binary
+        format. If *False*, the document will be saved in an XML format.
+    :param progress: Optional function called with the fraction complete and
+        a message each time progress is reported.
+    :type progress: collections.Callable or None
+
+    :return: *True* if saved, *False* otherwise.
+    :rtype: bool
+    """
+    parts = GroupAPI.get_master().get_parts()
+    data = serialize.dumps(parts)
+    return await _run(_save_model, (data, fn, binary), progress)
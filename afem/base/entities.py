@@ -91,6 +91,25 @@ class ViewableItem(object):
         self._color = None
         self._transparency = 0.
 
+    def __getstate__(self):
+        """
+        Store the color as RGB values so it can be pickled.
+        """
+        state = self.__dict__.copy()
+        if self._color is not None:
+            state['_color'] = (self._color.Red(), self._color.Green(),
+                               self._color.Blue())
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore the color from RGB values.
+        """
+        self.__dict__.update(state)
+        if self._color is not None:
+            r, g, b = self._color
+            self._color = Quantity_Color(r, g, b, Quantity_TOC_RGB)
+
     @property
     def displayed_shape(self):
         """
@@ -17,6 +17,7 @@
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 import logging
+import os
 import sys
 
 # Initialize logger.
@@ -62,9 +63,58 @@ class Settings(object):
 
     :var str units: The default units ('in', 'ft', 'm', 'mm'). The default
         value is inches ('INCH').
+    :var props_tol: The maximum relative error used when computing the area
+        and volume of shapes. If *None* then a fixed Gauss integration is used
+        instead of an adaptive one.
+    :vartype props_tol: float or None
+    :var bool props_skip_shared: If *True*, edges and faces shared by two or
+        more shapes are only taken into calculation once when computing the
+        length and area of shapes.
+    :var bool parallel: Option to use parallel execution inside OpenCASCADE
+        algorithms (Boolean operations, meshing, and distance).
+    :var occ_threads: The number of threads in the OpenCASCADE thread pool.
+        If *None* then the number of processors is used.
+    :vartype occ_threads: int or None
+    :var max_workers: The default number of worker processes for batch
+        tools. If *None* then the number of processors is used.
+    :vartype max_workers: int or None
+    :var fuzzy_val: The default fuzzy tolerance of Boolean operations.
+    :vartype fuzzy_val: float or None
+    :var deflection: The default linear deflection used to triangulate
+        shapes for fast paths. If *None* then a value relative to the size of
+        the shape is used.
+    :vartype deflection: float or None
+    :var int props_cache_size: The maximum number of entries in the
+        :class:`.PropsCache`.
+    :var bool bop_cache: Option to use the :class:`.BopCache`.
+    :var bop_cache_path: The directory of the :class:`.BopCache`. If *None*
+        then *~/.afem/bop_cache* is used.
+    :vartype bop_cache_path: str or None
+    :var int bop_cache_size: The maximum total size of the
+        :class:`.BopCache` in bytes.
+
+    The performance settings can also be set using the environment variables
+    *AFEM_PARALLEL*, *AFEM_OCC_THREADS*, *AFEM_MAX_WORKERS*,
+    *AFEM_FUZZY_VAL*, *AFEM_DEFLECTION*, *AFEM_PROPS_CACHE_SIZE*,
+    *AFEM_BOP_CACHE*, and *AFEM_BOP_CACHE_SIZE*. These are read when
+    ``afem.config`` is first imported. Setting *AFEM_BOP_CACHE* to a
+    directory enables the :class:`.BopCache` in that directory.
     """
     # Class variables for settings
     units = 'INCH'
+    props_tol = None
+    props_skip_shared = True
+
+    # Performance settings
+    parallel = True
+    occ_threads = None
+    max_workers = None
+    fuzzy_val = None
+    deflection = None
+    props_cache_size = 4096
+    bop_cache = False
+    bop_cache_path = None
+    bop_cache_size = 1024 ** 3
 
     @classmethod
     def set_units(cls, units='in'):
@@ -80,6 +130,183 @@ class Settings(object):
         units = units.lower()
         cls.units = units_dict[units]
 
+    @classmethod
+    def set_props_precision(cls, tol=None, skip_shared=True):
+        """
+        Set the precision used for the length, area, and volume of shapes.
+
+        :param tol: The maximum relative error. If *None* then a fixed Gauss
+            integration is used.
+        :type tol: float or None
+        :param bool skip_shared: Option to only take shared edges and faces
+            into calculation once.
+
+        :return: None.
+        """
+        cls.props_tol = tol
+        cls.props_skip_shared = skip_shared
+
+    @classmethod
+    def set_parallel(cls, flag=True):
+        """
+        Set the option for parallel execution inside OpenCASCADE algorithms.
+
+        :param bool flag: Option for parallel execution.
+
+        :return: None.
+        """
+        from OCC.Core.BOPAlgo import BOPAlgo_Options
+
+        cls.parallel = flag
+        BOPAlgo_Options.SetParallelMode(flag)
+
+    @classmethod
+    def set_occ_threads(cls, n=None):
+        """
+        Set the number of threads in the OpenCASCADE thread pool.
+
+        :param n: The number of threads. If *None* then the number of
+            processors is used.
+        :type n: int or None
+
+        :return: None.
+        """
+        from OCC.Core.OSD import OSD_ThreadPool
+
+        cls.occ_threads = n
+        if n is None:
+            n = -1
+        OSD_ThreadPool.DefaultPool().Init(n)
+
+    @classmethod
+    def set_max_workers(cls, n=None):
+        """
+        Set the default number of worker processes for batch tools.
+
+        :param n: The number of worker processes. If *None* then the number
+            of processors is used.
+        :type n: int or None
+
+        :return: None.
+        """
+        cls.max_workers = n
+
+    @classmethod
+    def set_fuzzy_val(cls, fuzzy_val=None):
+        """
+        Set the default fuzzy tolerance of Boolean operations.
+
+        :param fuzzy_val: The fuzzy tolerance. If *None* then no fuzzy
+            tolerance is used.
+        :type fuzzy_val: float or None
+
+        :return: None.
+        """
+        cls.fuzzy_val = fuzzy_val
+
+    @classmethod
+    def set_deflection(cls, deflection=None):
+        """
+        Set the default linear deflection used to triangulate shapes for
+        fast paths.
+
+        :param deflection: The deflection. If *None* then a value relative to
+            the size of the shape is used.
+        :type deflection: float or None
+
+        :return: None.
+        """
+        cls.deflection = deflection
+
+    @classmethod
+    def set_cache_sizes(cls, props_cache_size=None, bop_cache_size=None):
+        """
+        Set the cache sizes. Existing caches are trimmed if needed.
+
+        :param props_cache_size: The maximum number of entries in the
+            :class:`.PropsCache`. If *None* then it is not changed.
+        :type props_cache_size: int or None
+        :param bop_cache_size: The maximum total size of the
+            :class:`.BopCache` in bytes. If *None* then it is not changed.
+        :type bop_cache_size: int or None
+
+        :return: None.
+        """
+        from afem.topology.bop import BopCache
+        from afem.topology.props import PropsCache
+
+        if props_cache_size is not None:
+            cls.props_cache_size = props_cache_size
+            PropsCache.set_size(props_cache_size)
+        if bop_cache_size is not None:
+            cls.bop_cache_size = bop_cache_size
+            BopCache.set_max_size(bop_cache_size)
+
+    @classmethod
+    def set_bop_cache(cls, enabled=True, path=None):
+        """
+        Enable or disable the :class:`.BopCache`.
+
+        :param bool enabled: Option to use the cache.
+        :param str path: Optional cache directory.
+
+        :return: None.
+        """
+        from afem.topology.bop import BopCache
+
+        cls.bop_cache = enabled
+        if path is not None:
+            cls.bop_cache_path = path
+        BopCache.set_enabled(enabled, cls.bop_cache_path)
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """
+        Read the performance settings from environment variables. Settings
+        whose variable is not defined are not changed.
+
+        :param dict environ: The environment. If *None* then ``os.environ``
+            is used.
+
+        :return: None.
+
+        :raise ValueError: If a variable cannot be converted to the type of
+            its setting.
+        """
+        if environ is None:
+            environ = os.environ
+
+        def _get(name, type_, current):
+            value = environ.get(name, '').strip()
+            if not value:
+                return current
+            if value.lower() == 'none':
+                return None
+            if type_ is bool:
+                return value.lower() in ('1', 'true', 'yes', 'on')
+            return type_(value)
+
+        parallel = _get('AFEM_PARALLEL', bool, cls.parallel)
+        if parallel != cls.parallel:
+            cls.set_parallel(bool(parallel))
+        if environ.get('AFEM_OCC_THREADS', '').strip():
+            cls.set_occ_threads(_get('AFEM_OCC_THREADS', int, None))
+
+        cls.max_workers = _get('AFEM_MAX_WORKERS', int, cls.max_workers)
+        cls.fuzzy_val = _get('AFEM_FUZZY_VAL', float, cls.fuzzy_val)
+        cls.deflection = _get('AFEM_DEFLECTION', float, cls.deflection)
+        size = _get('AFEM_PROPS_CACHE_SIZE', int, None)
+        if size is not None:
+            cls.props_cache_size = size
+        size = _get('AFEM_BOP_CACHE_SIZE', int, None)
+        if size is not None:
+            cls.bop_cache_size = size
+
+        path = _get('AFEM_BOP_CACHE', str, cls.bop_cache_path)
+        if path is not None and path != cls.bop_cache_path:
+            cls.bop_cache = True
+            cls.bop_cache_path = path
+
     @staticmethod
     def log_to_console():
         """
@@ -106,3 +333,7 @@ class Settings(object):
         """
         level = level.lower()
         logger.setLevel(log_dict[level])
+
+
+# Performance settings from the environment
+Settings.from_env()
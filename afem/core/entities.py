@@ -18,6 +18,7 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 from collections.abc import Sequence
 
+from afem.adaptor.entities import GeomAdaptorCurve, GeomAdaptorSurface
 from afem.base.entities import NamedItem, ViewableItem
 from afem.config import logger
 from afem.geometry.check import CheckGeom
@@ -64,6 +65,8 @@ class ShapeHolder(NamedItem, ViewableItem):
         else:
             self._types = (expected_types,)
         self._shape = None
+        self._version = 0
+        self._compounds = {}
         if shape is not None:
             self.set_shape(shape)
 
@@ -72,6 +75,8 @@ class ShapeHolder(NamedItem, ViewableItem):
 
         # Set reference geometry if available
         self._cref, self._sref = None, None
+        self._cref_items, self._cref_trim = {}, None
+        self._sref_items = {}
         if cref is not None:
             self.set_cref(cref)
         if sref is not None:
@@ -80,6 +85,16 @@ class ShapeHolder(NamedItem, ViewableItem):
         # Shape of reference surface for robustness
         self._sref_shape = None
 
+    def __getstate__(self):
+        """
+        Do not pickle the cached compounds or reference shapes.
+        """
+        state = super(ShapeHolder, self).__getstate__()
+        state['_compounds'] = {}
+        state['_cref_items'], state['_cref_trim'] = {}, None
+        state['_sref_items'] = {}
+        return state
+
     @property
     def type_name(self):
         """
@@ -101,6 +116,15 @@ class ShapeHolder(NamedItem, ViewableItem):
     def shape(self, shape):
         self.set_shape(shape)
 
+    @property
+    def version(self):
+        """
+        :return: The number of times the shape has been set. This can be
+            used to check if the shape changed.
+        :rtype: int
+        """
+        return self._version
+
     @property
     def displayed_shape(self):
         """
@@ -173,21 +197,100 @@ class ShapeHolder(NamedItem, ViewableItem):
         """
         return self._sref_shape
 
+    @property
+    def cref_edge(self):
+        """
+        :return: An edge of the reference curve. It is cached until the
+            reference curve is set or trimmed.
+        :rtype: afem.topology.entities.Edge or None
+        """
+        if self._cref is None:
+            return None
+        items = self._cref_cache()
+        try:
+            return items['edge']
+        except KeyError:
+            edge = Edge.by_curve(self._cref)
+            items['edge'] = edge
+            return edge
+
+    @property
+    def cref_adaptor(self):
+        """
+        :return: An adaptor of the reference curve. It is cached until the
+            reference curve is set or trimmed.
+        :rtype: afem.adaptor.entities.GeomAdaptorCurve or None
+        """
+        if self._cref is None:
+            return None
+        items = self._cref_cache()
+        try:
+            return items['adaptor']
+        except KeyError:
+            adp_crv = GeomAdaptorCurve.by_curve(self._cref)
+            items['adaptor'] = adp_crv
+            return adp_crv
+
+    @property
+    def sref_face(self):
+        """
+        :return: A face of the reference surface. Unlike the reference shape,
+            it is not divided. It is cached until the reference surface is
+            set.
+        :rtype: afem.topology.entities.Face or None
+        """
+        if self._sref is None:
+            return None
+        try:
+            return self._sref_items['face']
+        except KeyError:
+            face = FaceBySurface(self._sref).face
+            self._sref_items['face'] = face
+            return face
+
+    @property
+    def sref_adaptor(self):
+        """
+        :return: An adaptor of the reference surface. It is cached until the
+            reference surface is set.
+        :rtype: afem.adaptor.entities.GeomAdaptorSurface or None
+        """
+        if self._sref is None:
+            return None
+        try:
+            return self._sref_items['adaptor']
+        except KeyError:
+            adp_srf = GeomAdaptorSurface.by_surface(self._sref)
+            self._sref_items['adaptor'] = adp_srf
+            return adp_srf
+
     @property
     def edge_compound(self):
         """
-        :return: A compound containing the edges.
+        :return: A compound containing the edges. It is cached until the
+            shape is set.
         :rtype: afem.topology.entities.Compound
         """
-        return CompoundByShapes(self._shape.edges).compound
+        try:
+            return self._compounds['edges']
+        except KeyError:
+            compound = CompoundByShapes(self._shape.edges).compound
+            self._compounds['edges'] = compound
+            return compound
 
     @property
     def face_compound(self):
         """
-        :return: A compound containing the faces.
+        :return: A compound containing the faces. It is cached until the
+            shape is set.
         :rtype: afem.topology.entities.Compound
         """
-        return CompoundByShapes(self._shape.faces).compound
+        try:
+            return self._compounds['faces']
+        except KeyError:
+            compound = CompoundByShapes(self._shape.faces).compound
+            self._compounds['faces'] = compound
+            return compound
 
     def set_shape(self, shape):
         """
@@ -217,6 +320,20 @@ class ShapeHolder(NamedItem, ViewableItem):
             logger.warning(msg)
 
         self._shape = shape
+        self._version += 1
+        self._compounds.clear()
+
+    def _cref_cache(self):
+        """
+        Get the cached shapes of the reference curve. They are cleared if the
+        curve was trimmed since they were created (e.g., using
+        part.cref.set_trim()).
+        """
+        trim = (self._cref.u1, self._cref.u2)
+        if trim != self._cref_trim:
+            self._cref_items.clear()
+            self._cref_trim = trim
+        return self._cref_items
 
     def set_cref(self, cref):
         """
@@ -239,6 +356,7 @@ class ShapeHolder(NamedItem, ViewableItem):
             self._cref = cref
         else:
             self._cref = TrimmedCurve.by_parameters(cref)
+        self._cref_items.clear()
 
     def set_sref(self, sref):
         """
@@ -261,9 +379,10 @@ class ShapeHolder(NamedItem, ViewableItem):
 
         # Set the surface
         self._sref = sref
+        self._sref_items.clear()
 
         # Convert to a shape for robustness
-        shape = FaceBySurface(sref).face
+        shape = self.sref_face
         shape = DivideClosedShape(shape).shape
         shape = DivideC0Shape(shape).shape
         self._sref_shape = shape
@@ -284,6 +403,7 @@ class ShapeHolder(NamedItem, ViewableItem):
             raise ValueError(msg)
 
         self._cref.set_trim(u1, self._cref.u2)
+        self._cref_items.clear()
 
     def set_u2(self, u2):
         """
@@ -301,6 +421,7 @@ class ShapeHolder(NamedItem, ViewableItem):
             raise ValueError(msg)
 
         self._cref.set_trim(self._cref.u1, u2)
+        self._cref_items.clear()
 
     def set_p1(self, p1):
         """
@@ -350,7 +471,7 @@ class ShapeHolder(NamedItem, ViewableItem):
         :raise RuntimeError: If an intersection with the reference curve cannot
             be found.
         """
-        shape1 = Shape.to_shape(self.cref)
+        shape1 = self.cref_edge
         shape2 = Shape.to_shape(entity)
         bop = IntersectShapes(shape1, shape2)
         if not bop.is_done:
@@ -374,7 +495,7 @@ class ShapeHolder(NamedItem, ViewableItem):
         :raise RuntimeError: If an intersection with the reference curve cannot
             be found.
         """
-        shape1 = Shape.to_shape(self.cref)
+        shape1 = self.cref_edge
         shape2 = Shape.to_shape(entity)
         bop = IntersectShapes(shape1, shape2)
         if not bop.is_done:
@@ -405,7 +526,7 @@ class ShapeHolder(NamedItem, ViewableItem):
         if is_rel:
             ds *= self._cref.length
 
-        return PointFromParameter(self._cref, u0, ds).point
+        return PointFromParameter(self.cref_adaptor, u0, ds).point
 
     def points_by_number(self, n, d1=None, d2=None, shape1=None,
                          shape2=None):
@@ -427,7 +548,7 @@ class ShapeHolder(NamedItem, ViewableItem):
         :return: The points.
         :rtype: list(afem.geometry.entities.Point)
         """
-        edge = Edge.by_curve(self._cref)
+        edge = self.cref_edge
         builder = PointsAlongShapeByNumber(edge, n, d1, d2, shape1, shape2)
         return builder.points
 
@@ -453,7 +574,7 @@ class ShapeHolder(NamedItem, ViewableItem):
         :return: The points.
         :rtype: list(afem.geometry.entities.Point)
         """
-        edge = Edge.by_curve(self._cref)
+        edge = self.cref_edge
         builder = PointsAlongShapeByDistance(edge, maxd, d1, d2, shape1,
                                              shape2, nmin)
         return builder.points
@@ -469,7 +590,8 @@ class ShapeHolder(NamedItem, ViewableItem):
         :return: *True* if projected, *False* if not.
         :rtype: bool
         """
-        proj = ProjectPointToCurve(pnt, self._cref, direction, update=True)
+        proj = ProjectPointToCurve(pnt, self.cref_adaptor, direction,
+                                   update=True)
         if not proj.success:
             return False
         return True
@@ -502,7 +624,7 @@ class ShapeHolder(NamedItem, ViewableItem):
         :return: *True* if projected, *False* if not.
         :rtype: bool
         """
-        proj = ProjectPointToSurface(pnt, self._sref, direction)
+        proj = ProjectPointToSurface(pnt, self.sref_adaptor, direction)
         if not proj.success:
             return False
 
@@ -554,7 +676,8 @@ class ShapeHolder(NamedItem, ViewableItem):
         if is_rel:
             ds *= self.cref.length
 
-        return PlaneFromParameter(self._cref, u0, ds, ref_pln, tol).plane
+        return PlaneFromParameter(self.cref_adaptor, u0, ds, ref_pln,
+                                  tol).plane
 
     def planes_by_number(self, n, ref_pln=None, d1=None, d2=None,
                          shape1=None, shape2=None):
@@ -583,7 +706,7 @@ class ShapeHolder(NamedItem, ViewableItem):
         :raise TypeError: If *shape* if not an edge or wire.
         :raise RuntimeError: If OCC method fails.
         """
-        edge = Edge.by_curve(self._cref)
+        edge = self.cref_edge
         return PlanesAlongShapeByNumber(edge, n, ref_pln, d1, d2, shape1,
                                         shape2).planes
 
@@ -616,7 +739,7 @@ class ShapeHolder(NamedItem, ViewableItem):
         :raise TypeError: If *shape* if not an edge or wire.
         :raise RuntimeError: If OCC method fails.
         """
-        edge = Edge.by_curve(self._cref)
+        edge = self.cref_edge
         return PlanesAlongShapeByDistance(edge, maxd, ref_pln, d1, d2, shape1,
                                           shape2, nmin).planes
 
@@ -670,7 +793,7 @@ class ShapeHolder(NamedItem, ViewableItem):
         p3.translate(vn)
         return PlaneByPoints(p1, p2, p3).plane
 
-    def extract_curve(self, u1, v1, u2, v2, basis_shape=None):
+    def extract_curve(self, u1, v1, u2, v2, basis_shape=None, edges=None):
         """
         Extract a trimmed curve within the reference surface between the
         parameters.
@@ -687,6 +810,10 @@ class ShapeHolder(NamedItem, ViewableItem):
             the intersection which could yield unanticipated results.
         :type basis_shape: afem.geometry.entities.Surface or
             afem.topology.entities.Shape
+        :param edges: The intersection edges of the basis shape and the
+            reference shape if they are already available. If provided, the
+            basis shape is not used.
+        :type edges: list(afem.topology.entities.Edge) or None
 
         :return: The curve.
         :rtype: afem.geometry.entities.TrimmedCurve
@@ -696,14 +823,15 @@ class ShapeHolder(NamedItem, ViewableItem):
         p1 = self.sref.eval(u1, v1)
         p2 = self.sref.eval(u2, v2)
 
-        if basis_shape is None:
-            basis_shape = self.extract_plane(u1, v1, u2, v2)
-        basis_shape = Shape.to_shape(basis_shape)
+        if edges is None:
+            if basis_shape is None:
+                basis_shape = self.extract_plane(u1, v1, u2, v2)
+            basis_shape = Shape.to_shape(basis_shape)
 
-        bop = IntersectShapes(basis_shape, self.sref_shape, approximate=True)
-        shape = bop.shape
+            bop = IntersectShapes(basis_shape, self.sref_shape,
+                                  approximate=True)
+            edges = bop.shape.edges
 
-        edges = shape.edges
         builder = WiresByConnectedEdges(edges)
         if builder.nwires == 0:
             msg = 'Failed to extract any curves.'
@@ -0,0 +1,147 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018  Laughlin Research, LLC (info@laughlinresearch.com)
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+"""
+Pickle shapes, geometry, parts, and bodies to bytes.
+
+All shapes and geometry are stored in one in-memory
+``BRepTools_ShapeSet`` that is written as ASCII text, which is the same
+format as the shape section of a BRep file written by
+:func:`afem.exchange.brep.write_brep`. It is not a binary format, so the
+data is about the size of the BRep file of the same shapes. It avoids the
+temporary files and the extra copies of shared sub-shapes and geometry of
+writing each shape to its own BRep file. Triangulations are not stored.
+
+This format is used to pickle shapes, to send shapes to worker processes
+(e.g., by :class:`afem.topology.parallel.BopExecutor` and :mod:`afem.aio`),
+and for the entries of :class:`afem.topology.bop.BopCache`.
+"""
+import pickle
+from io import BytesIO
+
+from afem.geometry.entities import Geometry
+from afem.occ import utils as occ_utils
+from afem.topology.entities import Shape
+
+
+class _Pickler(pickle.Pickler):
+    """
+    Pickler that stores all shapes and geometry in a single shape set.
+    """
+
+    def __init__(self, file, protocol, shape_set):
+        super(_Pickler, self).__init__(file, protocol)
+        self._shape_set = shape_set
+
+    def persistent_id(self, obj):
+        if isinstance(obj, Shape):
+            state = obj.__getstate__()
+            del state['_shape']
+            key = occ_utils.shape_set_add(self._shape_set, obj.object)
+            return 'shape', id(obj), None, key, state
+        if isinstance(obj, Geometry):
+            state = obj.__getstate__()
+            del state['_object']
+            shape = occ_utils.geom_to_topods(obj.object)
+            key = occ_utils.shape_set_add(self._shape_set, shape)
+            return 'geom', id(obj), obj.__class__, key, state
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    """
+    Unpickler that loads shapes and geometry from a single shape set.
+    """
+
+    def __init__(self, file, shape_set):
+        super(_Unpickler, self).__init__(file)
+        self._shape_set = shape_set
+        self._loaded = {}
+
+    def persistent_load(self, pid):
+        type_, tag, cls, key, state = pid
+        if tag in self._loaded:
+            return self._loaded[tag]
+
+        shape = occ_utils.shape_set_get(self._shape_set, *key)
+        if type_ == 'shape':
+            obj = Shape.wrap(shape)
+        else:
+            obj = cls(occ_utils.topods_to_geom(shape))
+        obj.__setstate__(state)
+        self._loaded[tag] = obj
+        return obj
+
+
+def dumps(obj, protocol=pickle.HIGHEST_PROTOCOL):
+    """
+    Pickle an object graph to bytes. Unlike pickling each shape on its own,
+    all shapes and geometry in the graph are stored in a single shape set so
+    sub-shapes and geometry shared between them remain shared when loaded.
+
+    :param obj: The object. This can be a shape, geometry, part, body, or
+        any container of them.
+    :param int protocol: The pickle protocol.
+
+    :return: The data.
+    :rtype: bytes
+    """
+    shape_set = occ_utils.new_shape_set()
+    file = BytesIO()
+    _Pickler(file, protocol, shape_set).dump(obj)
+    data = occ_utils.shape_set_to_bytes(shape_set)
+    return pickle.dumps((data, file.getvalue()), protocol)
+
+
+def loads(data):
+    """
+    Load an object graph from bytes created by :func:`dumps`.
+
+    :param bytes data: The data.
+
+    :return: The object.
+    """
+    shape_data, obj_data = pickle.loads(data)
+    shape_set = occ_utils.shape_set_from_bytes(shape_data)
+    return _Unpickler(BytesIO(obj_data), shape_set).load()
+
+
+def dump(obj, fn, protocol=pickle.HIGHEST_PROTOCOL):
+    """
+    Pickle an object graph to a file using :func:`dumps`.
+
+    :param obj: The object.
+    :param str fn: The filename.
+    :param int protocol: The pickle protocol.
+
+    :return: None.
+    """
+    with open(fn, 'wb') as f:
+        f.write(dumps(obj, protocol))
+
+
+def load(fn):
+    """
+    Load an object graph from a file created by :func:`dump`.
+
+    :param str fn: The filename.
+
+    :return: The object.
+    """
+    with open(fn, 'rb') as f:
+        return loads(f.read())
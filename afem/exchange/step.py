@@ -25,9 +25,10 @@ from OCC.Core.STEPControl import (STEPControl_AsIs, STEPControl_Writer,
 from OCC.Core.TCollection import TCollection_HAsciiString
 
 from afem.config import Settings, units_dict
+from afem.misc.progress import run_isolated
 from afem.topology.entities import Shape
 
-__all__ = ["StepWrite", "StepRead"]
+__all__ = ["StepWrite", "StepRead", "read_step"]
 
 
 class StepWrite(object):
@@ -135,16 +136,27 @@ class StepRead(object):
     Read a STEP file.
 
     :param str fn: The file to read.
+    :param monitor: Optional progress monitor that is checked for
+        cancellation and updated after reading the file and after
+        transferring its shapes.
+    :type monitor: afem.misc.progress.ProgressMonitor or None
+
+    :raise afem.misc.progress.OperationCancelled: If the monitor is
+        cancelled.
     """
 
-    def __init__(self, fn):
+    def __init__(self, fn, monitor=None):
         self._reader = STEPControl_Reader()
         self._tr = self._reader.WS().TransferReader()
 
         # Read file
+        if monitor is not None:
+            monitor.update(message='Reading STEP file')
         status = self._reader.ReadFile(fn)
         if status != IFSelect_RetDone:
             raise RuntimeError("Error reading STEP file.")
+        if monitor is not None:
+            monitor.update(0.5, 'Transferring STEP entities')
 
         # Convert to desired units
         Interface_Static.SetCVal("xstep.cascade.unit", Settings.units)
@@ -153,6 +165,8 @@ class StepRead(object):
         nroots = self._reader.TransferRoots()
         if nroots > 0:
             self._shape = Shape.wrap(self._reader.OneShape())
+        if monitor is not None:
+            monitor.update(1., 'Finished reading STEP file')
 
     @property
     def object(self):
@@ -184,3 +198,33 @@ class StepRead(object):
         if not item:
             return None
         return item.Name().ToCString()
+
+
+def _read_step_shape(fn, units):
+    """
+    Read the main shape of a STEP file in a separate process.
+    """
+    Settings.units = units
+    return StepRead(fn).shape
+
+
+def read_step(fn, timeout=None, monitor=None):
+    """
+    Read the main shape of a STEP file in a separate process that is
+    terminated if it takes too long.
+
+    :param str fn: The file to read.
+    :param timeout: Optional time limit in seconds.
+    :type timeout: float or None
+    :param monitor: Optional progress monitor used to cancel the read.
+    :type monitor: afem.misc.progress.ProgressMonitor or None
+
+    :return: The main shape.
+    :rtype: afem.topology.entities.Shape
+
+    :raise afem.misc.progress.OperationTimeout: If the time limit is
+        exceeded.
+    :raise RuntimeError: If the file cannot be read.
+    """
+    return run_isolated(_read_step_shape, (fn, Settings.units),
+                        timeout=timeout, monitor=monitor)
@@ -1761,6 +1761,14 @@ class Axis3(gp_Ax3):
         return cls(p, n, x)
 
 
+def _load_geometry(cls, data, index, loc_index, orientation):
+    """
+    Load a pickled curve or surface.
+    """
+    shape = occ_utils.topods_from_bytes(data, index, loc_index, orientation)
+    return cls(occ_utils.topods_to_geom(shape))
+
+
 # Transient types that are wrapped.
 class Geometry(ViewableItem):
     """
@@ -1824,6 +1832,17 @@ class Geometry(ViewableItem):
         elif isinstance(self, Surface):
             self.set_color(0.5, 0.5, 0.5)
 
+    def __reduce__(self):
+        """
+        Pickle curves and surfaces by storing them on an edge or face in an
+        in-memory shape set.
+        """
+        state = self.__getstate__()
+        del state['_object']
+        shape = occ_utils.geom_to_topods(self._object)
+        args = (self.__class__,) + occ_utils.topods_to_bytes(shape)
+        return _load_geometry, args, state
+
     @property
     def object(self):
         """
@@ -1832,6 +1851,25 @@ class Geometry(ViewableItem):
         """
         return self._object
 
+    def fingerprint(self, tol=1.0e-7):
+        """
+        Compute a content fingerprint of the geometry from its defining data
+        (e.g., the degree, knots, multiplicities, poles, and weights of a
+        NURBS curve). Equivalent geometry has the same fingerprint across
+        sessions. Since geometry can be modified in place the result is not
+        cached.
+
+        :param float tol: The tolerance used to quantize real values.
+
+        :return: The fingerprint as a hexadecimal string.
+        :rtype: str
+
+        .. seealso::
+
+            :func:`afem.occ.utils.geom_fingerprint`
+        """
+        return occ_utils.geom_fingerprint(self.object, tol)
+
     def translate(self, v):
         """
         Translate the geometry along the vector.
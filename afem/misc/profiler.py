@@ -0,0 +1,330 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018  Laughlin Research, LLC (info@laughlinresearch.com)
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import json
+import os
+import sys
+import threading
+from functools import wraps
+from importlib import import_module
+from time import perf_counter
+
+__all__ = ["Profiler"]
+
+# Modules with instrumented classes
+_MODULES = ['afem.topology.bop', 'afem.topology.modify',
+            'afem.topology.offset', 'afem.geometry.intersect',
+            'afem.structure.create']
+
+# Methods that do the work of an operation
+_METHODS = ['__init__', 'build', 'perform', 'apply']
+
+# Directory of the afem package used to find call sites
+_AFEM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Record(object):
+    """
+    A single profiled operation.
+    """
+    __slots__ = ('op', 'part', 'start', 'time', 'nfaces', 'nedges',
+                 'outcome', 'site', 'depth', 'tid')
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _call_site():
+    """
+    Find the file and line of the first caller outside of afem.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        fn = os.path.abspath(frame.f_code.co_filename)
+        if not fn.startswith(_AFEM_DIR):
+            return '{}:{}'.format(fn, frame.f_lineno)
+        frame = frame.f_back
+    return ''
+
+
+def _input_sizes(args, kwargs):
+    """
+    Count the faces and edges of the shapes in the arguments.
+    """
+    from afem.topology.entities import Shape
+
+    nfaces, nedges = 0, 0
+    items = list(args) + list(kwargs.values())
+    for item in items:
+        if isinstance(item, (list, tuple)):
+            shapes = item
+        else:
+            shapes = [item]
+        for shape in shapes:
+            if not isinstance(shape, Shape):
+                shape = getattr(shape, 'shape', None)
+            if isinstance(shape, Shape) and not shape.is_null:
+                nfaces += shape.num_faces
+                nedges += shape.num_edges
+    return nfaces, nedges
+
+
+def _outcome(obj):
+    """
+    Get the outcome of an operation from its status if available.
+    """
+    try:
+        is_done = getattr(obj, 'is_done')
+    except Exception:
+        return 'ok'
+    if callable(is_done) or is_done is None:
+        return 'ok'
+    return 'done' if is_done else 'failed'
+
+
+class Profiler(object):
+    """
+    Opt-in instrumentation of the operations in :mod:`afem.topology.bop`,
+    :mod:`afem.topology.modify`, :mod:`afem.topology.offset`,
+    :mod:`afem.geometry.intersect`, and :mod:`afem.structure.create`. When
+    enabled, the wall time, number of input faces and edges, outcome, and
+    call site of each operation are recorded. Operations run inside a part
+    builder are attributed to that part. The classes are only wrapped while
+    the profiler is enabled, so there is no overhead when it is disabled.
+
+    :cvar bool enabled: *True* if the profiler is enabled.
+
+    For example:
+
+    .. code-block:: python
+
+        Profiler.enable()
+        # Build the model
+        Profiler.disable()
+        print(Profiler.summary())
+        Profiler.export_chrome_trace('trace.json')
+    """
+    enabled = False
+    _records = []
+    _originals = []
+    _lock = threading.Lock()
+    _local = threading.local()
+    _t0 = 0.
+
+    @classmethod
+    def enable(cls):
+        """
+        Enable the profiler by wrapping the operations.
+
+        :return: None.
+        """
+        if cls.enabled:
+            return None
+        for name in _MODULES:
+            module = import_module(name)
+            for cls_name in getattr(module, '__all__', []):
+                op_cls = getattr(module, cls_name, None)
+                if not isinstance(op_cls, type):
+                    continue
+                if op_cls.__module__ != module.__name__:
+                    continue
+                for method in _METHODS:
+                    func = op_cls.__dict__.get(method)
+                    if func is None or not callable(func):
+                        continue
+                    cls._originals.append((op_cls, method, func))
+                    setattr(op_cls, method, cls._wrap(func, method))
+        cls._t0 = perf_counter()
+        cls.enabled = True
+
+    @classmethod
+    def disable(cls):
+        """
+        Disable the profiler and restore the operations. The records are
+        kept.
+
+        :return: None.
+        """
+        for op_cls, method, func in reversed(cls._originals):
+            setattr(op_cls, method, func)
+        cls._originals = []
+        cls.enabled = False
+
+    @classmethod
+    def clear(cls):
+        """
+        Remove all records.
+
+        :return: None.
+        """
+        with cls._lock:
+            cls._records = []
+        cls._t0 = perf_counter()
+
+    @classmethod
+    def _stack(cls):
+        try:
+            return cls._local.stack
+        except AttributeError:
+            cls._local.stack = []
+            return cls._local.stack
+
+    @classmethod
+    def _wrap(cls, func, method):
+        """
+        Wrap a method so the outermost call on each instance is recorded.
+        """
+
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            stack = cls._stack()
+            # Skip calls made while the same instance is being profiled (e.g.,
+            # super().__init__ or build() inside __init__)
+            for item in stack:
+                if item[0] is self:
+                    return func(self, *args, **kwargs)
+
+            op = self.__class__.__name__
+            if method != '__init__':
+                op = '.'.join([op, method])
+            part = None
+            if method == '__init__' and args and isinstance(args[0], str):
+                part = args[0]
+            elif 'name' in kwargs and isinstance(kwargs['name'], str):
+                part = kwargs['name']
+            if part is None and stack:
+                part = stack[-1][1]
+
+            record = _Record()
+            record.op = op
+            record.part = part
+            record.nfaces, record.nedges = _input_sizes(args, kwargs)
+            record.site = _call_site()
+            record.depth = len(stack)
+            record.tid = threading.current_thread().ident
+
+            stack.append((self, part))
+            start = perf_counter()
+            try:
+                result = func(self, *args, **kwargs)
+            except Exception as e:
+                record.outcome = 'error: {}'.format(e.__class__.__name__)
+                raise
+            else:
+                record.outcome = _outcome(self)
+                return result
+            finally:
+                record.time = perf_counter() - start
+                record.start = start - cls._t0
+                stack.pop()
+                with cls._lock:
+                    cls._records.append(record)
+
+        return wrapper
+
+    @classmethod
+    def records(cls):
+        """
+        :return: The records in the order the operations finished. Each
+            record is a dictionary with the operation name (*op*), part name
+            (*part*), start time (*start*), wall time in seconds (*time*),
+            number of input faces (*nfaces*) and edges (*nedges*), outcome
+            (*outcome*), call site (*site*), nesting depth (*depth*), and
+            thread id (*tid*).
+        :rtype: list(dict)
+        """
+        with cls._lock:
+            return [r.as_dict() for r in cls._records]
+
+    @classmethod
+    def summary(cls, by='op'):
+        """
+        Aggregate the records.
+
+        :param str by: Aggregate by operation type ('op') or part name
+            ('part').
+
+        :return: Dictionary of statistics by key including the number of
+            calls (*count*), total, maximum, and mean time (*total*, *max*,
+            *mean*), number of failed operations (*failed*), and total number
+            of input faces and edges (*nfaces*, *nedges*). Nested operations
+            are included, so totals of different keys may overlap.
+        :rtype: dict
+
+        :raise ValueError: If *by* is not supported.
+        """
+        if by not in ('op', 'part'):
+            raise ValueError('Unsupported key: {}'.format(by))
+        results = {}
+        with cls._lock:
+            records = list(cls._records)
+        for r in records:
+            key = getattr(r, by)
+            stats = results.setdefault(key, {'count': 0, 'total': 0.,
+                                             'max': 0., 'failed': 0,
+                                             'nfaces': 0, 'nedges': 0})
+            stats['count'] += 1
+            stats['total'] += r.time
+            stats['max'] = max(stats['max'], r.time)
+            if r.outcome != 'done' and r.outcome != 'ok':
+                stats['failed'] += 1
+            stats['nfaces'] += r.nfaces
+            stats['nedges'] += r.nedges
+        for stats in results.values():
+            stats['mean'] = stats['total'] / stats['count']
+        return results
+
+    @classmethod
+    def export_json(cls, fn):
+        """
+        Export the records and summaries to a JSON file.
+
+        :param str fn: The filename.
+
+        :return: None.
+        """
+        data = {'records': cls.records(),
+                'by_op': cls.summary('op'),
+                'by_part': [dict(part=k, **v) for k, v in
+                            cls.summary('part').items()]}
+        with open(fn, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def export_chrome_trace(cls, fn):
+        """
+        Export the records in the Chrome trace event format. The file can be
+        viewed using *chrome://tracing* or similar tools.
+
+        :param str fn: The filename.
+
+        :return: None.
+        """
+        pid = os.getpid()
+        events = []
+        for r in cls.records():
+            args = {'part': r['part'], 'nfaces': r['nfaces'],
+                    'nedges': r['nedges'], 'outcome': r['outcome'],
+                    'site': r['site']}
+            events.append({'name': r['op'], 'cat': 'afem', 'ph': 'X',
+                           'ts': r['start'] * 1.0e6,
+                           'dur': r['time'] * 1.0e6,
+                           'pid': pid, 'tid': r['tid'], 'args': args})
+        events.sort(key=lambda e: e['ts'])
+        with open(fn, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,245 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018  Laughlin Research, LLC (info@laughlinresearch.com)
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import multiprocessing
+from time import perf_counter
+
+__all__ = ["OperationCancelled", "OperationTimeout", "ProgressMonitor",
+           "run_isolated"]
+
+
+class OperationCancelled(Exception):
+    """
+    Raised when an operation is cancelled.
+    """
+    pass
+
+
+class OperationTimeout(OperationCancelled):
+    """
+    Raised when an operation exceeds its time budget.
+    """
+    pass
+
+
+class ProgressMonitor(object):
+    """
+    Progress reporting, cooperative cancellation, and a time budget for long
+    operations. Operations that accept a monitor report their progress to it
+    and check it for cancellation between steps.
+
+    :param callback: Optional function called with the fraction complete
+        (0 to 1) and a message each time progress is reported. If it returns
+        *False* the operation is cancelled.
+    :type callback: collections.Callable or None
+    :param timeout: Optional time budget in seconds starting when the monitor
+        is created.
+    :type timeout: float or None
+
+    .. note::
+
+        OpenCASCADE algorithms cannot be interrupted from Python while they
+        run. Cancellation takes effect at the next step of an operation, and
+        operations that support a *timeout* run in a separate process that
+        is terminated when the budget is exceeded.
+    """
+
+    def __init__(self, callback=None, timeout=None):
+        self._callback = callback
+        self._timeout = timeout
+        self._start = perf_counter()
+        self._cancelled = False
+        self._fraction = 0.
+        self._message = ''
+
+    @property
+    def fraction(self):
+        """
+        :return: The last reported fraction complete.
+        :rtype: float
+        """
+        return self._fraction
+
+    @property
+    def message(self):
+        """
+        :return: The last reported message.
+        :rtype: str
+        """
+        return self._message
+
+    @property
+    def elapsed(self):
+        """
+        :return: The elapsed time in seconds.
+        :rtype: float
+        """
+        return perf_counter() - self._start
+
+    @property
+    def remaining(self):
+        """
+        :return: The remaining time budget in seconds or *None* if there is
+            no budget.
+        :rtype: float or None
+        """
+        if self._timeout is None:
+            return None
+        return max(0., self._timeout - self.elapsed)
+
+    @property
+    def is_cancelled(self):
+        """
+        :return: *True* if cancelled, *False* if not.
+        :rtype: bool
+        """
+        return self._cancelled
+
+    @property
+    def is_expired(self):
+        """
+        :return: *True* if the time budget is exceeded, *False* if not.
+        :rtype: bool
+        """
+        return self._timeout is not None and self.elapsed > self._timeout
+
+    def cancel(self):
+        """
+        Request cancellation.
+
+        :return: None.
+        """
+        self._cancelled = True
+
+    def check(self):
+        """
+        Check for cancellation.
+
+        :return: None.
+
+        :raise OperationCancelled: If cancelled.
+        :raise OperationTimeout: If the time budget is exceeded.
+        """
+        if self._cancelled:
+            raise OperationCancelled('Operation cancelled.')
+        if self.is_expired:
+            raise OperationTimeout('Operation exceeded its time budget of '
+                                   '{} seconds.'.format(self._timeout))
+
+    def update(self, fraction=None, message=None):
+        """
+        Report progress and check for cancellation.
+
+        :param fraction: The fraction complete. If *None* then it is not
+            changed.
+        :type fraction: float or None
+        :param message: Optional message.
+        :type message: str or None
+
+        :return: None.
+
+        :raise OperationCancelled: If cancelled.
+        :raise OperationTimeout: If the time budget is exceeded.
+        """
+        if fraction is not None:
+            self._fraction = min(max(fraction, 0.), 1.)
+        if message is not None:
+            self._message = message
+        if self._callback is not None:
+            if self._callback(self._fraction, self._message) is False:
+                self._cancelled = True
+        self.check()
+
+
+def _isolated_target(conn, func, args, kwargs):
+    """
+    Run a function in the isolated process and send back its result.
+    """
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        conn.send((False, '{}: {}'.format(e.__class__.__name__, e)))
+    else:
+        conn.send((True, result))
+    finally:
+        conn.close()
+
+
+def run_isolated(func, args=(), kwargs=None, timeout=None, monitor=None,
+                 poll=0.05):
+    """
+    Run a function in a separate process that is terminated if it exceeds the
+    timeout or the monitor is cancelled. This enforces a hard limit on
+    operations that cannot be interrupted otherwise.
+
+    :param func: The function. It must be defined at module level so it can
+        be pickled.
+    :type func: collections.Callable
+    :param tuple args: The positional arguments.
+    :param dict kwargs: The keyword arguments.
+    :param timeout: The timeout in seconds. If *None* then only the time
+        budget of the monitor applies.
+    :type timeout: float or None
+    :param monitor: Optional progress monitor.
+    :type monitor: afem.misc.progress.ProgressMonitor or None
+    :param float poll: Interval in seconds to check for completion.
+
+    :return: The result of the function.
+
+    :raise OperationTimeout: If the timeout is exceeded.
+    :raise OperationCancelled: If the monitor is cancelled.
+    :raise RuntimeError: If the function raises an exception or the process
+        exits without a result.
+    """
+    if kwargs is None:
+        kwargs = {}
+    if monitor is not None:
+        monitor.check()
+
+    recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+    proc = multiprocessing.Process(target=_isolated_target,
+                                   args=(send_conn, func, args, kwargs))
+    proc.daemon = True
+    proc.start()
+    send_conn.close()
+
+    start = perf_counter()
+    try:
+        while True:
+            if recv_conn.poll(poll):
+                is_done, value = recv_conn.recv()
+                break
+            if not proc.is_alive() and not recv_conn.poll():
+                msg = ('Isolated process exited with code {} and no '
+                       'result.'.format(proc.exitcode))
+                raise RuntimeError(msg)
+            if timeout is not None and perf_counter() - start > timeout:
+                msg = ('Operation exceeded its timeout of {} '
+                       'seconds.'.format(timeout))
+                raise OperationTimeout(msg)
+            if monitor is not None:
+                monitor.check()
+    finally:
+        if proc.is_alive():
+            proc.terminate()
+        proc.join()
+        recv_conn.close()
+
+    if not is_done:
+        raise RuntimeError(value)
+    return value
@@ -16,14 +16,31 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+
+from OCC.Core.BRep import BRep_Builder, BRep_Tool
+from OCC.Core.BRepTools import BRepTools_ShapeSet
+from OCC.Core.Geom import (Geom_BSplineCurve, Geom_BSplineSurface,
+                           Geom_BezierCurve, Geom_BezierSurface, Geom_Conic,
+                           Geom_Curve, Geom_ElementarySurface, Geom_Line,
+                           Geom_OffsetCurve, Geom_OffsetSurface,
+                           Geom_RectangularTrimmedSurface, Geom_Surface,
+                           Geom_TrimmedCurve)
 from OCC.Core.TColStd import (TColStd_Array1OfInteger, TColStd_Array1OfReal,
                           TColStd_Array2OfReal, TColStd_HSequenceOfReal)
 from OCC.Core.TColgp import (TColgp_Array1OfPnt, TColgp_Array1OfPnt2d,
                          TColgp_Array2OfPnt, TColgp_HArray1OfPnt,
                          TColgp_HArray1OfPnt2d)
-from OCC.Core.TopTools import TopTools_ListOfShape
+from OCC.Core.TopAbs import (TopAbs_EDGE, TopAbs_FACE, TopAbs_Orientation,
+                             TopAbs_VERTEX)
+from OCC.Core.TopExp import topexp
+from OCC.Core.TopTools import TopTools_IndexedMapOfShape, TopTools_ListOfShape
+from OCC.Core.TopoDS import (TopoDS_Edge, TopoDS_Face, TopoDS_Iterator,
+                             TopoDS_Shape, topods)
 from OCC.Core.gp import gp_Pnt, gp_Pnt2d
-from numpy import array as np_array, zeros
+from numpy import array as np_array, int64, rint, zeros
 import OCC.Core.TopoDSToStep
 
 from afem.misc.utils import is_array_like
@@ -351,3 +368,402 @@ def to_topods_list(shapes):
     for s in shapes:
         topods_list.Append(s.object)
     return topods_list
+
+
+def new_shape_set():
+    """
+    Create an empty shape set used to serialize shapes in memory. Any
+    triangulations of the shapes are not stored.
+
+    :return: The shape set.
+    :rtype: OCC.Core.BRepTools.BRepTools_ShapeSet
+    """
+    return BRepTools_ShapeSet(False)
+
+
+def shape_set_add(shape_set, shape):
+    """
+    Add a shape to the shape set. Sub-shapes and geometry already in the set
+    are shared.
+
+    :param OCC.Core.BRepTools.BRepTools_ShapeSet shape_set: The shape set.
+    :param OCC.Core.TopoDS.TopoDS_Shape shape: The shape.
+
+    :return: The shape index, location index, and orientation needed to
+        restore the shape using :func:`shape_set_get`.
+    :rtype: tuple(int)
+    """
+    if shape.IsNull():
+        return 0, 0, 0
+    index = shape_set.Add(shape)
+    loc_index = shape_set.Locations().Index(shape.Location())
+    return index, loc_index, int(shape.Orientation())
+
+
+def shape_set_get(shape_set, index, loc_index, orientation):
+    """
+    Get a shape from the shape set.
+
+    :param OCC.Core.BRepTools.BRepTools_ShapeSet shape_set: The shape set.
+    :param int index: The shape index.
+    :param int loc_index: The location index.
+    :param int orientation: The orientation.
+
+    :return: The shape.
+    :rtype: OCC.Core.TopoDS.TopoDS_Shape
+    """
+    if index == 0:
+        return TopoDS_Shape()
+    shape = shape_set.Shape(index)
+    if loc_index > 0:
+        shape = shape.Located(shape_set.Locations().Location(loc_index))
+    return shape.Oriented(TopAbs_Orientation(orientation))
+
+
+def shape_set_to_bytes(shape_set):
+    """
+    Write the shape set to bytes.
+
+    :param OCC.Core.BRepTools.BRepTools_ShapeSet shape_set: The shape set.
+
+    :return: The data.
+    :rtype: bytes
+    """
+    return shape_set.WriteToString().encode('ascii')
+
+
+def shape_set_from_bytes(data):
+    """
+    Read a shape set from bytes.
+
+    :param bytes data: The data.
+
+    :return: The shape set.
+    :rtype: OCC.Core.BRepTools.BRepTools_ShapeSet
+    """
+    shape_set = new_shape_set()
+    shape_set.ReadFromString(data.decode('ascii'))
+    return shape_set
+
+
+def topods_to_bytes(shape):
+    """
+    Serialize a single shape.
+
+    :param OCC.Core.TopoDS.TopoDS_Shape shape: The shape.
+
+    :return: The data, shape index, location index, and orientation.
+    :rtype: tuple
+    """
+    shape_set = new_shape_set()
+    key = shape_set_add(shape_set, shape)
+    return (shape_set_to_bytes(shape_set),) + key
+
+
+def topods_from_bytes(data, index, loc_index, orientation):
+    """
+    Restore a single shape serialized with :func:`topods_to_bytes`.
+
+    :param bytes data: The data.
+    :param int index: The shape index.
+    :param int loc_index: The location index.
+    :param int orientation: The orientation.
+
+    :return: The shape.
+    :rtype: OCC.Core.TopoDS.TopoDS_Shape
+    """
+    if index == 0:
+        return TopoDS_Shape()
+    shape_set = shape_set_from_bytes(data)
+    return shape_set_get(shape_set, index, loc_index, orientation)
+
+
+def geom_to_topods(geom):
+    """
+    Put a curve or surface on an edge or face without modifying it so it can
+    be stored in a shape set.
+
+    :param geom: The curve or surface.
+    :type geom: OCC.Core.Geom.Geom_Curve or OCC.Core.Geom.Geom_Surface
+
+    :return: The edge or face.
+    :rtype: OCC.Core.TopoDS.TopoDS_Edge or OCC.Core.TopoDS.TopoDS_Face
+
+    :raise TypeError: If the geometry is not a curve or surface.
+    """
+    builder = BRep_Builder()
+    if isinstance(geom, Geom_Curve):
+        shape = TopoDS_Edge()
+        builder.MakeEdge(shape, geom, 0.)
+        return shape
+    if isinstance(geom, Geom_Surface):
+        shape = TopoDS_Face()
+        builder.MakeFace(shape, geom, 0.)
+        return shape
+    raise TypeError('Geometry type not supported.')
+
+
+def topods_to_geom(shape):
+    """
+    Get the curve or surface of an edge or face made by
+    :func:`geom_to_topods`.
+
+    :param shape: The edge or face.
+    :type shape: OCC.Core.TopoDS.TopoDS_Edge or OCC.Core.TopoDS.TopoDS_Face
+
+    :return: The curve or surface.
+    :rtype: OCC.Core.Geom.Geom_Curve or OCC.Core.Geom.Geom_Surface
+    """
+    if shape.ShapeType() == TopAbs_EDGE:
+        curve, _, _ = BRep_Tool.Curve(topods.Edge(shape), 0., 0.)
+        return curve
+    return BRep_Tool.Surface(topods.Face(shape))
+
+
+def _hash_reals(h, values, tol):
+    """
+    Update a hash with real values quantized to a tolerance.
+    """
+    values = np_array(values, dtype=float).ravel()
+    h.update(rint(values / tol).astype(int64).tobytes())
+
+
+def _hash_ints(h, values):
+    """
+    Update a hash with integer values.
+    """
+    h.update(np_array(values, dtype=int64).ravel().tobytes())
+
+
+def _xyz(v):
+    return v.X(), v.Y(), v.Z()
+
+
+def _hash_geom(h, geom, tol):
+    """
+    Update a hash with the defining data of a curve or surface.
+    """
+    h.update(geom.__class__.__name__.encode())
+
+    # Bounded and offset geometry
+    if isinstance(geom, Geom_TrimmedCurve):
+        _hash_reals(h, [geom.FirstParameter(), geom.LastParameter()], tol)
+        _hash_geom(h, geom.BasisCurve(), tol)
+        return None
+    if isinstance(geom, Geom_RectangularTrimmedSurface):
+        _hash_reals(h, geom.Bounds(0., 0., 0., 0.), tol)
+        _hash_geom(h, geom.BasisSurface(), tol)
+        return None
+    if isinstance(geom, Geom_OffsetCurve):
+        _hash_reals(h, [geom.Offset()] + list(_xyz(geom.Direction())), tol)
+        _hash_geom(h, geom.BasisCurve(), tol)
+        return None
+    if isinstance(geom, Geom_OffsetSurface):
+        _hash_reals(h, [geom.Offset()], tol)
+        _hash_geom(h, geom.BasisSurface(), tol)
+        return None
+
+    # NURBS and Bezier
+    if isinstance(geom, (Geom_BSplineCurve, Geom_BezierCurve)):
+        n = geom.NbPoles()
+        _hash_ints(h, [geom.Degree(), geom.IsPeriodic(), geom.IsRational()])
+        if isinstance(geom, Geom_BSplineCurve):
+            nk = geom.NbKnots()
+            _hash_reals(h, [geom.Knot(i) for i in range(1, nk + 1)], tol)
+            _hash_ints(h, [geom.Multiplicity(i) for i in range(1, nk + 1)])
+        _hash_reals(h, [_xyz(geom.Pole(i)) for i in range(1, n + 1)], tol)
+        if geom.IsRational():
+            _hash_reals(h, [geom.Weight(i) for i in range(1, n + 1)], tol)
+        return None
+    if isinstance(geom, (Geom_BSplineSurface, Geom_BezierSurface)):
+        nu, nv = geom.NbUPoles(), geom.NbVPoles()
+        rational = geom.IsURational() or geom.IsVRational()
+        _hash_ints(h, [geom.UDegree(), geom.VDegree(), geom.IsUPeriodic(),
+                       geom.IsVPeriodic(), rational])
+        if isinstance(geom, Geom_BSplineSurface):
+            nku, nkv = geom.NbUKnots(), geom.NbVKnots()
+            _hash_reals(h, [geom.UKnot(i) for i in range(1, nku + 1)], tol)
+            _hash_ints(h, [geom.UMultiplicity(i) for i in range(1, nku + 1)])
+            _hash_reals(h, [geom.VKnot(i) for i in range(1, nkv + 1)], tol)
+            _hash_ints(h, [geom.VMultiplicity(i) for i in range(1, nkv + 1)])
+        _hash_reals(h, [_xyz(geom.Pole(i, j)) for i in range(1, nu + 1)
+                        for j in range(1, nv + 1)], tol)
+        if rational:
+            _hash_reals(h, [geom.Weight(i, j) for i in range(1, nu + 1)
+                            for j in range(1, nv + 1)], tol)
+        return None
+
+    # Analytic
+    if isinstance(geom, Geom_Line):
+        ax1 = geom.Position()
+        _hash_reals(h, _xyz(ax1.Location()) + _xyz(ax1.Direction()), tol)
+        return None
+    if isinstance(geom, (Geom_Conic, Geom_ElementarySurface)):
+        ax = geom.Position()
+        _hash_reals(h, _xyz(ax.Location()) + _xyz(ax.Direction()) +
+                    _xyz(ax.XDirection()), tol)
+        if isinstance(geom, Geom_ElementarySurface):
+            _hash_ints(h, [ax.Direct()])
+        params = []
+        for name in ['Radius', 'MajorRadius', 'MinorRadius', 'Focal',
+                     'RefRadius', 'SemiAngle']:
+            if hasattr(geom, name):
+                params.append(getattr(geom, name)())
+        _hash_reals(h, params, tol)
+        return None
+
+    # Other types use their exact serialized form
+    data, _, _, _ = topods_to_bytes(geom_to_topods(geom))
+    h.update(data)
+
+
+def geom_fingerprint(geom, tol=1.0e-7):
+    """
+    Compute a content fingerprint of a curve or surface. NURBS and Bezier
+    geometry is hashed using its degree, knots, multiplicities, poles, and
+    weights, and analytic geometry using its position and parameters. Real
+    values are quantized to the tolerance so that the fingerprint does not
+    depend on round-off.
+
+    :param geom: The curve or surface.
+    :type geom: OCC.Core.Geom.Geom_Curve or OCC.Core.Geom.Geom_Surface
+    :param float tol: The quantization tolerance.
+
+    :return: The fingerprint as a hexadecimal string.
+    :rtype: str
+    """
+    h = sha256()
+    _hash_geom(h, geom, tol)
+    return h.hexdigest()
+
+
+class _SameShapeKey(object):
+    """
+    Hashable key for a shape based on its TShape and location.
+    """
+    __slots__ = ('_shape', '_hash')
+
+    def __init__(self, shape):
+        self._shape = shape
+        self._hash = shape.HashCode(2147483647)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return self._shape.IsSame(other._shape)
+
+
+# Fingerprints of individual sub-shapes shared between calls. Each entry
+# holds a reference to its sub-shape, so the size is kept small.
+_node_fingerprints = OrderedDict()
+_node_fingerprints_size = 10000
+_node_fingerprints_lock = Lock()
+
+
+def _shape_tolerance(shape):
+    """
+    Get the tolerance of a vertex, edge, or face, or *None* for other types.
+    """
+    shape_type = shape.ShapeType()
+    if shape_type == TopAbs_VERTEX:
+        return BRep_Tool.Tolerance(topods.Vertex(shape))
+    if shape_type == TopAbs_EDGE:
+        return BRep_Tool.Tolerance(topods.Edge(shape))
+    if shape_type == TopAbs_FACE:
+        return BRep_Tool.Tolerance(topods.Face(shape))
+    return None
+
+
+def clear_fingerprint_cache():
+    """
+    Remove the cached fingerprints of sub-shapes. This releases the
+    sub-shapes they refer to and is done by
+    :meth:`afem.structure.group.GroupAPI.reset`.
+
+    :return: None.
+    """
+    with _node_fingerprints_lock:
+        _node_fingerprints.clear()
+
+
+def _node_fingerprint(shape, tol):
+    """
+    Fingerprint the geometry and tolerance of a single sub-shape without its
+    children. The current tolerance of the sub-shape is part of the cache key
+    since it may be increased in place (e.g., by a destructive Boolean
+    operation).
+    """
+    key = (_SameShapeKey(shape), tol, _shape_tolerance(shape))
+    with _node_fingerprints_lock:
+        fp = _node_fingerprints.get(key)
+        if fp is not None:
+            _node_fingerprints.move_to_end(key)
+            return fp
+
+    h = sha256()
+    shape_type = shape.ShapeType()
+    _hash_ints(h, [int(shape_type)])
+    if shape_type == TopAbs_VERTEX:
+        v = topods.Vertex(shape)
+        _hash_reals(h, _xyz(BRep_Tool.Pnt(v)) + (BRep_Tool.Tolerance(v),),
+                    tol)
+    elif shape_type == TopAbs_EDGE:
+        e = topods.Edge(shape)
+        _hash_ints(h, [BRep_Tool.Degenerated(e)])
+        _hash_reals(h, [BRep_Tool.Tolerance(e)], tol)
+        curve, u1, u2 = BRep_Tool.Curve(e, 0., 0.)
+        if curve is not None:
+            _hash_reals(h, [u1, u2], tol)
+            _hash_geom(h, curve, tol)
+    elif shape_type == TopAbs_FACE:
+        f = topods.Face(shape)
+        _hash_reals(h, [BRep_Tool.Tolerance(f)], tol)
+        surface = BRep_Tool.Surface(f)
+        if surface is not None:
+            _hash_geom(h, surface, tol)
+    fp = h.digest()
+
+    with _node_fingerprints_lock:
+        _node_fingerprints[key] = fp
+        while len(_node_fingerprints) > _node_fingerprints_size:
+            _node_fingerprints.popitem(last=False)
+    return fp
+
+
+def topods_fingerprint(shape, tol=1.0e-7):
+    """
+    Compute a content fingerprint of a shape. The topology graph is hashed
+    using the type, children, and orientation of each unique sub-shape
+    in a canonical order, together with the fingerprints of the underlying
+    points, curves, and surfaces in their located positions. Fingerprints of
+    sub-shapes are cached so shapes that share sub-shapes with ones already
+    fingerprinted are computed incrementally. The cache is keyed on the
+    sub-shape and its tolerance, so a sub-shape whose geometry is changed in
+    place keeps its old fingerprint until the cache is cleared using
+    :func:`clear_fingerprint_cache`.
+
+    :param OCC.Core.TopoDS.TopoDS_Shape shape: The shape.
+    :param float tol: The quantization tolerance.
+
+    :return: The fingerprint as a hexadecimal string.
+    :rtype: str
+    """
+    h = sha256()
+    if shape.IsNull():
+        return h.hexdigest()
+
+    map_ = TopTools_IndexedMapOfShape()
+    topexp.MapShapes(shape, map_)
+    for i in range(1, map_.Extent() + 1):
+        sub_shape = map_.FindKey(i)
+        h.update(_node_fingerprint(sub_shape, tol))
+        children = []
+        it = TopoDS_Iterator(sub_shape)
+        while it.More():
+            child = it.Value()
+            children += [map_.FindIndex(child), int(child.Orientation())]
+            it.Next()
+        _hash_ints(h, [len(children)] + children)
+    _hash_ints(h, [int(shape.Orientation())])
+    return h.hexdigest()
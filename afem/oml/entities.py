@@ -17,7 +17,6 @@
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 from afem.core.entities import ShapeHolder
-from afem.topology.create import FaceBySurface
 from afem.topology.entities import Solid
 from afem.topology.transform import mirror_shape
 
@@ -87,7 +86,7 @@ class Body(ShapeHolder):
 
             # Sref
             if body.sref is not None:
-                face = FaceBySurface(body.sref).face
+                face = body.sref_face
                 label = doc.add_shape(face, body.name, False)
                 label.set_string('SREF')
 
@@ -23,4 +23,5 @@ from afem.structure.explore import *
 from afem.structure.fix import *
 from afem.structure.group import *
 from afem.structure.join import *
+from afem.structure.model import *
 from afem.structure.modify import *
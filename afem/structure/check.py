@@ -17,8 +17,11 @@
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 from afem.structure.entities import Part, SurfacePart, WingPart, Spar, Rib
+from afem.structure.group import GroupAPI
+from afem.topology.check import CheckShape
+from afem.topology.create import CompoundByShapes
 
-__all__ = ["CheckPart"]
+__all__ = ["CheckPart", "CheckGroup"]
 
 
 class CheckPart(object):
@@ -99,3 +102,68 @@ class CheckPart(object):
         :rtype: bool
         """
         return isinstance(part, Rib)
+
+
+class CheckGroup(object):
+    """
+    Check the shapes of all parts in a group. The part shapes are put in a
+    compound and checked by :class:`.CheckShape` so sub-shapes shared
+    between parts are only reported once. Unless *parallel* is used, they
+    are also only checked once.
+
+    :param group: The group. If ``None`` then the active group is used.
+    :type group: str or afem.structure.group.Group or None
+    :param bool include_subgroup: Option to recursively include parts
+        from any subgroups.
+    :param bool geom: Option to check geometry in additional to topology.
+    :param bool parallel: Option to check the parts in separate processes.
+    :param max_workers: The maximum number of worker processes. If *None*
+        then the value in :class:`.Settings` is used.
+    :type max_workers: int or None
+    """
+
+    def __init__(self, group=None, include_subgroup=True, geom=True,
+                 parallel=False, max_workers=None):
+        group = GroupAPI.get_group(group)
+        parts = group.get_parts(include_subgroup, order=True)
+        shape = CompoundByShapes([part.shape for part in parts]).compound
+
+        self._check = CheckShape(shape, geom, parallel, max_workers)
+        self._invalid_parts = []
+        if not self._check.is_valid:
+            for part in parts:
+                if not self._check.is_subshape_valid(part.shape):
+                    self._invalid_parts.append(part)
+
+    @property
+    def is_valid(self):
+        """
+        :return: *True* if the shapes of all parts are valid, *False* if not.
+        :rtype: bool
+        """
+        return self._check.is_valid
+
+    @property
+    def invalid_parts(self):
+        """
+        :return: List of parts with invalid shapes ordered by their ID.
+        :rtype: list(afem.structure.entities.Part)
+        """
+        return self._invalid_parts
+
+    @property
+    def report(self):
+        """
+        :return: Structured array with one row per error. See
+            :attr:`.CheckShape.report`.
+        :rtype: numpy.ndarray
+        """
+        return self._check.report
+
+    @property
+    def tool(self):
+        """
+        :return: The shape checking tool.
+        :rtype: afem.topology.check.CheckShape
+        """
+        return self._check
@@ -16,10 +16,16 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from concurrent.futures import ProcessPoolExecutor
 from math import radians, tan
+from multiprocessing import cpu_count
 from warnings import warn
 
+from OCC.Core.TopTools import TopTools_IndexedMapOfShape
+
 from afem.adaptor.entities import WireAdaptorCurve
+from afem.config import Settings, logger
+from afem.exchange import serialize
 from afem.geometry.check import CheckGeom
 from afem.geometry.create import (NurbsCurveByPoints,
                                   PlanesBetweenPlanesByNumber,
@@ -40,9 +46,10 @@ from afem.topology.bop import (IntersectShapes, CommonShapes, CutShapes,
 from afem.topology.create import (EdgeByCurve, WiresByConnectedEdges,
                                   FaceBySurface, WireByPlanarOffset,
                                   FaceByPlanarWire, WireByConcat,
-                                  EdgeByPoints, CompoundByShapes, WiresByShape)
+                                  EdgeByPoints, CompoundByShapes, WiresByShape,
+                                  FaceByPlane)
 from afem.topology.distance import DistanceShapeToShape
-from afem.topology.entities import Shape, Edge, Wire
+from afem.topology.entities import Shape, Edge, Wire, BBox
 from afem.topology.explore import ExploreFreeEdges
 from afem.topology.modify import SewShape
 from afem.topology.offset import SweepShapeWithNormal, SweepShape
@@ -185,6 +192,252 @@ class PartsBuilder(object):
         """
         return self._next_index
 
+    def _build_parts(self, name, builder, args, first_index, delimiter,
+                     group, type_, parallel, kwargs=None):
+        """
+        Create a part for each set of keyword arguments using the part
+        builder. The keyword arguments in *kwargs* are shared by all the
+        parts. If parallel, the part shapes and reference geometry are built
+        in worker processes and the parts are created here in order so their
+        names and IDs match a serial build. The shared inputs are sent to
+        each worker process only once.
+        """
+        if kwargs is None:
+            kwargs = {}
+        labels = [delimiter.join([name, str(first_index + i)])
+                  for i in range(len(args))]
+
+        max_workers = Settings.max_workers
+        if max_workers is None:
+            max_workers = cpu_count()
+        max_workers = min(max(1, max_workers), len(args))
+
+        if not parallel or max_workers <= 1:
+            parts = []
+            for label, part_kwargs in zip(labels, args):
+                part_kwargs = dict(kwargs, **part_kwargs)
+                part = builder(label, group=group, **part_kwargs).part
+                parts.append(part)
+        else:
+            shared_data = serialize.dumps((builder, kwargs))
+            data = [serialize.dumps((label, part_kwargs))
+                    for label, part_kwargs in zip(labels, args)]
+            with ProcessPoolExecutor(max_workers,
+                                     initializer=_init_worker,
+                                     initargs=(shared_data,)) as executor:
+                results = list(executor.map(_build_part_data, data))
+            parts = []
+            for label, result in zip(labels, results):
+                shape, cref, sref = serialize.loads(result)
+                part = PartBuilder(label, shape, cref, sref, group,
+                                   type_).part
+                parts.append(part)
+
+        self._parts += parts
+        self._next_index = first_index + len(parts)
+
+    def _build_between_shapes(self, name, planes, shape1, shape2, body,
+                              first_index, delimiter, group, type_, batch,
+                              parallel):
+        """
+        Create a surface part between the shapes for each plane.
+        """
+        if batch:
+            parts = _batch_parts_between_shapes(name, planes, shape1, shape2,
+                                                body, first_index, delimiter,
+                                                group, type_)
+            if parts is not None:
+                self._parts += parts
+                self._next_index = first_index + len(parts)
+                return None
+
+        args = [{'basis_shape': FaceBySurface(pln).face} for pln in planes]
+        kwargs = {'shape1': shape1, 'shape2': shape2, 'body': body,
+                  'type_': type_}
+        self._build_parts(name, SurfacePartBetweenShapes, args, first_index,
+                          delimiter, group, type_, parallel, kwargs)
+
+
+# Part builder and shared inputs loaded once per worker process
+_shared_inputs = {}
+
+
+def _init_worker(shared_data):
+    """
+    Load the part builder and shared inputs in a worker process.
+    """
+    builder, kwargs = serialize.loads(shared_data)
+    _shared_inputs.clear()
+    _shared_inputs['builder'] = builder
+    _shared_inputs['kwargs'] = kwargs
+
+
+def _build_part_data(data):
+    """
+    Build a part in a worker process and return its shape and reference
+    geometry.
+    """
+    label, part_kwargs = serialize.loads(data)
+    builder = _shared_inputs['builder']
+    kwargs = dict(_shared_inputs['kwargs'], **part_kwargs)
+    part = builder(label, **kwargs).part
+    return serialize.dumps((part.shape, part.cref, part.sref))
+
+
+def _planes_interfere(planes, bbox):
+    """
+    Check if the intersection line of any two planes passes through the
+    bounding box.
+    """
+    pmin = bbox.CornerMin().Coord()
+    pmax = bbox.CornerMax().Coord()
+
+    data = []
+    for pln in planes:
+        ax3 = pln.gp_pln.Position()
+        n = ax3.Direction().Coord()
+        o = ax3.Location().Coord()
+        data.append((n, sum(ni * oi for ni, oi in zip(n, o))))
+
+    def _cross(a, b):
+        return (a[1] * b[2] - a[2] * b[1],
+                a[2] * b[0] - a[0] * b[2],
+                a[0] * b[1] - a[1] * b[0])
+
+    for i, (n1, h1) in enumerate(data):
+        for n2, h2 in data[i + 1:]:
+            d = _cross(n1, n2)
+            dd = sum(di * di for di in d)
+            if dd < 1.0e-12:
+                # Parallel planes only interfere if they coincide
+                if abs(h1 - h2 * sum(a * b for a, b in zip(n1, n2))) < 1.0e-7:
+                    return True
+                continue
+
+            # Point on the intersection line
+            c1, c2 = _cross(d, n2), _cross(n1, d)
+            p = [(h1 * a + h2 * b) / dd for a, b in zip(c1, c2)]
+
+            # Clip the line by the box
+            tmin, tmax = -float('inf'), float('inf')
+            for k in range(3):
+                if abs(d[k]) < 1.0e-12:
+                    if p[k] < pmin[k] or p[k] > pmax[k]:
+                        tmin, tmax = 1., 0.
+                        break
+                    continue
+                t1 = (pmin[k] - p[k]) / d[k]
+                t2 = (pmax[k] - p[k]) / d[k]
+                tmin = max(tmin, min(t1, t2))
+                tmax = min(tmax, max(t1, t2))
+            if tmin <= tmax:
+                return True
+
+    return False
+
+
+def _batch_parts_between_shapes(name, planes, shape1, shape2, body,
+                                first_index, delimiter, group, type_):
+    """
+    Create a surface part between the shapes for each plane using one section
+    with the body reference shape and one common operation with the body
+    shape for all planes. Returns *None* if the planes cannot be processed
+    together and should be processed one at a time.
+    """
+    if len(planes) < 2:
+        return None
+
+    # Trim the planes to the bounding box of the body
+    bbox = BBox()
+    bbox.add_shape(body.shape)
+    bbox.add_shape(body.sref_shape)
+    if bbox.is_void:
+        return None
+    bbox.enlarge(0.01 * bbox.CornerMin().Distance(bbox.CornerMax()))
+
+    if _planes_interfere(planes, bbox):
+        logger.info('Planes intersect within the body. Creating parts one at '
+                    'a time.')
+        return None
+
+    xmin, ymin, zmin, xmax, ymax, zmax = bbox.Get()
+    corners = [(x, y, z) for x in (xmin, xmax) for y in (ymin, ymax)
+               for z in (zmin, zmax)]
+    faces = []
+    face_map = TopTools_IndexedMapOfShape()
+    for pln in planes:
+        ax3 = pln.gp_pln.Position()
+        o = ax3.Location().Coord()
+        xdir = ax3.XDirection().Coord()
+        ydir = ax3.YDirection().Coord()
+        us, vs = [], []
+        for p in corners:
+            dp = [pi - oi for pi, oi in zip(p, o)]
+            us.append(sum(a * b for a, b in zip(dp, xdir)))
+            vs.append(sum(a * b for a, b in zip(dp, ydir)))
+        face = FaceByPlane(pln, min(us), max(us), min(vs), max(vs)).face
+        faces.append(face)
+        face_map.Add(face.object)
+
+    # Intersect all the planes with the reference shape and distribute the
+    # edges by their ancestor face
+    section = IntersectShapes(approximate=True)
+    section.set_args(faces)
+    section.set_tools([body.sref_shape])
+    section.build()
+    if not section.is_done:
+        return None
+
+    edges = [[] for _ in faces]
+    for e in section.shape.edges:
+        indices = []
+        for has_face, f in (section.has_ancestor_face1(e),
+                            section.has_ancestor_face2(e)):
+            if has_face:
+                indices.append(face_map.FindIndex(f.object))
+        # Skip edges between two planes
+        indices = [i for i in indices if i > 0]
+        if len(indices) == 1:
+            edges[indices[0] - 1].append(e)
+
+    if not all(edges):
+        return None
+
+    # Common operation of all the planes with the body
+    common = CommonShapes()
+    common.set_args(faces)
+    common.set_tools([body.shape])
+    common.build()
+    if not common.is_done:
+        return None
+
+    shape1 = shape_of_entity(shape1)
+    shape2 = shape_of_entity(shape2)
+
+    parts = []
+    for i, (face, face_edges) in enumerate(zip(faces, edges)):
+        wing_basis_edges = CompoundByShapes(face_edges).compound
+        p1 = IntersectShapes(shape1, wing_basis_edges).shape.vertices[0].point
+        p2 = IntersectShapes(shape2, wing_basis_edges).shape.vertices[0].point
+        u1, v1 = body.sref.invert(p1)
+        u2, v2 = body.sref.invert(p2)
+        cref = body.extract_curve(u1, v1, u2, v2, edges=face_edges)
+
+        if common.is_deleted(face):
+            pieces = []
+        else:
+            pieces = common.modified(face)
+            if not pieces:
+                pieces = [face]
+        shape = CompoundByShapes(pieces).compound
+
+        label_indx = delimiter.join([name, str(first_index + i)])
+        part = PartBuilder(label_indx, shape, cref, face.surface, group,
+                           type_).part
+        parts.append(part)
+
+    return parts
+
 
 # CURVE PART ------------------------------------------------------------------
 
@@ -551,11 +804,18 @@ class SurfacePartsBetweenPlanesByNumber(PartsBuilder):
     :type group: str or afem.structure.group.Group or None
     :param Type[afem.structure.entities.Part] type_: The type of part to
         create.
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time. This is only used if
+        the planes do not intersect each other within the body. Otherwise
+        the parts are created one at a time.
+    :param bool parallel: Option to build the parts in worker processes.
+        The parts are created in the same order as a serial build so their
+        names and IDs are the same.
     """
 
     def __init__(self, name, pln1, pln2, n, shape1, shape2, body, d1=None,
                  d2=None, first_index=1, delimiter=' ', group=None,
-                 type_=SurfacePart):
+                 type_=SurfacePart, batch=False, parallel=False):
         super(SurfacePartsBetweenPlanesByNumber, self).__init__()
 
         n = int(n)
@@ -564,14 +824,9 @@ class SurfacePartsBetweenPlanesByNumber(PartsBuilder):
         builder = PlanesBetweenPlanesByNumber(pln1, pln2, n, d1, d2)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            basis_shape = FaceBySurface(pln).face
-            label_indx = delimiter.join([name, str(first_index)])
-            part = SurfacePartBetweenShapes(label_indx, shape1, shape2, body,
-                                            basis_shape, group, type_).part
-            first_index += 1
-            self._parts.append(part)
-        self._next_index = first_index
+        self._build_between_shapes(name, builder.planes, shape1, shape2, body,
+                                   first_index, delimiter, group, type_,
+                                   batch, parallel)
 
 
 class SurfacePartsBetweenPlanesByDistance(PartsBuilder):
@@ -605,11 +860,18 @@ class SurfacePartsBetweenPlanesByDistance(PartsBuilder):
     :type group: str or afem.structure.group.Group or None
     :param Type[afem.structure.entities.Part] type_: The type of part to
         create.
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time. This is only used if
+        the planes do not intersect each other within the body. Otherwise
+        the parts are created one at a time.
+    :param bool parallel: Option to build the parts in worker processes.
+        The parts are created in the same order as a serial build so their
+        names and IDs are the same.
     """
 
     def __init__(self, name, pln1, pln2, maxd, shape1, shape2, body, d1=None,
                  d2=None, nmin=0, first_index=1, delimiter=' ', group=None,
-                 type_=SurfacePart):
+                 type_=SurfacePart, batch=False, parallel=False):
         super(SurfacePartsBetweenPlanesByDistance, self).__init__()
 
         first_index = int(first_index)
@@ -617,14 +879,9 @@ class SurfacePartsBetweenPlanesByDistance(PartsBuilder):
         builder = PlanesBetweenPlanesByDistance(pln1, pln2, maxd, d1, d2, nmin)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            basis_shape = FaceBySurface(pln).face
-            label_indx = delimiter.join([name, str(first_index)])
-            part = SurfacePartBetweenShapes(label_indx, shape1, shape2, body,
-                                            basis_shape, group, type_).part
-            first_index += 1
-            self._parts.append(part)
-        self._next_index = first_index
+        self._build_between_shapes(name, builder.planes, shape1, shape2, body,
+                                   first_index, delimiter, group, type_,
+                                   batch, parallel)
 
 
 class SurfacePartsAlongCurveByNumber(PartsBuilder):
@@ -662,11 +919,19 @@ class SurfacePartsAlongCurveByNumber(PartsBuilder):
     :type group: str or afem.structure.group.Group or None
     :param Type[afem.structure.entities.Part] type_: The type of part to
         create.
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time. This is only used if
+        the planes do not intersect each other within the body. Otherwise
+        the parts are created one at a time.
+    :param bool parallel: Option to build the parts in worker processes.
+        The parts are created in the same order as a serial build so their
+        names and IDs are the same.
     """
 
     def __init__(self, name, crv, n, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None, type_=SurfacePart):
+                 delimiter=' ', tol=1.0e-7, group=None, type_=SurfacePart,
+                 batch=False, parallel=False):
         super(SurfacePartsAlongCurveByNumber, self).__init__()
 
         n = int(n)
@@ -676,14 +941,9 @@ class SurfacePartsAlongCurveByNumber(PartsBuilder):
                                            tol)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            basis_shape = FaceBySurface(pln).face
-            label_indx = delimiter.join([name, str(first_index)])
-            part = SurfacePartBetweenShapes(label_indx, shape1, shape2, body,
-                                            basis_shape, group, type_).part
-            first_index += 1
-            self._parts.append(part)
-        self._next_index = first_index
+        self._build_between_shapes(name, builder.planes, shape1, shape2, body,
+                                   first_index, delimiter, group, type_,
+                                   batch, parallel)
 
 
 class SurfacePartsAlongCurveByDistance(PartsBuilder):
@@ -723,11 +983,19 @@ class SurfacePartsAlongCurveByDistance(PartsBuilder):
     :type group: str or afem.structure.group.Group or None
     :param Type[afem.structure.entities.Part] type_: The type of part to
         create.
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time. This is only used if
+        the planes do not intersect each other within the body. Otherwise
+        the parts are created one at a time.
+    :param bool parallel: Option to build the parts in worker processes.
+        The parts are created in the same order as a serial build so their
+        names and IDs are the same.
     """
 
     def __init__(self, name, crv, maxd, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, nmin=0, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None, type_=SurfacePart):
+                 delimiter=' ', tol=1.0e-7, group=None, type_=SurfacePart,
+                 batch=False, parallel=False):
         super(SurfacePartsAlongCurveByDistance, self).__init__()
 
         first_index = int(first_index)
@@ -736,14 +1004,9 @@ class SurfacePartsAlongCurveByDistance(PartsBuilder):
                                              d2, nmin, tol)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            basis_shape = FaceBySurface(pln).face
-            label_indx = delimiter.join([name, str(first_index)])
-            part = SurfacePartBetweenShapes(label_indx, shape1, shape2, body,
-                                            basis_shape, group, type_).part
-            first_index += 1
-            self._parts.append(part)
-        self._next_index = first_index
+        self._build_between_shapes(name, builder.planes, shape1, shape2, body,
+                                   first_index, delimiter, group, type_,
+                                   batch, parallel)
 
 
 # SPAR ------------------------------------------------------------------------
@@ -917,15 +1180,19 @@ class SparsBetweenPlanesByNumber(SurfacePartsBetweenPlanesByNumber):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time.
+    :param bool parallel: Option to build the parts in worker processes.
     """
 
     def __init__(self, name, pln1, pln2, n, shape1, shape2, body, d1=None,
-                 d2=None, first_index=1, delimiter=' ', group=None):
+                 d2=None, first_index=1, delimiter=' ', group=None,
+                 batch=False, parallel=False):
         super(SparsBetweenPlanesByNumber, self).__init__(name, pln1, pln2, n,
                                                          shape1, shape2, body,
                                                          d1, d2, first_index,
                                                          delimiter, group,
-                                                         Spar)
+                                                         Spar, batch, parallel)
 
 
 class SparsBetweenPlanesByDistance(SurfacePartsBetweenPlanesByDistance):
@@ -957,17 +1224,22 @@ class SparsBetweenPlanesByDistance(SurfacePartsBetweenPlanesByDistance):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time.
+    :param bool parallel: Option to build the parts in worker processes.
     """
 
     def __init__(self, name, pln1, pln2, maxd, shape1, shape2, body, d1=None,
-                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None):
+                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None,
+                 batch=False, parallel=False):
         super(SparsBetweenPlanesByDistance, self).__init__(name, pln1, pln2,
                                                            maxd, shape1,
                                                            shape2, body, d1,
                                                            d2, nmin,
                                                            first_index,
                                                            delimiter,
-                                                           group, Spar)
+                                                           group, Spar,
+                                                           batch, parallel)
 
 
 class SparsAlongCurveByNumber(SurfacePartsAlongCurveByNumber):
@@ -1003,16 +1275,21 @@ class SparsAlongCurveByNumber(SurfacePartsAlongCurveByNumber):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time.
+    :param bool parallel: Option to build the parts in worker processes.
     """
 
     def __init__(self, name, crv, n, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None):
+                 delimiter=' ', tol=1.0e-7, group=None,
+                 batch=False, parallel=False):
         super(SparsAlongCurveByNumber, self).__init__(name, crv, n, shape1,
                                                       shape2, body, ref_pln,
                                                       u1, u2, d1, d2,
                                                       first_index, delimiter,
-                                                      tol, group, Spar)
+                                                      tol, group, Spar,
+                                                      batch, parallel)
 
 
 class SparsAlongCurveByDistance(SurfacePartsAlongCurveByDistance):
@@ -1050,17 +1327,21 @@ class SparsAlongCurveByDistance(SurfacePartsAlongCurveByDistance):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time.
+    :param bool parallel: Option to build the parts in worker processes.
     """
 
     def __init__(self, name, crv, maxd, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, nmin=0, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None):
+                 delimiter=' ', tol=1.0e-7, group=None,
+                 batch=False, parallel=False):
         super(SparsAlongCurveByDistance, self).__init__(name, crv, maxd,
                                                         shape1, shape2, body,
                                                         ref_pln, u1, u2, d1,
                                                         d2, nmin, first_index,
                                                         delimiter, tol, group,
-                                                        Spar)
+                                                        Spar, batch, parallel)
 
 
 # RIB -------------------------------------------------------------------------
@@ -1258,14 +1539,19 @@ class RibsBetweenPlanesByNumber(SurfacePartsBetweenPlanesByNumber):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time.
+    :param bool parallel: Option to build the parts in worker processes.
     """
 
     def __init__(self, name, pln1, pln2, n, shape1, shape2, body, d1=None,
-                 d2=None, first_index=1, delimiter=' ', group=None):
+                 d2=None, first_index=1, delimiter=' ', group=None,
+                 batch=False, parallel=False):
         super(RibsBetweenPlanesByNumber, self).__init__(name, pln1, pln2, n,
                                                         shape1, shape2, body,
                                                         d1, d2, first_index,
-                                                        delimiter, group, Rib)
+                                                        delimiter, group, Rib,
+                                                        batch, parallel)
 
 
 class RibsBetweenPlanesByDistance(SurfacePartsBetweenPlanesByDistance):
@@ -1297,17 +1583,22 @@ class RibsBetweenPlanesByDistance(SurfacePartsBetweenPlanesByDistance):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time.
+    :param bool parallel: Option to build the parts in worker processes.
     """
 
     def __init__(self, name, pln1, pln2, maxd, shape1, shape2, body, d1=None,
-                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None):
+                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None,
+                 batch=False, parallel=False):
         super(RibsBetweenPlanesByDistance, self).__init__(name, pln1, pln2,
                                                           maxd, shape1,
                                                           shape2, body, d1,
                                                           d2, nmin,
                                                           first_index,
                                                           delimiter,
-                                                          group, Rib)
+                                                          group, Rib,
+                                                          batch, parallel)
 
 
 class RibsAlongCurveByNumber(SurfacePartsAlongCurveByNumber):
@@ -1343,16 +1634,21 @@ class RibsAlongCurveByNumber(SurfacePartsAlongCurveByNumber):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time.
+    :param bool parallel: Option to build the parts in worker processes.
     """
 
     def __init__(self, name, crv, n, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None):
+                 delimiter=' ', tol=1.0e-7, group=None,
+                 batch=False, parallel=False):
         super(RibsAlongCurveByNumber, self).__init__(name, crv, n, shape1,
                                                      shape2, body, ref_pln,
                                                      u1, u2, d1, d2,
                                                      first_index, delimiter,
-                                                     tol, group, Rib)
+                                                     tol, group, Rib,
+                                                     batch, parallel)
 
 
 class RibsAlongCurveByDistance(SurfacePartsAlongCurveByDistance):
@@ -1390,17 +1686,21 @@ class RibsAlongCurveByDistance(SurfacePartsAlongCurveByDistance):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool batch: Option to intersect all the planes with the body in
+        one operation rather than one plane at a time.
+    :param bool parallel: Option to build the parts in worker processes.
     """
 
     def __init__(self, name, crv, maxd, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, nmin=0, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None):
+                 delimiter=' ', tol=1.0e-7, group=None,
+                 batch=False, parallel=False):
         super(RibsAlongCurveByDistance, self).__init__(name, crv, maxd,
                                                        shape1, shape2, body,
                                                        ref_pln, u1, u2, d1,
                                                        d2, nmin, first_index,
                                                        delimiter, tol, group,
-                                                       Rib)
+                                                       Rib, batch, parallel)
 
 
 class RibsAlongCurveAndSurfaceByDistance(PartsBuilder):
@@ -1439,11 +1739,15 @@ class RibsAlongCurveAndSurfaceByDistance(PartsBuilder):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool parallel: Option to build the parts in worker processes.
+        The parts are created in the same order as a serial build so their
+        names and IDs are the same.
     """
 
     def __init__(self, name, crv, srf, maxd, shape1, shape2, body,
                  u1=None, u2=None, d1=None, d2=None, rot_x=None, rot_y=None,
-                 nmin=0, first_index=1, delimiter=' ', tol=1.0e-7, group=None):
+                 nmin=0, first_index=1, delimiter=' ', tol=1.0e-7, group=None,
+                 parallel=False):
         super(RibsAlongCurveAndSurfaceByDistance, self).__init__()
 
         first_index = int(first_index)
@@ -1456,14 +1760,11 @@ class RibsAlongCurveAndSurfaceByDistance(PartsBuilder):
             builder.rotate_y(rot_y)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            basis_shape = FaceBySurface(pln).face
-            label_indx = delimiter.join([name, str(first_index)])
-            part = RibBetweenShapes(label_indx, shape1, shape2, body,
-                                    basis_shape, group).part
-            first_index += 1
-            self._parts.append(part)
-        self._next_index = first_index
+        args = [{'basis_shape': FaceBySurface(pln).face}
+                for pln in builder.planes]
+        kwargs = {'shape1': shape1, 'shape2': shape2, 'body': body}
+        self._build_parts(name, RibBetweenShapes, args, first_index,
+                          delimiter, group, Rib, parallel, kwargs)
 
 
 # BULKHEAD --------------------------------------------------------------------
@@ -1611,20 +1912,21 @@ class FramesByPlanes(PartsBuilder):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool parallel: Option to build the parts in worker processes.
+        The parts are created in the same order as a serial build so their
+        names and IDs are the same.
     """
 
     def __init__(self, name, plns, body, height, first_index=1,
-                 delimiter=' ', group=None):
+                 delimiter=' ', group=None, parallel=False):
         super(FramesByPlanes, self).__init__()
 
         first_index = int(first_index)
 
-        for pln in plns:
-            label_indx = delimiter.join([name, str(first_index)])
-            frame = FrameByPlane(label_indx, pln, body, height, group).part
-            first_index += 1
-            self._parts.append(frame)
-        self._next_index = first_index
+        args = [{'pln': pln} for pln in plns]
+        kwargs = {'body': body, 'height': height}
+        self._build_parts(name, FrameByPlane, args, first_index, delimiter,
+                          group, Frame, parallel, kwargs)
 
 
 class FramesBetweenPlanesByNumber(PartsBuilder):
@@ -1649,10 +1951,14 @@ class FramesBetweenPlanesByNumber(PartsBuilder):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool parallel: Option to build the parts in worker processes.
+        The parts are created in the same order as a serial build so their
+        names and IDs are the same.
     """
 
     def __init__(self, name, pln1, pln2, n, body, height, d1=None,
-                 d2=None, first_index=1, delimiter=' ', group=None):
+                 d2=None, first_index=1, delimiter=' ', group=None,
+                 parallel=False):
         super(FramesBetweenPlanesByNumber, self).__init__()
 
         n = int(n)
@@ -1661,12 +1967,10 @@ class FramesBetweenPlanesByNumber(PartsBuilder):
         builder = PlanesBetweenPlanesByNumber(pln1, pln2, n, d1, d2)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            label_indx = delimiter.join([name, str(first_index)])
-            frame = FrameByPlane(label_indx, pln, body, height, group).part
-            first_index += 1
-            self._parts.append(frame)
-        self._next_index = first_index
+        args = [{'pln': pln} for pln in builder.planes]
+        kwargs = {'body': body, 'height': height}
+        self._build_parts(name, FrameByPlane, args, first_index, delimiter,
+                          group, Frame, parallel, kwargs)
 
 
 class FramesBetweenPlanesByDistance(PartsBuilder):
@@ -1693,10 +1997,14 @@ class FramesBetweenPlanesByDistance(PartsBuilder):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param bool parallel: Option to build the parts in worker processes.
+        The parts are created in the same order as a serial build so their
+        names and IDs are the same.
     """
 
     def __init__(self, name, pln1, pln2, maxd, body, height, d1=None,
-                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None):
+                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None,
+                 parallel=False):
         super(FramesBetweenPlanesByDistance, self).__init__()
 
         first_index = int(first_index)
@@ -1704,12 +2012,10 @@ class FramesBetweenPlanesByDistance(PartsBuilder):
         builder = PlanesBetweenPlanesByDistance(pln1, pln2, maxd, d1, d2, nmin)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            label_indx = delimiter.join([name, str(first_index)])
-            frame = FrameByPlane(label_indx, pln, body, height, group).part
-            first_index += 1
-            self._parts.append(frame)
-        self._next_index = first_index
+        args = [{'pln': pln} for pln in builder.planes]
+        kwargs = {'body': body, 'height': height}
+        self._build_parts(name, FrameByPlane, args, first_index, delimiter,
+                          group, Frame, parallel, kwargs)
 
 
 # SKIN ------------------------------------------------------------------------
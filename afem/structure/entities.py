@@ -16,7 +16,8 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
-from numpy import mean
+from OCC.Core.TopTools import TopTools_IndexedMapOfShape
+from numpy import array, float64, isfinite, maximum, mean, sqrt, zeros
 
 from afem.config import logger
 from afem.core.entities import ShapeHolder
@@ -25,19 +26,21 @@ from afem.geometry.create import (PlaneByNormal, PointsAlongCurveByNumber)
 from afem.geometry.entities import Axis1
 from afem.structure.group import GroupAPI
 from afem.structure.utils import shape_of_entity
-from afem.topology.bop import (CutCylindricalHole, CutShapes, FuseShapes,
-                               IntersectShapes, LocalSplit, SplitShapes)
-from afem.topology.check import CheckShape, ClassifyPointInSolid
-from afem.topology.create import (CompoundByShapes, HalfspaceBySurface,
-                                  PointAlongShape, WiresByShape, FaceByPlane,
-                                  SolidByDrag)
+from afem.topology.bop import (CutCylindricalHole, CutCylindricalHoles,
+                               CutShapes, FuseShapes, IntersectShapes,
+                               LocalSplit, SplitShapes)
+from afem.topology.check import CheckShape, ClassifyPointsInSolid
+from afem.topology.create import (CompoundByShapes, FaceByPlane,
+                                  PointAlongShape, WiresByShape)
 from afem.topology.distance import DistanceShapeToShape
-from afem.topology.entities import Shape, Edge, Wire, Face, Shell, Compound
+from afem.topology.entities import (Shape, Edge, Wire, Face, Shell, Compound,
+                                    BBox)
 from afem.topology.fix import FixShape
 from afem.topology.modify import (RebuildShapeByTool,
                                   RebuildShapeWithShapes, RebuildShapesByTool,
                                   SewShape, UnifyShape)
 from afem.topology.props import LengthOfShapes, LinearProps, SurfaceProps
+from afem.topology.spatial import shape_boxes
 
 __all__ = ["Part", "CurvePart", "Beam1D", "SurfacePart", "WingPart", "Spar",
            "Rib", "FuselagePart", "Bulkhead", "Floor", "Frame", "Skin",
@@ -62,6 +65,9 @@ class Part(ShapeHolder):
     _indx = 1
 
     def __init__(self, name, shape, cref=None, sref=None, group=None):
+        # Groups containing this part so their spatial index can be updated
+        self._groups = set()
+
         types = (Shape,)
         if isinstance(self, CurvePart):
             types = (Edge, Wire, Compound)
@@ -85,6 +91,21 @@ class Part(ShapeHolder):
         self._edge_group = None
         self._face_group = None
 
+    def __getstate__(self):
+        """
+        Do not pickle the groups of the part.
+        """
+        state = super(Part, self).__getstate__()
+        del state['_groups']
+        return state
+
+    def __setstate__(self, state):
+        """
+        A loaded part is not added to any group.
+        """
+        super(Part, self).__setstate__(state)
+        self._groups = set()
+
     @property
     def id(self):
         """
@@ -93,6 +114,41 @@ class Part(ShapeHolder):
         """
         return self._id
 
+    @property
+    def groups(self):
+        """
+        :return: The groups that directly contain this part.
+        :rtype: list(afem.structure.group.Group)
+        """
+        return list(self._groups)
+
+    def set_name(self, name):
+        """
+        Set the name. The name registry of each group containing this part
+        is updated.
+
+        :param str name: The name.
+
+        :return: None.
+        """
+        old_name = self.name
+        super(Part, self).set_name(name)
+        for group in self._groups:
+            group.update_name(self, old_name)
+
+    def set_shape(self, shape):
+        """
+        Set the shape. The spatial index of each group containing this part
+        is marked for update.
+
+        :param afem.topology.entities.Shape shape: The shape.
+
+        :return: None.
+        """
+        super(Part, self).set_shape(shape)
+        for group in self._groups:
+            group.update_index(self)
+
     # @property
     # def node_group(self):
     #     """
@@ -273,6 +329,61 @@ class Part(ShapeHolder):
         self.set_shape(new_shape)
         return True
 
+    def _discard_shapes(self):
+        """
+        Get the shapes of the part that are checked by the discard methods.
+        """
+        if isinstance(self, CurvePart):
+            return self.shape.edges
+        elif isinstance(self, SurfacePart):
+            return self.shape.faces
+        msg = 'Invalid part type in discard operation.'
+        raise TypeError(msg)
+
+    def _centroids(self, shapes):
+        """
+        Compute the centroids of the shapes as an array with shape (n, 3).
+        """
+        if isinstance(self, CurvePart):
+            cgs = [LinearProps(shape).cg.xyz for shape in shapes]
+        else:
+            cgs = [SurfaceProps(shape).cg.xyz for shape in shapes]
+        if not cgs:
+            return zeros((0, 3), dtype=float64)
+        return array(cgs, dtype=float64)
+
+    def _discard(self, shapes, flags):
+        """
+        Remove the flagged shapes from the part in a single rebuild.
+        """
+        if not flags.any():
+            return False
+
+        rebuild = RebuildShapeWithShapes(self._shape)
+        for shape, flag in zip(shapes, flags):
+            if flag:
+                rebuild.remove(shape)
+
+        new_shape = rebuild.apply()
+        self.set_shape(new_shape)
+        return True
+
+    def _distance_bounds(self, shapes, entity):
+        """
+        Compute a lower bound of the distance between each shape and the
+        entity using their bounding boxes. The bound is zero if the boxes
+        overlap or are not finite.
+        """
+        boxes = shape_boxes(shapes)
+        box = shape_boxes([entity])[0]
+        if not isfinite(box).all():
+            return zeros(len(shapes), dtype=float64)
+        gap = maximum(maximum(box[:3] - boxes[:, 3:], boxes[:, :3] - box[3:]),
+                      0.)
+        dmin = sqrt((gap * gap).sum(axis=1))
+        dmin[~isfinite(dmin)] = 0.
+        return dmin
+
     def discard_by_solid(self, solid, tol=None):
         """
         Discard shapes of the part using a solid. Any shapes of the part that
@@ -288,45 +399,23 @@ class Part(ShapeHolder):
 
         :raise TypeError: If this part is not a curve or surface part.
         """
-        if isinstance(self, CurvePart):
-            shapes = self.shape.edges
-        elif isinstance(self, SurfacePart):
-            shapes = self.shape.faces
-        else:
-            msg = 'Invalid part type in discard operation.'
-            raise TypeError(msg)
+        shapes = self._discard_shapes()
 
         if tol is None:
             tol = self.shape.tol_avg
 
-        rebuild = RebuildShapeWithShapes(self._shape)
-        classifer = ClassifyPointInSolid(solid, tol=tol)
-
-        modified = False
-        for shape in shapes:
-            if isinstance(self, CurvePart):
-                cg = LinearProps(shape).cg
-            else:
-                cg = SurfaceProps(shape).cg
-
-            classifer.perform(cg, tol)
-            if classifer.is_in:
-                rebuild.remove(shape)
-                modified = True
-
-        if not modified:
-            return False
-
-        new_shape = rebuild.apply()
-        self.set_shape(new_shape)
-        return True
+        cgs = self._centroids(shapes)
+        is_in = ClassifyPointsInSolid(solid, cgs, tol).is_in
+        return self._discard(shapes, is_in)
 
     def discard_by_dmax(self, entity, dmax):
         """
         Discard shapes of the part using a shape and a distance. If the
         distance between a shape of the part and the given shape is greater
         than *dmax*, then the shape is removed. Edges are checked
-        for curve parts and faces are checked for surface parts.
+        for curve parts and faces are checked for surface parts. The exact
+        distance is only computed for shapes whose bounding box is within
+        *dmax* of the bounding box of the given shape.
 
         :param entity: The shape.
         :type entity: afem.topology.entities.Shape or
@@ -339,37 +428,25 @@ class Part(ShapeHolder):
         :raise TypeError: If this part is not a curve or surface part.
         """
         entity = Shape.to_shape(entity)
+        shapes = self._discard_shapes()
 
-        if isinstance(self, CurvePart):
-            shapes = self.shape.edges
-        elif isinstance(self, SurfacePart):
-            shapes = self.shape.faces
-        else:
-            msg = 'Invalid part type in discard operation.'
-            raise TypeError(msg)
-
-        rebuild = RebuildShapeWithShapes(self._shape)
-
-        modified = False
-        for part_shape in shapes:
-            dmin = DistanceShapeToShape(entity, part_shape).dmin
-            if dmin > dmax:
-                rebuild.remove(part_shape)
-                modified = True
-
-        if not modified:
-            return False
+        bounds = self._distance_bounds(shapes, entity)
+        flags = bounds > dmax
+        for i, part_shape in enumerate(shapes):
+            if not flags[i]:
+                dmin = DistanceShapeToShape(entity, part_shape).dmin
+                flags[i] = dmin > dmax
 
-        new_shape = rebuild.apply()
-        self.set_shape(new_shape)
-        return True
+        return self._discard(shapes, flags)
 
     def discard_by_dmin(self, entity, dmin):
         """
         Discard shapes of the part using a shape and a distance. If the
         distance between a shape of the part and the given shape is less
         than *dmin*, then the shape is removed. Edges are checked
-        for curve parts and faces are checked for surface parts.
+        for curve parts and faces are checked for surface parts. The exact
+        distance is only computed for shapes whose bounding box is within
+        *dmin* of the bounding box of the given shape.
 
         :param entity: The shape.
         :type entity: afem.topology.entities.Shape or
@@ -382,45 +459,36 @@ class Part(ShapeHolder):
         :raise TypeError: If this part is not a curve or surface part.
         """
         entity = Shape.to_shape(entity)
+        shapes = self._discard_shapes()
 
-        if isinstance(self, CurvePart):
-            shapes = self.shape.edges
-        elif isinstance(self, SurfacePart):
-            shapes = self.shape.faces
-        else:
-            msg = 'Invalid part type in discard operation.'
-            raise TypeError(msg)
-
-        rebuild = RebuildShapeWithShapes(self._shape)
-
-        modified = False
-        for part_shape in shapes:
-            dmin_ = DistanceShapeToShape(entity, part_shape).dmin
-            if dmin > dmin_:
-                rebuild.remove(part_shape)
-                modified = True
+        bounds = self._distance_bounds(shapes, entity)
+        flags = zeros(len(shapes), dtype=bool)
+        for i, part_shape in enumerate(shapes):
+            if bounds[i] < dmin:
+                dmin_ = DistanceShapeToShape(entity, part_shape).dmin
+                flags[i] = dmin > dmin_
 
-        if not modified:
-            return False
-
-        new_shape = rebuild.apply()
-        self.set_shape(new_shape)
-        return True
+        return self._discard(shapes, flags)
 
     def discard_by_cref(self, size=None):
         """
-        Discard shapes of the part by using the reference curve. An infinite
-        solid is created at each end of the reference curve using the curve
-        tangent. Any shape that has a centroid in these solids is removed.
-        For a curve part edges are discarded, for a SurfacePart faces are
+        Discard shapes of the part by using the reference curve. A plane is
+        created at each end of the reference curve using the curve tangent.
+        Any shape that has a centroid beyond these planes is removed. For a
+        curve part edges are discarded, for a SurfacePart faces are
         discarded.
 
-        :param float size: Option to define a finite solid box which might be
-            more robust than an infinite solid.
+        :param float size: Option to only discard shapes with centroids
+            within a finite box at each end of the reference curve. The box
+            is centered on the end of the curve and extends *size* beyond it.
 
         :return: *True* if shapes were discard, *False* if not.
         :rtype: bool
         """
+        shapes = self._discard_shapes()
+        cgs = self._centroids(shapes)
+        tol = self.shape.tol_avg
+
         # Create vectors at each end of the reference curve pointing "out" of
         # the part
         u1, u2 = self._cref.u1, self._cref.u2
@@ -429,33 +497,24 @@ class Part(ShapeHolder):
         # Reverse v1 so it's "out" of the part
         v1.reverse()
 
-        # Create planes at each end
-        p1 = self._cref.eval(u1)
-        p2 = self._cref.eval(u2)
-        pln1 = PlaneByNormal(p1, v1).plane
-        pln2 = PlaneByNormal(p2, v2).plane
-
-        # Translate points to define half space
-        if size is None:
-            pref1 = p1 + 100. * v1.ijk
-            pref2 = p2 + 100. * v2.ijk
-            hs1 = HalfspaceBySurface(pln1, pref1).solid
-            hs2 = HalfspaceBySurface(pln2, pref2).solid
-        else:
-            w, h = 2 * [size / 2.]
-            f1 = FaceByPlane(pln1, -w, w, -h, h).face
-            f2 = FaceByPlane(pln2, -w, w, -h, h).face
-            v1.normalize()
-            v2.normalize()
-            v1.scale(size)
-            v2.scale(size)
-            hs1 = SolidByDrag(f1, v1).solid
-            hs2 = SolidByDrag(f2, v2).solid
-
-        # Discard by solid
-        status1 = self.discard_by_solid(hs1)
-        status2 = self.discard_by_solid(hs2)
-        return status1 or status2
+        # Classify the centroids against the half space at each end
+        flags = zeros(len(shapes), dtype=bool)
+        for u, v in [(u1, v1), (u2, v2)]:
+            v.normalize()
+            p = self._cref.eval(u)
+            dp = cgs - p.xyz
+            is_out = dp.dot(v.ijk) > tol
+            if size is not None:
+                ax3 = PlaneByNormal(p, v).plane.gp_pln.Position()
+                xdir = array(ax3.XDirection().Coord(), dtype=float64)
+                ydir = array(ax3.YDirection().Coord(), dtype=float64)
+                w = size / 2. - tol
+                is_out &= dp.dot(v.ijk) < size - tol
+                is_out &= abs(dp.dot(xdir)) < w
+                is_out &= abs(dp.dot(ydir)) < w
+            flags |= is_out
+
+        return self._discard(shapes, flags)
 
     def shared_vertices(self, other, as_compound=False):
         """
@@ -730,19 +789,94 @@ class SurfacePart(Part):
 
         return bop.is_done
 
+    def hole_axes(self, parameters):
+        """
+        Find the axes of holes at parameters along the reference curve. The
+        part is intersected with a plane at each parameter in one operation.
+        Each axis is located at the middle of the longest intersection wire
+        of its plane and is normal to the reference surface.
+
+        :param collections.Sequence(float) parameters: The parameters on the
+            reference curve.
+
+        :return: The axis of each hole. The axis is *None* if a location
+            could not be found.
+        :rtype: list(afem.geometry.entities.Axis1 or None)
+        """
+        plns = [self.plane_from_parameter(0., u) for u in parameters]
+        if not plns:
+            return []
+
+        # Planes sized to cover the part
+        bbox = BBox()
+        bbox.add_shape(self._shape)
+        h = bbox.diagonal
+        faces = [FaceByPlane(pln, -h, h, -h, h).face for pln in plns]
+        face_map = TopTools_IndexedMapOfShape()
+        for face in faces:
+            face_map.Add(face.object)
+
+        # Intersect all planes at once and sort the edges by plane
+        section = IntersectShapes()
+        section.set_args([self._shape])
+        section.set_tools(faces)
+        section.build()
+        edges = [[] for _ in faces]
+        if section.is_done:
+            for e in section.shape.edges:
+                indices = []
+                for has_face, f in (section.has_ancestor_face1(e),
+                                    section.has_ancestor_face2(e)):
+                    if has_face:
+                        i = face_map.FindIndex(f.object)
+                        if i > 0:
+                            indices.append(i)
+                # Skip edges between two planes
+                if len(indices) == 1:
+                    edges[indices[0] - 1].append(e)
+
+        axes = []
+        for plane_edges in edges:
+            if not plane_edges:
+                axes.append(None)
+                continue
+            shape = CompoundByShapes(plane_edges).compound
+            wires = WiresByShape(shape).wires
+            los = LengthOfShapes(wires)
+            wire = los.longest_shape
+            if not isinstance(wire, Wire):
+                axes.append(None)
+                continue
+            p = PointAlongShape(wire, los.max_length / 2.).point
+            u, v = self.sref.invert(p)
+            v = CheckGeom.to_direction(self.sref.norm(u, v))
+            axes.append(Axis1(p, v))
+        return axes
+
     def cut_holes(self, n, d):
         """
         Cut holes along the reference curve at evenly spaced intervals
-        (experimental).
+        (experimental). The hole locations are found using
+        :meth:`.hole_axes` and all holes are cut in one Boolean operation.
 
         :param int n: The number of holes.
         :param float d: The diameter.
 
-        :return: None.
+        :return: *True* if the holes were cut, *False* if not.
+        :rtype: bool
         """
         pac = PointsAlongCurveByNumber(self.cref, n + 2)
-        for u in pac.parameters[1:-1]:
-            self.cut_hole(d, 0., u)
+        axes = self.hole_axes(pac.parameters[1:-1])
+        axes = [ax1 for ax1 in axes if ax1 is not None]
+        if not axes:
+            return False
+
+        bop = CutCylindricalHoles(self._shape, d / 2., axes)
+        if not bop.is_done:
+            return False
+
+        self.rebuild(bop)
+        return True
 
 
 class WingPart(SurfacePart):
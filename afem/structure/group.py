@@ -16,17 +16,91 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from collections import OrderedDict
+
+from numpy import concatenate
+
 from afem.base.entities import NamedItem
 from afem.exchange.xde import XdeDocument
+from afem.geometry.check import CheckGeom
+from afem.occ.utils import clear_fingerprint_cache
 from afem.structure.utils import order_parts_by_id
-from afem.topology.create import CompoundByShapes, EdgeByCurve, FaceBySurface
+from afem.topology.create import CompoundByShapes
+from afem.topology.distance import DistanceShapeToShape
+from afem.topology.entities import BBox, Shape, Vertex
+from afem.topology.props import PropsCache
+from afem.topology.spatial import AABBTree, shape_boxes
 
 __all__ = ["Group", "GroupAPI"]
 
+# Recently built compounds of part shapes
+_compounds = OrderedDict()
+_COMPOUNDS_SIZE = 16
+
+
+class _PartIndex(object):
+    """
+    Spatial index over the faces (or edges if the part has no faces) of the
+    parts in a group. Bounding boxes are only recomputed for parts that were
+    added or changed since the last query.
+    """
+
+    def __init__(self):
+        self._leaves = {}
+        self._dirty = set()
+        self._tree = None
+        self._items = []
+
+    def add(self, part):
+        self._dirty.add(part)
+
+    def remove(self, part):
+        self._dirty.discard(part)
+        if self._leaves.pop(part, None) is not None:
+            self._tree = None
+
+    @staticmethod
+    def _leaf_shapes(part):
+        shape = part.shape
+        if not isinstance(shape, Shape) or shape.is_null:
+            return []
+        shapes = shape.faces
+        if not shapes:
+            shapes = shape.edges
+        if not shapes:
+            shapes = [shape]
+        return shapes
+
+    @property
+    def tree(self):
+        if self._dirty:
+            for part in self._dirty:
+                shapes = self._leaf_shapes(part)
+                self._leaves[part] = (shapes, shape_boxes(shapes))
+            self._dirty.clear()
+            self._tree = None
+
+        if self._tree is None:
+            items, boxes = [], []
+            for part, (shapes, part_boxes) in self._leaves.items():
+                items += [(part, shape) for shape in shapes]
+                boxes.append(part_boxes)
+            self._items = items
+            if boxes:
+                boxes = concatenate(boxes)
+            self._tree = AABBTree(boxes)
+        return self._tree
+
+    def item(self, i):
+        return self._items[i]
+
 
 class Group(NamedItem):
     """
-    Group of parts.
+    Group of parts. Parts are registered by name, ID, and type so they can be
+    found without searching all the parts, and the results of
+    :meth:`.get_parts` are cached until the group or one of its subgroups
+    changes.
 
     :param str name: The name.
     :param parent: The parent group, if any.
@@ -38,8 +112,14 @@ class Group(NamedItem):
         self._parent = parent
         self._children = set()
         self._parts = set()
+        self._index = _PartIndex()
+        self._by_name = {}
+        self._by_id = {}
+        self._by_type = {}
+        self._views = {}
         if isinstance(self._parent, Group):
             self._parent._children.add(self)
+            self._parent._invalidate()
 
     @property
     def parent(self):
@@ -73,8 +153,44 @@ class Group(NamedItem):
 
         :return: None.
         """
-        part_set = set(parts)
-        self._parts.update(part_set)
+        for part in parts:
+            if part in self._parts:
+                continue
+            self._parts.add(part)
+            self._by_name.setdefault(part.name, []).append(part)
+            self._by_id[part.id] = part
+            self._by_type.setdefault(type(part), set()).add(part)
+            part._groups.add(self)
+            self._index.add(part)
+        self._invalidate()
+
+    def _invalidate(self):
+        """
+        Clear the cached part lists of this group and its parents.
+        """
+        group = self
+        while isinstance(group, Group):
+            group._views.clear()
+            group = group._parent
+
+    def update_name(self, part, old_name):
+        """
+        Update the name registry of the group after a part is renamed. This
+        is called automatically when the name of a part is set.
+
+        :param afem.structure.entities.Part part: The part.
+        :param str old_name: The previous name of the part.
+
+        :return: None.
+        """
+        if part not in self._parts:
+            return None
+        parts = self._by_name.get(old_name, [])
+        if part in parts:
+            parts.remove(part)
+            if not parts:
+                del self._by_name[old_name]
+        self._by_name.setdefault(part.name, []).append(part)
 
     def get_part(self, name):
         """
@@ -87,11 +203,28 @@ class Group(NamedItem):
 
         :raise KeyError: If the part is not found.
         """
-        for part in self.parts:
-            if part.name == name:
-                return part
-        raise KeyError('Part with given name could not be found in the '
-                       'group.')
+        try:
+            return self._by_name[name][0]
+        except KeyError:
+            raise KeyError('Part with given name could not be found in the '
+                           'group.')
+
+    def get_part_by_id(self, pid):
+        """
+        Get a part in the group by its ID.
+
+        :param int pid: Part ID.
+
+        :return: The part.
+        :rtype: afem.structure.entities.Part
+
+        :raise KeyError: If the part is not found.
+        """
+        try:
+            return self._by_id[pid]
+        except KeyError:
+            raise KeyError('Part with given ID could not be found in the '
+                           'group.')
 
     def get_parts(self, include_subgroup=True, rtype=None, order=False):
         """
@@ -107,21 +240,32 @@ class Group(NamedItem):
         :return: List of parts.
         :rtype: list(afem.structure.entities.Part)
         """
-        parts = []
-        for part in self.parts:
-            if rtype is None:
-                parts.append(part)
-            else:
-                if isinstance(part, rtype):
-                    parts.append(part)
+        key = (include_subgroup, rtype, order)
+        try:
+            return list(self._views[key])
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable type filter
+            key = None
+
+        if rtype is None:
+            parts = list(self._parts)
+        else:
+            parts = []
+            for type_, type_parts in self._by_type.items():
+                if issubclass(type_, rtype):
+                    parts += type_parts
 
         if include_subgroup:
             for group in self._children:
                 parts += group.get_parts(True, rtype)
 
-        if not order:
-            return parts
-        return order_parts_by_id(parts)
+        if order:
+            parts = order_parts_by_id(parts)
+        if key is not None:
+            self._views[key] = tuple(parts)
+        return parts
 
     def remove_part(self, name):
         """
@@ -132,7 +276,193 @@ class Group(NamedItem):
         :return: None.
         """
         part = self.get_part(name)
+        self._remove(part)
+
+    def _remove(self, part):
+        """
+        Remove a part from the group.
+        """
         self._parts.discard(part)
+        parts = self._by_name[part.name]
+        parts.remove(part)
+        if not parts:
+            del self._by_name[part.name]
+        if self._by_id.get(part.id) is part:
+            del self._by_id[part.id]
+        self._by_type[type(part)].discard(part)
+        part._groups.discard(self)
+        self._index.remove(part)
+        self._invalidate()
+
+    def update_index(self, part):
+        """
+        Mark a part for update in the spatial index of the group. This is
+        called automatically when the shape of a part is set.
+
+        :param afem.structure.entities.Part part: The part.
+
+        :return: None.
+        """
+        if part in self._parts:
+            self._index.add(part)
+
+    def _query(self, method, include_subgroup, rtype, *args):
+        """
+        Run a spatial query on this group and optionally its subgroups and
+        collect the unique parts found.
+        """
+        found = []
+        groups = [self]
+        while groups:
+            group = groups.pop()
+            index = group._index
+            indx = getattr(index.tree, method)(*args)
+            if isinstance(indx, tuple):
+                indx = indx[0]
+            for i in indx:
+                part = index.item(i)[0]
+                if rtype is None or isinstance(part, rtype):
+                    found.append(part)
+            if include_subgroup:
+                groups += list(group._children)
+        return order_parts_by_id(set(found))
+
+    def query_box(self, bbox, include_subgroup=True, rtype=None):
+        """
+        Find parts whose face or edge bounding boxes intersect the box.
+
+        :param afem.topology.entities.BBox bbox: The box.
+        :param bool include_subgroup: Option to recursively include parts
+            from any subgroups.
+        :param rtype: Option to return only parts of a certain type. Provide a
+            class to check if the part is of the given type using
+            *isinstance()*.
+
+        :return: List of parts ordered by their ID.
+        :rtype: list(afem.structure.entities.Part)
+        """
+        if bbox.is_void:
+            return []
+        xyz = bbox.Get()
+        return self._query('query_box', include_subgroup, rtype, xyz[:3],
+                           xyz[3:])
+
+    def query_plane(self, pln, tol=0., include_subgroup=True, rtype=None):
+        """
+        Find parts whose face or edge bounding boxes are crossed by a plane.
+
+        :param afem.geometry.entities.Plane pln: The plane.
+        :param float tol: Tolerance added to the bounding boxes.
+        :param bool include_subgroup: Option to recursively include parts
+            from any subgroups.
+        :param rtype: Option to return only parts of a certain type. Provide a
+            class to check if the part is of the given type using
+            *isinstance()*.
+
+        :return: List of parts ordered by their ID.
+        :rtype: list(afem.structure.entities.Part)
+        """
+        ax = pln.gp_pln.Axis()
+        p, d = ax.Location(), ax.Direction()
+        return self._query('query_plane', include_subgroup, rtype,
+                           (p.X(), p.Y(), p.Z()), (d.X(), d.Y(), d.Z()), tol)
+
+    def query_ray(self, pnt, d, include_subgroup=True, rtype=None):
+        """
+        Find parts whose face or edge bounding boxes are hit by a ray.
+
+        :param point_like pnt: The ray origin.
+        :param vector_like d: The ray direction.
+        :param bool include_subgroup: Option to recursively include parts
+            from any subgroups.
+        :param rtype: Option to return only parts of a certain type. Provide a
+            class to check if the part is of the given type using
+            *isinstance()*.
+
+        :return: List of parts ordered by the distance along the ray to their
+            nearest bounding box.
+        :rtype: list(afem.structure.entities.Part)
+        """
+        pnt = CheckGeom.to_point(pnt)
+        d = CheckGeom.to_direction(d)
+
+        hits = {}
+        groups = [self]
+        while groups:
+            group = groups.pop()
+            index = group._index
+            indx, params = index.tree.query_ray(pnt, d)
+            for i, t in zip(indx, params):
+                part = index.item(i)[0]
+                if rtype is not None and not isinstance(part, rtype):
+                    continue
+                if part not in hits or t < hits[part]:
+                    hits[part] = t
+            if include_subgroup:
+                groups += list(group._children)
+
+        return sorted(hits, key=lambda part_: (hits[part_], part_.id))
+
+    def query_nearest(self, entity, n=1, include_subgroup=True, rtype=None):
+        """
+        Find the parts nearest to a point or shape. Bounding boxes are used to
+        limit the number of exact distance calculations.
+
+        :param entity: The point or shape.
+        :type entity: point_like or afem.topology.entities.Shape or
+            afem.structure.entities.Part
+        :param int n: The number of parts to find.
+        :param bool include_subgroup: Option to recursively include parts
+            from any subgroups.
+        :param rtype: Option to return only parts of a certain type. Provide a
+            class to check if the part is of the given type using
+            *isinstance()*.
+
+        :return: List of parts and list of their distances, both sorted by
+            distance.
+        :rtype: tuple(list(afem.structure.entities.Part), list(float))
+        """
+        if CheckGeom.is_point_like(entity):
+            entity = Vertex.by_point(CheckGeom.to_point(entity))
+        elif not isinstance(entity, Shape):
+            entity = entity.shape
+
+        bbox = BBox()
+        bbox.add_shape(entity)
+        if bbox.is_void:
+            return [], []
+        xyz = bbox.Get()
+        pmin, pmax = xyz[:3], xyz[3:]
+
+        # Each group yields its parts in order of increasing distance so the
+        # closest n parts per group are enough
+        found = {}
+        groups = [self]
+        while groups:
+            group = groups.pop()
+            index = group._index
+
+            def _distance(i):
+                return DistanceShapeToShape(entity, index.item(i)[1]).dmin
+
+            nparts = 0
+            for i, d in index.tree.iter_nearest(pmin, pmax, _distance):
+                part = index.item(i)[0]
+                if rtype is not None and not isinstance(part, rtype):
+                    continue
+                if part in found:
+                    found[part] = min(found[part], d)
+                    continue
+                found[part] = d
+                nparts += 1
+                if nparts == n:
+                    break
+
+            if include_subgroup:
+                groups += list(group._children)
+
+        parts = sorted(found, key=lambda part_: (found[part_], part_.id))[:n]
+        return parts, [found[part] for part in parts]
 
     def get_shape(self, include_subgroup=True):
         """
@@ -146,9 +476,7 @@ class Group(NamedItem):
         :return: The part shapes as a compound.
         :rtype: afem.topology.entities.Compound
         """
-        parts = self.get_parts(include_subgroup)
-        shapes = [part.shape for part in parts]
-        return CompoundByShapes(shapes).compound
+        return self.parts_to_compound(self.get_parts(include_subgroup))
 
     def create_subgroup(self, name, active=True):
         """
@@ -166,7 +494,8 @@ class Group(NamedItem):
     def parts_to_compound(parts):
         """
         Convert the list of parts into a single compound using each of their
-        shapes.
+        shapes. The compound is cached and reused until the shape of any of
+        the parts is set, so it should not be modified.
 
         :param collections.Sequence(afem.structure.entities.Part) parts: The
             parts.
@@ -174,7 +503,23 @@ class Group(NamedItem):
         :return: The compound.
         :rtype: afem.topology.entities.Compound
         """
-        return CompoundByShapes([part.shape for part in parts]).compound
+        parts = tuple(parts)
+        key = tuple((id(part), part.version) for part in parts)
+        try:
+            cached_parts, compound = _compounds[key]
+        except KeyError:
+            pass
+        else:
+            # The cache holds the parts so their ids are not reused
+            if all(p1 is p2 for p1, p2 in zip(cached_parts, parts)):
+                _compounds.move_to_end(key)
+                return compound
+
+        compound = CompoundByShapes([part.shape for part in parts]).compound
+        _compounds[key] = (parts, compound)
+        while len(_compounds) > _COMPOUNDS_SIZE:
+            _compounds.popitem(last=False)
+        return compound
 
 
 class GroupAPI(object):
@@ -194,13 +539,17 @@ class GroupAPI(object):
         """
         Reset master group and data structure and reset Part index back to 1.
         This should delete all groups unless they are referenced somewhere
-        else.
+        else. The :class:`.PropsCache` and the cached fingerprints of shapes
+        are also cleared.
 
         :return: None.
         """
         cls._master = Group('_master', None)
         cls._all = {'_master': cls._master}
         cls._active = cls._master
+        _compounds.clear()
+        PropsCache.clear()
+        clear_fingerprint_cache()
 
         from afem.structure.entities import Part
 
@@ -365,6 +714,92 @@ class GroupAPI(object):
         group = cls.get_group(group)
         group.remove_part(name)
 
+    @classmethod
+    def query_box(cls, bbox, group=None, include_subgroup=True, rtype=None):
+        """
+        Find parts whose face or edge bounding boxes intersect the box.
+
+        :param afem.topology.entities.BBox bbox: The box.
+        :param group: The group. If ``None`` then the active group is
+            used.
+        :type group: str or afem.structure.group.Group or None
+        :param bool include_subgroup: Option to recursively include parts
+            from any subgroups.
+        :param rtype: Option to return only parts of a certain type.
+
+        :return: List of parts ordered by their ID.
+        :rtype: list(afem.structure.entities.Part)
+        """
+        group = cls.get_group(group)
+        return group.query_box(bbox, include_subgroup, rtype)
+
+    @classmethod
+    def query_plane(cls, pln, tol=0., group=None, include_subgroup=True,
+                    rtype=None):
+        """
+        Find parts whose face or edge bounding boxes are crossed by a plane.
+
+        :param afem.geometry.entities.Plane pln: The plane.
+        :param float tol: Tolerance added to the bounding boxes.
+        :param group: The group. If ``None`` then the active group is
+            used.
+        :type group: str or afem.structure.group.Group or None
+        :param bool include_subgroup: Option to recursively include parts
+            from any subgroups.
+        :param rtype: Option to return only parts of a certain type.
+
+        :return: List of parts ordered by their ID.
+        :rtype: list(afem.structure.entities.Part)
+        """
+        group = cls.get_group(group)
+        return group.query_plane(pln, tol, include_subgroup, rtype)
+
+    @classmethod
+    def query_ray(cls, pnt, d, group=None, include_subgroup=True,
+                  rtype=None):
+        """
+        Find parts whose face or edge bounding boxes are hit by a ray.
+
+        :param point_like pnt: The ray origin.
+        :param vector_like d: The ray direction.
+        :param group: The group. If ``None`` then the active group is
+            used.
+        :type group: str or afem.structure.group.Group or None
+        :param bool include_subgroup: Option to recursively include parts
+            from any subgroups.
+        :param rtype: Option to return only parts of a certain type.
+
+        :return: List of parts ordered by the distance along the ray to their
+            nearest bounding box.
+        :rtype: list(afem.structure.entities.Part)
+        """
+        group = cls.get_group(group)
+        return group.query_ray(pnt, d, include_subgroup, rtype)
+
+    @classmethod
+    def query_nearest(cls, entity, n=1, group=None, include_subgroup=True,
+                      rtype=None):
+        """
+        Find the parts nearest to a point or shape.
+
+        :param entity: The point or shape.
+        :type entity: point_like or afem.topology.entities.Shape or
+            afem.structure.entities.Part
+        :param int n: The number of parts to find.
+        :param group: The group. If ``None`` then the active group is
+            used.
+        :type group: str or afem.structure.group.Group or None
+        :param bool include_subgroup: Option to recursively include parts
+            from any subgroups.
+        :param rtype: Option to return only parts of a certain type.
+
+        :return: List of parts and list of their distances, both sorted by
+            distance.
+        :rtype: tuple(list(afem.structure.entities.Part), list(float))
+        """
+        group = cls.get_group(group)
+        return group.query_nearest(entity, n, include_subgroup, rtype)
+
     @classmethod
     def get_shape(cls, group='_master', include_subgroup=True):
         """
@@ -397,31 +832,7 @@ class GroupAPI(object):
         :rtype: bool
         """
         group = cls.get_master()
-
-        # Create document and application
-        doc = XdeDocument(binary)
-
-        # Store parts as top-level shapes
-        # TODO Support group hierarchy
-        parts = group.get_parts()
-        for part in parts:
-            name = doc.add_shape(part.shape, part.name, False)
-            name.set_string(part.type_name)
-            name.set_color(part.color)
-
-            # Reference curve
-            if part.has_cref:
-                edge = EdgeByCurve(part.cref).edge
-                name = doc.add_shape(edge, part.name, False)
-                name.set_string('CREF')
-
-            # Reference surface
-            if part.has_sref:
-                face = FaceBySurface(part.sref).face
-                name = doc.add_shape(face, part.name, False)
-                name.set_string('SREF')
-
-        return doc.save_as(fn)
+        return _save_parts(group.get_parts(), fn, binary)
 
     @classmethod
     def load_model(cls, fn, group=None):
@@ -496,3 +907,32 @@ class GroupAPI(object):
                 part.set_color(r, g, b)
 
         return True
+
+
+def _save_parts(parts, fn, binary=True):
+    """
+    Save the parts to a document.
+    """
+    # Create document and application
+    doc = XdeDocument(binary)
+
+    # Store parts as top-level shapes
+    # TODO Support group hierarchy
+    for part in parts:
+        name = doc.add_shape(part.shape, part.name, False)
+        name.set_string(part.type_name)
+        name.set_color(part.color)
+
+        # Reference curve
+        if part.has_cref:
+            edge = part.cref_edge
+            name = doc.add_shape(edge, part.name, False)
+            name.set_string('CREF')
+
+        # Reference surface
+        if part.has_sref:
+            face = part.sref_face
+            name = doc.add_shape(face, part.name, False)
+            name.set_string('SREF')
+
+    return doc.save_as(fn)
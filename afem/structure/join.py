@@ -16,17 +16,126 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
-from numpy import mean
+from OCC.Core.IntTools import IntTools_EdgeEdge
+from numpy import isfinite, mean
 
 from afem.structure.entities import SurfacePart
-from afem.topology.bop import FuseShapes, IntersectShapes, SplitShapes
-from afem.topology.create import CompoundByShapes, EdgeByCurve
+from afem.topology.bop import CutShapes, FuseShapes, SplitShapes
+from afem.topology.create import CompoundByShapes
 from afem.topology.entities import Shape
 from afem.topology.modify import RebuildShapesByTool, SewShape
-from afem.config import logger
+from afem.topology.parallel import build_bops
+from afem.topology.spatial import (AABBTree, box_clusters, box_pairs,
+                                   shape_boxes)
+from afem.config import Settings, logger
 
-__all__ = ["FuseSurfaceParts", "FuseSurfacePartsByCref", "CutParts",
-           "SewSurfaceParts", "SplitParts", "FuseGroups"]
+__all__ = ["FuseSurfaceParts", "FuseSurfacePartsByCref", "FuseNewParts",
+           "CutParts", "SewSurfaceParts", "SplitParts", "FuseGroups"]
+
+
+def _fuse_by_clusters(operands, nargs, fuzzy_val=None, parallel=False):
+    """
+    Fuse operands by clusters of shapes with overlapping bounding boxes. Each
+    cluster is fused on its own and shapes in different clusters cannot
+    intersect, so the results are the same as fusing all the operands at
+    once.
+
+    :param operands: The shapes of each operand. An operand with more than
+        one shape is put into a compound like in a single fuse.
+    :type operands: list(list(afem.topology.entities.Shape))
+    :param int nargs: The number of leading operands that are arguments. The
+        rest are tools.
+    :param float fuzzy_val: Fuzzy tolerance value.
+    :param bool parallel: Option to fuse the clusters in worker processes.
+
+    :return: The status, the fused shape, and the new shapes of each operand.
+    :rtype: tuple(bool, afem.topology.entities.Shape,
+        list(list(afem.topology.entities.Shape)))
+    """
+    items = [(i, j) for i, shapes in enumerate(operands)
+             for j in range(len(shapes))]
+    shapes = [operands[i][j] for i, j in items]
+    new_shapes = [list(shapes_) for shapes_ in operands]
+
+    tol = fuzzy_val
+    if tol is None:
+        tol = Settings.fuzzy_val
+    clusters = box_clusters(shape_boxes(shapes, tol))
+
+    # Set up a fuse for each cluster with more than one operand
+    results = []
+    bops = []
+    for cluster in clusters:
+        by_operand = {}
+        for k in cluster:
+            by_operand.setdefault(items[k][0], []).append(k)
+        if len(by_operand) < 2:
+            results.append(([shapes[k] for k in cluster], None, None))
+            continue
+
+        args, tools = [], []
+        for i in sorted(by_operand):
+            members = [shapes[k] for k in by_operand[i]]
+            if len(operands[i]) > 1:
+                shape = CompoundByShapes(members).compound
+            else:
+                shape = members[0]
+            if i < nargs:
+                args.append(shape)
+            else:
+                tools.append(shape)
+        # Fuse is symmetric so move an operand if either side is empty
+        if not tools:
+            tools.append(args.pop())
+        elif not args:
+            args.append(tools.pop(0))
+
+        bop = FuseShapes(fuzzy_val=fuzzy_val)
+        bop.set_args(args)
+        bop.set_tools(tools)
+        bops.append(bop)
+        results.append(([shapes[k] for k in cluster], cluster, bop))
+
+    msg = 'Fusing {} shapes in {} clusters.'.format(len(shapes), len(bops))
+    logger.info(msg)
+
+    if parallel:
+        build_bops(bops)
+    else:
+        for bop in bops:
+            bop.build()
+
+    # Rebuild the shapes of each cluster
+    is_done = True
+    fused_shapes = []
+    for cluster_shapes, cluster, bop in results:
+        if bop is None:
+            fused_shapes += cluster_shapes
+            continue
+        if not bop.is_done:
+            is_done = False
+            fused_shapes += cluster_shapes
+            logger.warning('Failed to fuse cluster of {} shapes.'.format(
+                len(cluster_shapes)))
+            continue
+        fused_shapes.append(bop.shape)
+        rebuild = RebuildShapesByTool(cluster_shapes, bop)
+        for k, shape in zip(cluster, cluster_shapes):
+            i, j = items[k]
+            new_shapes[i][j] = rebuild.new_shape(shape)
+
+    fused_shape = CompoundByShapes(fused_shapes).compound
+    return is_done, fused_shape, new_shapes
+
+
+def _edges_intersect(e1, e2, tol):
+    """
+    Check if two edges intersect or overlap within a tolerance.
+    """
+    tool = IntTools_EdgeEdge(e1.object, e2.object)
+    tool.SetFuzzyValue(tol)
+    tool.Perform()
+    return tool.IsDone() and tool.CommonParts().Length() > 0
 
 
 class FuseSurfaceParts(object):
@@ -38,13 +147,31 @@ class FuseSurfaceParts(object):
     :param parts: The other surface parts.
     :type tools: collections.Sequence(afem.structure.entities.SurfacePart)
     :param float fuzzy_val: Fuzzy tolerance value.
+    :param bool partition: Option to fuse clusters of parts with overlapping
+        bounding boxes separately rather than all the parts at once. This
+        reduces the cost of large assemblies and a failure only affects the
+        parts of one cluster.
+    :param bool parallel: Option to fuse the clusters in worker processes if
+        *partition* is *True*.
     """
 
-    def __init__(self, parts, tools, fuzzy_val=None):
-        bop = FuseShapes(fuzzy_val=fuzzy_val)
-
+    def __init__(self, parts, tools, fuzzy_val=None, partition=False,
+                 parallel=False):
         parts = list(parts)
         other_parts = list(tools)
+
+        if partition:
+            all_parts = parts + other_parts
+            operands = [[part.shape] for part in all_parts]
+            is_done, shape, new_shapes = _fuse_by_clusters(
+                operands, len(parts), fuzzy_val, parallel)
+            for part, shapes in zip(all_parts, new_shapes):
+                part.set_shape(shapes[0])
+            self._is_done = is_done
+            self._fused_shape = shape
+            return
+
+        bop = FuseShapes(fuzzy_val=fuzzy_val)
         args = [part.shape for part in parts]
         bop.set_args(args)
         tools = [part.shape for part in tools]
@@ -89,50 +216,58 @@ class FuseSurfacePartsByCref(object):
         tolerance of the part shape.
 
     :raises TypeError: If a given part is not a surface part.
+
+    .. note::
+
+        Only reference curves whose bounding boxes overlap are checked for
+        intersection.
     """
 
     def __init__(self, parts, tol=None):
         self._is_done = False
 
+        parts = list(parts)
         for part in parts:
             if not isinstance(part, SurfacePart):
                 msg = 'Part is not a surface part.'
                 raise TypeError(msg)
 
-        # Test all combinations of parts for intersection of reference curve
-        join_parts = []
-        main_parts = []
-        nparts = len(parts)
-        for i in range(0, nparts - 1):
-            main = parts[i]
-            other_parts = []
-            for j in range(i + 1, nparts):
-                other = parts[j]
-                if not main.has_cref or not other.has_cref:
-                    continue
-                if tol is None:
-                    tol1 = main.shape.tol_max
-                    tol2 = other.shape.tol_max
-                    _tol = max(tol1, tol2)
-                else:
-                    _tol = tol
-                e1 = EdgeByCurve(main.cref).edge
-                e2 = EdgeByCurve(other.cref).edge
-                bop = IntersectShapes(e1, e2, fuzzy_val=_tol)
-                if not bop.vertices:
-                    continue
-                # Store potential join
-                msg = 'Found joint between {} and {}.'.format(main.name,
-                                                              other.name)
-                logger.info(msg)
-                other_parts.append(other)
-            if other_parts:
-                main_parts.append(main)
-                join_parts.append(other_parts)
-
-        # Join the parts
-        for main, other_parts in zip(main_parts, join_parts):
-            main.fuse(*other_parts)
+        # Reference curve edges and their bounding boxes enlarged by the
+        # tolerance of each part
+        indices = [i for i, part in enumerate(parts) if part.has_cref]
+        edges = [parts[i].cref_edge for i in indices]
+        if tol is None:
+            tols = [parts[i].shape.tol_max for i in indices]
+        else:
+            tols = [tol] * len(indices)
+        boxes = shape_boxes(edges)
+        for k, _tol in enumerate(tols):
+            boxes[k, :3] -= _tol
+            boxes[k, 3:] += _tol
+
+        # Only test reference curves with overlapping bounding boxes
+        joints = {}
+        for k1, k2 in box_pairs(boxes):
+            _tol = max(tols[k1], tols[k2])
+            if not _edges_intersect(edges[k1], edges[k2], _tol):
+                continue
+            i, j = indices[k1], indices[k2]
+            msg = 'Found joint between {} and {}.'.format(parts[i].name,
+                                                          parts[j].name)
+            logger.info(msg)
+            joints.setdefault(i, set()).add(j)
+            joints.setdefault(j, set()).add(i)
+
+        # Join the parts starting with the part that has the most joints so
+        # each part is in as few fuse operations as possible
+        while joints:
+            main = max(sorted(joints), key=lambda i_: len(joints[i_]))
+            others = sorted(joints.pop(main))
+            for i in others:
+                joints[i].discard(main)
+                if not joints[i]:
+                    del joints[i]
+            parts[main].fuse(*[parts[i] for i in others])
             self._is_done = True
 
     @property
@@ -144,37 +279,212 @@ class FuseSurfacePartsByCref(object):
         return self._is_done
 
 
+class FuseNewParts(object):
+    """
+    Fuse new parts into a set of parts that are already fused together and
+    rebuild their shapes. Only the existing parts whose bounding boxes
+    overlap a new part are fused with the new parts. Existing parts that do
+    not overlap any new part cannot intersect them, and sub-shapes they share
+    with the fused parts are only modified where a new part touches them, so
+    the result is equivalent to fusing all the parts again.
+
+    :param parts: The parts that are already fused.
+    :type parts: collections.Sequence(afem.structure.entities.Part)
+    :param new_parts: The new parts.
+    :type new_parts: collections.Sequence(afem.structure.entities.Part)
+    :param float fuzzy_val: Fuzzy tolerance value.
+    """
+
+    def __init__(self, parts, new_parts, fuzzy_val=None):
+        parts = list(parts)
+        new_parts = list(new_parts)
+
+        tol = fuzzy_val
+        if tol is None:
+            tol = Settings.fuzzy_val
+
+        # Find the existing parts that overlap the new parts
+        neighbors = []
+        if parts and new_parts:
+            tree = AABBTree.by_shapes([part.shape for part in parts], tol)
+            indices = set()
+            for box in shape_boxes([part.shape for part in new_parts], tol):
+                indices.update(tree.query_box(box[:3], box[3:]))
+            neighbors = [parts[i] for i in sorted(indices)]
+        self._neighbors = neighbors
+
+        msg = 'Fusing {} new parts with {} of {} existing parts.'.format(
+            len(new_parts), len(neighbors), len(parts))
+        logger.info(msg)
+
+        args = [part.shape for part in neighbors]
+        tools = [part.shape for part in new_parts]
+        if not args:
+            args, tools = tools[:1], tools[1:]
+        if not tools:
+            self._is_done = True
+            self._fused_shape = CompoundByShapes(args).compound
+            return
+
+        bop = FuseShapes(fuzzy_val=fuzzy_val)
+        bop.set_args(args)
+        bop.set_tools(tools)
+        bop.build()
+
+        if bop.is_done:
+            rebuild = RebuildShapesByTool(args + tools, bop)
+            for part in neighbors + new_parts:
+                new_shape = rebuild.new_shape(part.shape)
+                part.set_shape(new_shape)
+
+        self._is_done = bop.is_done
+        self._fused_shape = bop.shape
+
+    @property
+    def is_done(self):
+        """
+        :return: *True* if operation is done, *False* if not.
+        :rtype: bool
+        """
+        return self._is_done
+
+    @property
+    def shape(self):
+        """
+        :return: The fused shape of the new parts and the overlapping
+            existing parts.
+        :rtype: afem.topology.entities.Shape
+        """
+        return self._fused_shape
+
+    @property
+    def neighbors(self):
+        """
+        :return: The existing parts that overlap the new parts and were
+            fused with them.
+        :rtype: list(afem.structure.entities.Part)
+        """
+        return self._neighbors
+
+
 class CutParts(object):
     """
-    Cut each part with a shape and rebuild the part shape.
+    Cut each part with a shape and rebuild the part shape. Parts whose
+    bounding boxes do not overlap the bounding box of the shape are skipped.
+    The remaining parts are sorted into batches of parts whose bounding boxes
+    do not overlap each other, so they cannot interact, and each batch is cut
+    in one Boolean operation. If the operation of a batch fails, its parts
+    are cut one at a time.
 
     :param parts: The parts to cut.
     :type parts: collections.Sequence(afem.structure.entities.Part)
     :param shape: The shape to cut with.
     :type shape: afem.topology.entities.Shape or afem.geometry.entities.Surface
+    :param bool combine: Option to cut each batch of parts in one Boolean
+        operation. If *False*, the parts that overlap the shape are cut one
+        at a time.
+
+    :cvar str SKIPPED: Path of a part whose bounding box does not overlap
+        the shape.
+    :cvar str COMBINED: Path of a part cut together with other parts.
+    :cvar str SINGLE: Path of a part cut on its own.
+    :cvar str FAILED: Path of a part whose cut failed.
     """
+    SKIPPED = 'skipped'
+    COMBINED = 'combined'
+    SINGLE = 'single'
+    FAILED = 'failed'
 
-    def __init__(self, parts, shape):
+    def __init__(self, parts, shape, combine=True):
         parts = list(parts)
 
         shape2 = Shape.to_shape(shape)
 
-        # Loop through each since since that seems to be more robust
         self._status = {}
+        self._paths = {}
+        self._nbops = 0
+
+        # Skip parts that cannot touch the shape
+        tol = shape2.tol_max
+        boxes = shape_boxes([part.shape for part in parts], tol)
+        box = shape_boxes([shape2], tol)[0]
+        if isfinite(box).all():
+            is_out = ((boxes[:, :3] > box[3:]) |
+                      (boxes[:, 3:] < box[:3])).any(axis=1)
+        else:
+            is_out = ~isfinite(boxes).all(axis=1)
+
+        indices = []
+        for i, part in enumerate(parts):
+            if is_out[i]:
+                self._status[part] = False
+                self._paths[part] = CutParts.SKIPPED
+            else:
+                indices.append(i)
+
+        # Sort parts into batches that do not overlap each other
+        batches = []
+        if combine:
+            neighbors = {i: set() for i in indices}
+            for i, j in box_pairs(boxes[indices]):
+                neighbors[indices[i]].add(indices[j])
+                neighbors[indices[j]].add(indices[i])
+            colors = {}
+            for i in indices:
+                used = set(colors[j] for j in neighbors[i] if j in colors)
+                color = 0
+                while color in used:
+                    color += 1
+                colors[i] = color
+                if color == len(batches):
+                    batches.append([])
+                batches[color].append(parts[i])
+        else:
+            batches = [[parts[i]] for i in indices]
+
+        for batch in batches:
+            if len(batch) > 1 and self._cut_batch(batch, shape2):
+                continue
+            for part in batch:
+                status = part.cut(shape2)
+                self._nbops += 1
+                self._status[part] = status
+                if status:
+                    self._paths[part] = CutParts.SINGLE
+                else:
+                    self._paths[part] = CutParts.FAILED
+
+    def _cut_batch(self, parts, shape):
+        """
+        Cut a batch of parts in one Boolean operation.
+        """
+        args = [part.shape for part in parts]
+        bop = CutShapes()
+        bop.set_args(args)
+        bop.set_tools([shape])
+        bop.build()
+        self._nbops += 1
+        if not bop.is_done:
+            msg = ('Cutting {} parts together failed. Cutting them one at a '
+                   'time.'.format(len(parts)))
+            logger.info(msg)
+            return False
+
+        rebuild = RebuildShapesByTool(args, bop)
         for part in parts:
-            status = part.cut(shape2)
-            self._status[part] = status
-
-        # shapes = [part.shape for part in parts]
-        # shape1 = CompoundByShapes(shapes).compound
-        #
-        # bop = CutShapes(shape1, shape2)
-        # self._shape = bop.shape
-        #
-        # rebuild = RebuildShapesByTool(shapes, bop)
-        # for part in parts:
-        #     new_shape = rebuild.new_shape(part.shape)
-        #     part.set_shape(new_shape)
+            new_shape = rebuild.new_shape(part.shape)
+            part.set_shape(new_shape)
+            self._status[part] = True
+            self._paths[part] = CutParts.COMBINED
+        return True
+
+    @property
+    def nbops(self):
+        """
+        :return: The number of Boolean operations that were performed.
+        :rtype: int
+        """
+        return self._nbops
 
     def was_cut(self, part):
         """
@@ -182,11 +492,24 @@ class CutParts(object):
 
         :param afem.structure.entities.Part part: The part to check.
 
-        :return: *True* if part was cut, *False* if not.
-        :rtype:
+        :return: *True* if part was cut, *False* if not. Parts that were
+            skipped were not cut.
+        :rtype: bool
         """
         return self._status[part]
 
+    def path(self, part):
+        """
+        Get how the part was processed.
+
+        :param afem.structure.entities.Part part: The part.
+
+        :return: The path of the part (*CutParts.SKIPPED*,
+            *CutParts.COMBINED*, *CutParts.SINGLE*, or *CutParts.FAILED*).
+        :rtype: str
+        """
+        return self._paths[part]
+
 
 class SewSurfaceParts(object):
     """
@@ -283,18 +606,38 @@ class FuseGroups(object):
     :param float fuzzy_val: Fuzzy tolerance value.
     :param bool include_subgroup: Option to recursively include parts
             from all subgroups.
+    :param bool partition: Option to fuse clusters of parts with overlapping
+        bounding boxes separately rather than all the groups at once. This
+        reduces the cost of large assemblies and a failure only affects the
+        parts of one cluster.
+    :param bool parallel: Option to fuse the clusters in worker processes if
+        *partition* is *True*.
 
     :raise ValueError: If less than two groups are provided.
     """
 
-    def __init__(self, groups, fuzzy_val=None, include_subgroup=True):
+    def __init__(self, groups, fuzzy_val=None, include_subgroup=True,
+                 partition=False, parallel=False):
         if len(groups) < 2:
             raise ValueError('Not enough groups to fuse. Need at least '
                              'two.')
 
-        bop = FuseShapes(fuzzy_val=fuzzy_val)
-
         groups = list(groups)
+
+        if partition:
+            parts = [group.get_parts(include_subgroup) for group in groups]
+            operands = [[part.shape for part in group_parts]
+                        for group_parts in parts]
+            is_done, shape, new_shapes = _fuse_by_clusters(
+                operands, 1, fuzzy_val, parallel)
+            for group_parts, shapes in zip(parts, new_shapes):
+                for part, new_shape in zip(group_parts, shapes):
+                    part.set_shape(new_shape)
+            self._is_done = is_done
+            self._shape = shape
+            return
+
+        bop = FuseShapes(fuzzy_val=fuzzy_val)
         parts1 = groups[0].get_parts(include_subgroup)
         shapes1 = [part.shape for part in parts1]
         shape1 = CompoundByShapes(shapes1).compound
@@ -319,7 +662,8 @@ class FuseGroups(object):
             new_shape = rebuild.new_shape(part.shape)
             part.set_shape(new_shape)
 
-        self._bop = bop
+        self._is_done = bop.is_done
+        self._shape = bop.shape
 
     @property
     def is_done(self):
@@ -327,7 +671,7 @@ class FuseGroups(object):
         :return: *True* if operation is done, *False* if not.
         :rtype: bool
         """
-        return self._bop.is_done
+        return self._is_done
 
     @property
     def shape(self):
@@ -335,4 +679,4 @@ class FuseGroups(object):
         :return: The fused shape.
         :rtype: afem.topology.entities.Shape
         """
-        return self._bop.shape
+        return self._shape
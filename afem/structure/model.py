@@ -0,0 +1,366 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018  Laughlin Research, LLC (info@laughlinresearch.com)
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from time import perf_counter
+
+from afem.config import logger
+from afem.structure.entities import Part
+
+__all__ = ["Model", "BuildStep"]
+
+
+def _find_parts(obj, parts):
+    """
+    Find the parts referenced by an object and its items.
+    """
+    if isinstance(obj, Part):
+        if obj not in parts:
+            parts.append(obj)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            _find_parts(item, parts)
+    elif isinstance(obj, dict):
+        for item in obj.values():
+            _find_parts(item, parts)
+    return parts
+
+
+def _parts_of(result):
+    """
+    Get the parts created by a builder.
+    """
+    if isinstance(result, Part):
+        return [result]
+    parts = getattr(result, 'parts', None)
+    if parts is not None:
+        return list(parts)
+    part = getattr(result, 'part', None)
+    if isinstance(part, Part):
+        return [part]
+    return _find_parts(result, [])
+
+
+def _discard(part):
+    """
+    Remove a part from all of its groups.
+    """
+    for group in list(part._groups):
+        group._remove(part)
+
+
+class BuildStep(object):
+    """
+    A recorded step of a :class:`.Model`. A step either creates parts using a
+    builder or applies an operation (e.g., fuse, cut, discard, or split) that
+    modifies the parts given to it.
+
+    :param func: The builder or operation.
+    :type func: collections.Callable
+    :param tuple args: The positional arguments.
+    :param dict kwargs: The keyword arguments.
+    :param bool is_builder: *True* if the step creates parts, *False* if it
+        modifies them.
+    """
+
+    def __init__(self, func, args, kwargs, is_builder):
+        self._func = func
+        self._args = tuple(args)
+        self._kwargs = dict(kwargs)
+        self._is_builder = is_builder
+        self._parts = []
+        self._result = None
+        self._states = []
+        self._time = 0.
+
+    @property
+    def func(self):
+        """
+        :return: The builder or operation.
+        :rtype: collections.Callable
+        """
+        return self._func
+
+    @property
+    def args(self):
+        """
+        :return: The positional arguments.
+        :rtype: tuple
+        """
+        return self._args
+
+    @property
+    def kwargs(self):
+        """
+        :return: The keyword arguments.
+        :rtype: dict
+        """
+        return dict(self._kwargs)
+
+    @property
+    def is_builder(self):
+        """
+        :return: *True* if the step creates parts, *False* if it modifies
+            them.
+        :rtype: bool
+        """
+        return self._is_builder
+
+    @property
+    def inputs(self):
+        """
+        :return: The parts referenced by the arguments and the part of a
+            bound part method.
+        :rtype: list(afem.structure.entities.Part)
+        """
+        parts = _find_parts(getattr(self._func, '__self__', None), [])
+        return _find_parts((self._args, self._kwargs), parts)
+
+    @property
+    def parts(self):
+        """
+        :return: The parts created by a builder step or the parts modified by
+            an operation step.
+        :rtype: list(afem.structure.entities.Part)
+        """
+        return list(self._parts)
+
+    @property
+    def result(self):
+        """
+        :return: The object returned by the builder or operation the last
+            time it was run. For a builder step, its parts may be temporary
+            copies after a rebuild. Use :attr:`.parts` instead.
+        """
+        return self._result
+
+    @property
+    def time(self):
+        """
+        :return: The time in seconds of the last time the step was run.
+        :rtype: float
+        """
+        return self._time
+
+    def update(self, *args, **kwargs):
+        """
+        Change the arguments of the step. The model is not changed until it
+        is rebuilt.
+
+        :param args: New positional arguments. If none are provided the
+            current ones are kept.
+        :param kwargs: Keyword arguments to add or replace.
+
+        :return: None.
+        """
+        if args:
+            self._args = tuple(args)
+        self._kwargs.update(kwargs)
+
+    def _run(self):
+        """
+        Run the step and record the state of its parts.
+        """
+        start = perf_counter()
+        result = self._func(*self._args, **self._kwargs)
+
+        if not self._is_builder:
+            self._parts = self.inputs
+        else:
+            new_parts = _parts_of(result)
+            if not self._states:
+                self._parts = new_parts
+            elif len(new_parts) != len(self._parts):
+                for part in new_parts:
+                    _discard(part)
+                msg = ('The number of parts created by the builder changed '
+                       'from {} to {}. The model must be built again.')
+                raise RuntimeError(msg.format(len(self._parts),
+                                              len(new_parts)))
+            else:
+                # Keep the original parts so later steps and other references
+                # remain valid
+                for part, new_part in zip(self._parts, new_parts):
+                    _discard(new_part)
+                    part.set_shape(new_part.shape)
+                    if new_part.has_cref:
+                        part.set_cref(new_part.cref)
+                    if new_part.has_sref:
+                        part.set_sref(new_part.sref)
+
+        self._result = result
+        self._states = [(part.shape, part.cref, part.sref)
+                        for part in self._parts]
+        self._time = perf_counter() - start
+
+    def _restore(self):
+        """
+        Restore the recorded state of the parts after the step.
+        """
+        for part, (shape, cref, sref) in zip(self._parts, self._states):
+            if part.shape is not shape:
+                part.set_shape(shape)
+            if cref is not None and part.cref is not cref:
+                part.set_cref(cref)
+            if sref is not None and part.sref is not sref:
+                part.set_sref(sref)
+
+
+class Model(object):
+    """
+    Opt-in build graph of a structural model. Part builders and operations
+    are run through the model so it can record their arguments and the parts
+    they create or modify. When the arguments of some steps change, only
+    those steps and the steps that depend on them are run again using
+    :meth:`.rebuild`. The parts of all other steps are restored from the
+    shapes recorded when they were last run.
+
+    A step depends on another if one of its arguments is a part created or
+    modified by the other. Parts are only found if they are given directly
+    or inside of lists, tuples, sets, or dictionaries. Other arguments
+    derived from a part (e.g., its reference curve) are recorded as they are
+    and are not updated when the part is rebuilt.
+
+    For example:
+
+    .. code-block:: python
+
+        model = Model()
+        fspar_step = model.build(SparByParameters, 'fspar', 0.15, 0.1, 0.15,
+                                 0.9, wing)
+        rspar_step = model.build(SparByParameters, 'rspar', 0.65, 0.1, 0.65,
+                                 0.9, wing)
+        fspar, rspar = fspar_step.parts[0], rspar_step.parts[0]
+        ribs = model.build(RibsAlongCurveByDistance, 'rib', rspar.cref, 30.,
+                           fspar, rspar, wing)
+        parts = [fspar, rspar] + ribs.parts
+        model.apply(FuseSurfaceParts, parts, parts)
+
+        # Move the front spar and rebuild the affected steps
+        fspar_step.update('fspar', 0.20, 0.1, 0.20, 0.9, wing)
+        model.rebuild([fspar_step])
+    """
+
+    def __init__(self):
+        self._steps = []
+
+    @property
+    def steps(self):
+        """
+        :return: The steps in the order they were recorded.
+        :rtype: list(afem.structure.model.BuildStep)
+        """
+        return list(self._steps)
+
+    def build(self, builder, *args, **kwargs):
+        """
+        Run a part builder and record it.
+
+        :param builder: The part builder (e.g., :class:`.SparByParameters`
+            or :class:`.RibsAlongCurveByDistance`). It may also be a function
+            that returns one or more parts.
+        :type builder: collections.Callable
+        :param args: The positional arguments of the builder.
+        :param kwargs: The keyword arguments of the builder.
+
+        :return: The step. The created parts are available using
+            :attr:`.BuildStep.parts`.
+        :rtype: afem.structure.model.BuildStep
+        """
+        step = BuildStep(builder, args, kwargs, True)
+        step._run()
+        self._steps.append(step)
+        return step
+
+    def apply(self, op, *args, **kwargs):
+        """
+        Run an operation that modifies parts and record it.
+
+        :param op: The operation (e.g., :class:`.FuseSurfaceParts`,
+            :class:`.CutParts`, or :class:`.DiscardByCref`). It may also be a
+            function or part method. The part of a part method is modified
+            by the step like the parts in the arguments.
+        :type op: collections.Callable
+        :param args: The positional arguments of the operation.
+        :param kwargs: The keyword arguments of the operation.
+
+        :return: The step. The result of the operation is available using
+            :attr:`.BuildStep.result`.
+        :rtype: afem.structure.model.BuildStep
+        """
+        step = BuildStep(op, args, kwargs, False)
+        step._run()
+        self._steps.append(step)
+        return step
+
+    def steps_of(self, part):
+        """
+        Get the steps that created or modified a part.
+
+        :param afem.structure.entities.Part part: The part.
+
+        :return: The steps in the order they were recorded.
+        :rtype: list(afem.structure.model.BuildStep)
+        """
+        return [step for step in self._steps if part in step._parts]
+
+    def rebuild(self, changed=None):
+        """
+        Run the changed steps and all steps that depend on them again. The
+        parts of the other steps are restored from their recorded state.
+
+        :param changed: The changed steps or parts. A part marks the step
+            that created it as changed. If not provided, all steps are run
+            again.
+        :type changed: collections.Sequence(afem.structure.model.BuildStep or
+            afem.structure.entities.Part) or None
+
+        :return: The steps that were run again.
+        :rtype: list(afem.structure.model.BuildStep)
+
+        :raise RuntimeError: If a builder creates a different number of parts
+            than before.
+        """
+        start = perf_counter()
+
+        if changed is None:
+            dirty_steps = set(self._steps)
+        else:
+            dirty_steps = set()
+            for item in changed:
+                if isinstance(item, Part):
+                    for step in self.steps_of(item):
+                        if step.is_builder:
+                            dirty_steps.add(step)
+                else:
+                    dirty_steps.add(item)
+
+        dirty_parts = set()
+        rebuilt = []
+        for step in self._steps:
+            if step in dirty_steps or any(part in dirty_parts for part in
+                                          step.inputs):
+                step._run()
+                dirty_parts.update(step._parts)
+                rebuilt.append(step)
+            else:
+                step._restore()
+
+        msg = 'Rebuilt {} of {} model steps in {:.3f} seconds.'
+        logger.info(msg.format(len(rebuilt), len(self._steps),
+                               perf_counter() - start))
+        return rebuilt
@@ -25,4 +25,6 @@ from afem.topology.explore import *
 from afem.topology.fix import *
 from afem.topology.modify import *
 from afem.topology.offset import *
+from afem.topology.parallel import *
 from afem.topology.props import *
+from afem.topology.spatial import *
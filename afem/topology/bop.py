@@ -16,31 +16,45 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import os
+import pickle
 from datetime import datetime
+from hashlib import sha256
+from threading import Lock
 
 from OCC.Core.BOPAlgo import BOPAlgo_MakerVolume, BOPAlgo_Options
+from OCC.Core.BRep import BRep_Builder, BRep_Tool
 from OCC.Core.BRepAlgoAPI import (BRepAlgoAPI_Common, BRepAlgoAPI_Cut,
                               BRepAlgoAPI_Fuse, BRepAlgoAPI_Section,
                               BRepAlgoAPI_Splitter)
 from OCC.Core.BRepFeat import BRepFeat_MakeCylindricalHole, BRepFeat_SplitShape
+from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeCylinder
+from OCC.Core.BRepTools import BRepTools_ReShape
 from OCC.Core.Message import Message_Gravity
-from OCC.Core.TopTools import TopTools_SequenceOfShape
-from OCC.Core.TopoDS import TopoDS_Face
-
-from afem.config import logger
+from OCC.Core.TopAbs import (TopAbs_EDGE, TopAbs_FACE, TopAbs_FORWARD,
+                             TopAbs_REVERSED, TopAbs_VERTEX)
+from OCC.Core.TopExp import TopExp_Explorer, topexp
+from OCC.Core.TopTools import (TopTools_IndexedMapOfShape,
+                               TopTools_SequenceOfShape)
+from OCC.Core.TopoDS import TopoDS_Face, topods
+from OCC.Core.gp import gp_Ax2, gp_Vec
+
+from afem.config import Settings, logger
 from afem.geometry.entities import Surface
+from afem.misc.progress import run_isolated
+from afem.occ import utils as occ_utils
 from afem.occ.utils import to_topods_list
-from afem.topology.entities import Shape, Face, Solid, Compound
+from afem.topology.entities import Shape, Face, Solid, Compound, BBox
 from afem.topology.explore import ExploreWire
 from afem.topology.modify import RebuildShapeByTool
 
-__all__ = ["BopCore", "BopAlgo", "FuseShapes", "CutShapes", "CommonShapes",
-           "IntersectShapes", "SplitShapes", "VolumesFromShapes",
-           "CutCylindricalHole", "LocalSplit", "SplitShapeByEdges",
-           "SplitWire", "TrimOpenWire"]
+__all__ = ["BopCache", "BopCore", "BopAlgo", "FuseShapes", "CutShapes",
+           "CommonShapes", "IntersectShapes", "SplitShapes",
+           "VolumesFromShapes", "CutCylindricalHole", "CutCylindricalHoles",
+           "LocalSplit", "SplitShapeByEdges", "SplitWire", "TrimOpenWire"]
 
-# Turn on parallel Boolean execution by default
-BOPAlgo_Options.SetParallelMode(True)
+# Parallel Boolean execution
+BOPAlgo_Options.SetParallelMode(Settings.parallel)
 
 # Message gravities
 _gravities = [Message_Gravity.Message_Trace, Message_Gravity.Message_Info,
@@ -48,6 +62,536 @@ _gravities = [Message_Gravity.Message_Trace, Message_Gravity.Message_Info,
               Message_Gravity.Message_Fail]
 
 
+def _shape_map(shape):
+    """
+    Map a shape and all of its sub-shapes.
+    """
+    map_ = TopTools_IndexedMapOfShape()
+    topexp.MapShapes(shape.object, map_)
+    return map_
+
+
+class _BopCacheEntry(object):
+    """
+    Result and history of a Boolean operation restored from the cache. The
+    history is stored against the index of each sub-shape in the map of its
+    input shape, so it can be looked up from the live inputs.
+    """
+
+    def __init__(self, shape, section_edges, history, ancestors, input_maps):
+        self.shape = shape
+        self.section_edges = section_edges
+        self._history = history
+        self._input_maps = input_maps
+
+        # Ancestor faces of intersection edges
+        self._edge_map = TopTools_IndexedMapOfShape()
+        self._ancestors = []
+        for edge, j1, j2 in ancestors:
+            self._edge_map.Add(edge.object)
+            self._ancestors.append((j1, j2))
+
+    def ancestor_face(self, edge, i):
+        k = self._edge_map.FindIndex(edge.object)
+        if k == 0 or i >= len(self._input_maps):
+            return None
+        j = self._ancestors[k - 1][i]
+        if j == 0:
+            return None
+        return Face(self._input_maps[i].FindKey(j))
+
+    def _find(self, shape):
+        for i, map_ in enumerate(self._input_maps):
+            j = map_.FindIndex(shape.object)
+            if j > 0:
+                return self._history.get((i, j))
+        return None
+
+    def modified(self, shape):
+        item = self._find(shape)
+        if item is None:
+            return []
+        return list(item[0])
+
+    def generated(self, shape):
+        item = self._find(shape)
+        if item is None:
+            return []
+        return list(item[1])
+
+    def is_deleted(self, shape):
+        item = self._find(shape)
+        if item is None:
+            return False
+        return item[2]
+
+    @property
+    def has_modified(self):
+        return any(item[0] for item in self._history.values())
+
+    @property
+    def has_generated(self):
+        return any(item[1] for item in self._history.values())
+
+    @property
+    def has_deleted(self):
+        return any(item[2] for item in self._history.values())
+
+
+def _entry_data(bop, inputs):
+    """
+    Collect the result and history of a Boolean operation. The history is
+    stored against the index of each sub-shape in the map of its input. The
+    sub-shapes of the results that are the same as a sub-shape of an input
+    are also stored against its index, so they can be replaced by the input
+    sub-shape when restored.
+    """
+    shape_set = occ_utils.new_shape_set()
+
+    # All stored shapes are mapped to find the ones shared with the inputs
+    stored_map = TopTools_IndexedMapOfShape()
+
+    def _add(topods_list):
+        for s in topods_list:
+            topexp.MapShapes(s, stored_map)
+        return [occ_utils.shape_set_add(shape_set, s) for s in topods_list]
+
+    shape_key = _add([bop._bop.Shape()])[0]
+    if isinstance(bop._bop, BRepAlgoAPI_Splitter):
+        section_edges = []
+    else:
+        section_edges = _add(bop._bop.SectionEdges())
+
+    input_maps = [_shape_map(s) for s in inputs]
+    history, sizes = [], []
+    for i, map_ in enumerate(input_maps):
+        sizes.append(map_.Extent())
+        for j in range(1, map_.Extent() + 1):
+            sub_shape = map_.FindKey(j)
+            mod = _add(bop._bop.Modified(sub_shape))
+            gen = _add(bop._bop.Generated(sub_shape))
+            deleted = bop._bop.IsDeleted(sub_shape)
+            if mod or gen or deleted:
+                history.append((i, j, mod, gen, deleted))
+
+    # Ancestor faces of intersection edges as indices in the input maps
+    ancestors = []
+    if isinstance(bop._bop, BRepAlgoAPI_Section):
+        for edge in bop.shape.edges:
+            indices = []
+            for i, method in enumerate([bop._bop.HasAncestorFaceOn1,
+                                        bop._bop.HasAncestorFaceOn2]):
+                f = TopoDS_Face()
+                j = 0
+                if method(edge.object, f) and i < len(input_maps):
+                    j = input_maps[i].FindIndex(f)
+                indices.append(j)
+            edge_key = _add([edge.object])[0]
+            ancestors.append((edge_key, indices[0], indices[1]))
+
+    # Stored sub-shapes that are the same as an input sub-shape
+    same = []
+    for k in range(1, stored_map.Extent() + 1):
+        sub_shape = stored_map.FindKey(k)
+        for i, map_ in enumerate(input_maps):
+            j = map_.FindIndex(sub_shape)
+            if j > 0:
+                key = occ_utils.shape_set_add(shape_set, sub_shape)
+                same.append((key, i, j))
+                break
+
+    return {'data': occ_utils.shape_set_to_bytes(shape_set),
+            'shape': shape_key,
+            'section_edges': section_edges,
+            'history': history,
+            'ancestors': ancestors,
+            'same': same,
+            'sizes': sizes}
+
+
+def _update_tolerance(builder, shape, input_shape):
+    """
+    Increase the tolerance of an input sub-shape to that of the same
+    sub-shape in the results. This only occurs if the inputs were modified
+    by a destructive operation in another process.
+    """
+    shape_type = shape.ShapeType()
+    if shape_type == TopAbs_VERTEX:
+        tol = BRep_Tool.Tolerance(topods.Vertex(shape))
+        if tol > BRep_Tool.Tolerance(topods.Vertex(input_shape)):
+            builder.UpdateVertex(topods.Vertex(input_shape), tol)
+    elif shape_type == TopAbs_EDGE:
+        tol = BRep_Tool.Tolerance(topods.Edge(shape))
+        if tol > BRep_Tool.Tolerance(topods.Edge(input_shape)):
+            builder.UpdateEdge(topods.Edge(input_shape), tol)
+    elif shape_type == TopAbs_FACE:
+        tol = BRep_Tool.Tolerance(topods.Face(shape))
+        if tol > BRep_Tool.Tolerance(topods.Face(input_shape)):
+            builder.UpdateFace(topods.Face(input_shape), tol)
+
+
+def _add_pcurves(builder, face, edge, input_edge):
+    """
+    Add the curve(s) on a restored face of a restored edge to the same input
+    edge so it can replace the restored edge in the face.
+    """
+    face = topods.Face(face)
+    edge = topods.Edge(edge)
+    input_edge = topods.Edge(input_edge.Oriented(TopAbs_FORWARD))
+    tol = BRep_Tool.Tolerance(edge)
+    if BRep_Tool.IsClosed(edge, face):
+        fwd = topods.Edge(edge.Oriented(TopAbs_FORWARD))
+        rev = topods.Edge(edge.Oriented(TopAbs_REVERSED))
+        crv1, _, _ = BRep_Tool.CurveOnSurface(fwd, face, 0., 0.)
+        crv2, _, _ = BRep_Tool.CurveOnSurface(rev, face, 0., 0.)
+        if crv1 is not None and crv2 is not None:
+            builder.UpdateEdge(input_edge, crv1, crv2, face, tol)
+    else:
+        crv, _, _ = BRep_Tool.CurveOnSurface(edge, face, 0., 0.)
+        if crv is not None:
+            builder.UpdateEdge(input_edge, crv, face, tol)
+
+
+def _reshape_to_inputs(shape_set, same, input_maps, topods_list):
+    """
+    Replace the restored sub-shapes that are the same as an input sub-shape
+    by the input sub-shape so the results share topology with the inputs,
+    as they do when the operation is built in this process. Tolerances
+    increased by a destructive operation in another process are applied to
+    the inputs.
+    """
+    builder = BRep_Builder()
+    reshape = BRepTools_ReShape()
+    replaced = TopTools_IndexedMapOfShape()
+    input_edges = []
+    for key, i, j in same:
+        shape = occ_utils.shape_set_get(shape_set, *key)
+        input_shape = input_maps[i].FindKey(j)
+        _update_tolerance(builder, shape, input_shape)
+        reshape.Replace(shape, input_shape.Oriented(shape.Orientation()))
+        replaced.Add(shape)
+        if shape.ShapeType() == TopAbs_EDGE:
+            input_edges.append((shape, input_shape))
+
+    # Input edges that bound new faces need curves on their surfaces. The
+    # restored faces have their own copy of the surface.
+    if input_edges:
+        edge_map = TopTools_IndexedMapOfShape()
+        for edge, _ in input_edges:
+            edge_map.Add(edge)
+        face_map = TopTools_IndexedMapOfShape()
+        for shape in topods_list:
+            topexp.MapShapes(shape, TopAbs_FACE, face_map)
+        for k in range(1, face_map.Extent() + 1):
+            face = face_map.FindKey(k)
+            if replaced.Contains(face):
+                continue
+            exp = TopExp_Explorer(face, TopAbs_EDGE)
+            while exp.More():
+                edge = exp.Current()
+                n = edge_map.FindIndex(edge)
+                if n > 0:
+                    _add_pcurves(builder, face, edge, input_edges[n - 1][1])
+                exp.Next()
+
+    return [reshape.Apply(shape) for shape in topods_list]
+
+
+def _entry_from_data(data, inputs):
+    """
+    Restore the result and history of a Boolean operation collected by
+    :func:`_entry_data` for the given inputs.
+    """
+    input_maps = [_shape_map(s) for s in inputs]
+    sizes = [map_.Extent() for map_ in input_maps]
+    if sizes != data['sizes']:
+        return None
+
+    shape_set = occ_utils.shape_set_from_bytes(data['data'])
+
+    # Restore all shapes first so they are reshaped together
+    keys = [data['shape']] + list(data['section_edges'])
+    for _, _, mod, gen, _ in data['history']:
+        keys += mod + gen
+    keys += [k for k, _, _ in data['ancestors']]
+    topods_list = [occ_utils.shape_set_get(shape_set, *k) for k in keys]
+    topods_list = _reshape_to_inputs(shape_set, data['same'], input_maps,
+                                     topods_list)
+    shapes = iter(Shape.wrap(s) for s in topods_list)
+
+    def _get(keys_):
+        return [next(shapes) for _ in keys_]
+
+    shape = _get([data['shape']])[0]
+    section_edges = _get(data['section_edges'])
+    history = {}
+    for i, j, mod, gen, deleted in data['history']:
+        history[(i, j)] = (_get(mod), _get(gen), deleted)
+    ancestors = [(_get([k])[0], j1, j2)
+                 for k, j1, j2 in data['ancestors']]
+
+    return _BopCacheEntry(shape, section_edges, history, ancestors,
+                          input_maps)
+
+
+# Boolean operations that can be cached or run in a separate process
+_ISOLATED_BOPS = (BRepAlgoAPI_Fuse, BRepAlgoAPI_Cut, BRepAlgoAPI_Common,
+                  BRepAlgoAPI_Section, BRepAlgoAPI_Splitter)
+
+
+def _isolated_bop(bop_name, data, fuzzy_val, nondestructive, options):
+    """
+    Build a Boolean operation in a separate process and return its result
+    and history, or *None* if it failed.
+    """
+    from afem.exchange import serialize
+
+    args, tools = serialize.loads(data)
+    bop_types = dict((t.__name__, t) for t in _ISOLATED_BOPS)
+    bop = BopAlgo(None, None, fuzzy_val, nondestructive, bop_types[bop_name])
+    if options:
+        bop._bop.ComputePCurveOn1(options[0])
+        bop._bop.ComputePCurveOn2(options[1])
+        bop._bop.Approximation(options[2])
+    bop.set_args(args)
+    bop.set_tools(tools)
+    BopCore.build(bop)
+    if not bop.is_done:
+        return None
+    return _entry_data(bop, args + tools)
+
+
+class BopCache(object):
+    """
+    Persistent on-disk cache of Boolean operation results. Entries are keyed
+    on the content (geometry and topology) of the arguments and tools, the
+    operation type, and its options, so results are reused across sessions
+    when the same operation is repeated on equivalent shapes. Results are
+    stored as the ASCII text of a BRep shape set together with their history
+    so :meth:`.BopCore.modified`, :meth:`.BopCore.generated`, and
+    :meth:`.BopCore.is_deleted` still work for cached results. Sub-shapes of
+    a cached result that were left unchanged by the operation are replaced
+    by those of the inputs when it is restored, so the result shares
+    topology with the inputs. The least recently used entries are removed
+    when the total size of the cache exceeds its limit. Entries that cannot
+    be read are removed.
+
+    :cvar bool enabled: Option to use the cache. The default is taken from
+        :class:`.Settings`.
+    :cvar str path: The cache directory.
+    :cvar int max_size: The maximum total size of the cache in bytes.
+    :cvar int hits: Number of cache hits.
+    :cvar int misses: Number of cache misses.
+    """
+    enabled = Settings.bop_cache
+    path = Settings.bop_cache_path or os.path.join(os.path.expanduser('~'),
+                                                   '.afem', 'bop_cache')
+    max_size = Settings.bop_cache_size
+    hits = 0
+    misses = 0
+    _ext = '.bop'
+    _lock = Lock()
+
+    @classmethod
+    def key(cls, bop):
+        """
+        Generate the cache key of a Boolean operation.
+
+        :param afem.topology.bop.BopAlgo bop: The Boolean operation.
+
+        :return: The key.
+        :rtype: str
+        """
+        items = [bop._bop.__class__.__name__,
+                 repr(bop._bop.FuzzyValue()),
+                 repr(bop._bop.NonDestructive()),
+                 repr(bop._cache_opts)]
+        items += ['a' + s.fingerprint() for s in bop.arguments]
+        items += ['t' + s.fingerprint() for s in bop.tools]
+        return sha256(' '.join(items).encode()).hexdigest()
+
+    @classmethod
+    def _fn(cls, key):
+        return os.path.join(cls.path, key + cls._ext)
+
+    @classmethod
+    def get(cls, key, inputs):
+        """
+        Get a cached result.
+
+        :param str key: The key.
+        :param list(afem.topology.entities.Shape) inputs: The arguments
+            followed by the tools of the operation.
+
+        :return: The cache entry or *None* if not found.
+        :rtype: afem.topology.bop._BopCacheEntry or None
+        """
+        fn = cls._fn(key)
+        try:
+            f = open(fn, 'rb')
+        except OSError:
+            with cls._lock:
+                cls.misses += 1
+            return None
+
+        # Truncated or incompatible entries may fail in many ways
+        try:
+            with f:
+                data = pickle.load(f)
+            entry = _entry_from_data(data, inputs)
+        except Exception as e:
+            msg = 'Removing unreadable Boolean cache entry {}: {}: {}'
+            logger.warning(msg.format(fn, e.__class__.__name__, e))
+            try:
+                os.remove(fn)
+            except OSError:
+                pass
+            entry = None
+        else:
+            # Mark as recently used
+            try:
+                os.utime(fn, None)
+            except OSError:
+                pass
+
+        with cls._lock:
+            if entry is None:
+                cls.misses += 1
+            else:
+                cls.hits += 1
+        return entry
+
+    @classmethod
+    def put(cls, key, bop, inputs, data=None):
+        """
+        Store the result of a Boolean operation.
+
+        :param str key: The key.
+        :param afem.topology.bop.BopAlgo bop: The Boolean operation.
+        :param list(afem.topology.entities.Shape) inputs: The arguments
+            followed by the tools of the operation.
+        :param dict data: The result and history if already collected.
+
+        :return: None.
+        """
+        if data is None:
+            data = _entry_data(bop, inputs)
+
+        fn = cls._fn(key)
+        tmp = '{}.{}.tmp'.format(fn, os.getpid())
+        try:
+            os.makedirs(cls.path, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, fn)
+        except OSError as e:
+            logger.warning('Failed to write Boolean cache entry: {}'.format(e))
+            return None
+
+        cls._evict(cls.max_size)
+
+    @classmethod
+    def _entries(cls):
+        """
+        List the cache files with their modification time and size.
+        """
+        entries = []
+        try:
+            names = os.listdir(cls.path)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(cls._ext):
+                continue
+            fn = os.path.join(cls.path, name)
+            try:
+                stat = os.stat(fn)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fn))
+        return entries
+
+    @classmethod
+    def _evict(cls, max_size):
+        """
+        Remove the least recently used entries until the total size is
+        within the limit.
+        """
+        entries = cls._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= max_size:
+            return None
+        entries.sort()
+        for _, size, fn in entries:
+            if total <= max_size:
+                break
+            try:
+                os.remove(fn)
+            except OSError:
+                continue
+            total -= size
+
+    @classmethod
+    def size(cls):
+        """
+        :return: The total size of the cache in bytes.
+        :rtype: int
+        """
+        return sum(size for _, size, _ in cls._entries())
+
+    @classmethod
+    def clear(cls):
+        """
+        Remove all entries and reset the statistics.
+
+        :return: None.
+        """
+        cls._evict(-1)
+        with cls._lock:
+            cls.hits = 0
+            cls.misses = 0
+
+    @classmethod
+    def set_path(cls, path):
+        """
+        Set the cache directory. It is created when the first entry is
+        stored.
+
+        :param str path: The directory.
+
+        :return: None.
+        """
+        cls.path = path
+
+    @classmethod
+    def set_max_size(cls, max_size):
+        """
+        Set the maximum total size of the cache, removing the least recently
+        used entries if needed.
+
+        :param int max_size: The maximum size in bytes.
+
+        :return: None.
+        """
+        cls.max_size = max_size
+        cls._evict(max_size)
+
+    @classmethod
+    def set_enabled(cls, enabled=True, path=None):
+        """
+        Enable or disable the cache. Entries on disk are kept when it is
+        disabled.
+
+        :param bool enabled: Option to use the cache.
+        :param str path: Optional cache directory.
+
+        :return: None.
+        """
+        cls.enabled = enabled
+        if path is not None:
+            cls.path = path
+
+
 class BopCore(object):
     """
     Core class for Boolean operations and enabling attributes and methods for
@@ -56,6 +600,7 @@ class BopCore(object):
 
     def __init__(self):
         self._bop = None
+        self._cached = None
 
     def build(self):
         """
@@ -68,12 +613,23 @@ class BopCore(object):
         else:
             self._bop.Build()
 
+    @property
+    def is_cached(self):
+        """
+        :return: *True* if the results were restored from the
+            :class:`.BopCache`, *False* if not.
+        :rtype: bool
+        """
+        return self._cached is not None
+
     @property
     def is_done(self):
         """
         :return: *True* if operation is done, *False* if not.
         :rtype: bool
         """
+        if self._cached is not None:
+            return True
         if isinstance(self._bop, (BOPAlgo_MakerVolume,
                                   BRepFeat_MakeCylindricalHole)):
             return not self._bop.HasErrors()
@@ -85,6 +641,8 @@ class BopCore(object):
         :return: The resulting shape.
         :rtype: afem.topology.entities.Shape
         """
+        if self._cached is not None:
+            return self._cached.shape
         return Shape.wrap(self._bop.Shape())
 
     def modified(self, shape):
@@ -96,6 +654,8 @@ class BopCore(object):
         :return: List of modified shapes.
         :rtype: list(afem.topology.entities.Shape)
         """
+        if self._cached is not None:
+            return self._cached.modified(shape)
         return Shape.from_topods_list(self._bop.Modified(shape.object))
 
     def generated(self, shape):
@@ -107,6 +667,8 @@ class BopCore(object):
         :return: List of generated shapes.
         :rtype: list(afem.topology.entities.Shape)
         """
+        if self._cached is not None:
+            return self._cached.generated(shape)
         return Shape.from_topods_list(self._bop.Generated(shape.object))
 
     def is_deleted(self, shape):
@@ -118,6 +680,8 @@ class BopCore(object):
         :return: *True* if deleted, *False* if not.
         :rtype: bool
         """
+        if self._cached is not None:
+            return self._cached.is_deleted(shape)
         return self._bop.IsDeleted(shape.object)
 
 
@@ -129,7 +693,8 @@ class BopAlgo(BopCore):
     :type shape1: afem.topology.entities.Shape or None
     :param shape2: The second shape.
     :type shape2: afem.topology.entities.Shape or None
-    :param float fuzzy_val: Fuzzy tolerance value.
+    :param float fuzzy_val: Fuzzy tolerance value. If *None* then the value
+        in :class:`.Settings` is used.
     :param bool nondestructive: Option to not modify the input shapes.
     :param bop: The OpenCASCADE class for the Boolean operation.
 
@@ -137,13 +702,22 @@ class BopAlgo(BopCore):
 
         If *shape1* or *shape2* is *None* then the user is expected to manually
         set the arguments and tools and build the result.
+
+    .. note::
+
+        If the :class:`.BopCache` is enabled, the results of fuse, cut,
+        common, intersect, and split operations are restored from it when
+        available and stored in it otherwise.
     """
 
     def __init__(self, shape1, shape2, fuzzy_val, nondestructive, bop):
         super(BopAlgo, self).__init__()
 
         self._bop = bop()
+        self._cache_opts = ()
 
+        if fuzzy_val is None:
+            fuzzy_val = Settings.fuzzy_val
         if fuzzy_val is not None:
             self._bop.SetFuzzyValue(fuzzy_val)
 
@@ -157,6 +731,106 @@ class BopAlgo(BopCore):
             self.set_tools([shape2])
             self.build()
 
+    def build(self, monitor=None, timeout=None):
+        """
+        Build the results, using the :class:`.BopCache` if it is enabled.
+
+        :param monitor: Optional progress monitor that is checked for
+            cancellation before the operation and updated after it.
+        :type monitor: afem.misc.progress.ProgressMonitor or None
+        :param timeout: Optional time limit in seconds. If provided, or if
+            the monitor has a time budget, the operation is run in a separate
+            process that is terminated if the limit is exceeded. The result
+            and its history are restored in this process. Only fuse, cut,
+            common, intersect, and split operations support a time limit.
+            Other operations log a warning and run in this process without
+            one.
+        :type timeout: float or None
+
+        :return: None.
+
+        :raise afem.misc.progress.OperationCancelled: If the monitor is
+            cancelled.
+        :raise afem.misc.progress.OperationTimeout: If the time limit is
+            exceeded.
+        """
+        self._cached = None
+        name = self.__class__.__name__
+        if monitor is not None:
+            monitor.update(message='Building {}'.format(name))
+            if timeout is None:
+                timeout = monitor.remaining
+
+        supported = isinstance(self._bop, _ISOLATED_BOPS)
+        if not supported:
+            if timeout is not None:
+                msg = ('A time limit is not supported for {} so it will run '
+                       'in this process without one.'.format(name))
+                logger.warning(msg)
+            super(BopAlgo, self).build()
+        else:
+            inputs = self.arguments + self.tools
+            key = None
+            if BopCache.enabled:
+                key = BopCache.key(self)
+                self._cached = BopCache.get(key, inputs)
+
+            if self._cached is None:
+                if timeout is None:
+                    super(BopAlgo, self).build()
+                    if key is not None and self.is_done:
+                        BopCache.put(key, self, inputs)
+                else:
+                    self._build_isolated(inputs, key, timeout, monitor)
+
+        if monitor is not None:
+            monitor.update(1., 'Finished {}'.format(name))
+
+    def _build_isolated(self, inputs, key, timeout, monitor):
+        """
+        Build the results in a separate process.
+        """
+        args = self._isolated_args(inputs)
+        data = run_isolated(_isolated_bop, args, timeout=timeout,
+                            monitor=monitor)
+        if self._restore(data, inputs) and key is not None:
+            BopCache.put(key, self, inputs, data)
+
+    def _isolated_args(self, inputs):
+        """
+        Get the arguments of :func:`_isolated_bop` for this operation.
+        """
+        from afem.exchange import serialize
+
+        # Serialize the inputs together so shared sub-shapes remain shared
+        nargs = len(self.arguments)
+        data = serialize.dumps((inputs[:nargs], inputs[nargs:]))
+        return (self._bop.__class__.__name__, data, self._bop.FuzzyValue(),
+                self._bop.NonDestructive(), self._cache_opts)
+
+    def _restore(self, data, inputs):
+        """
+        Restore the results from data collected by :func:`_entry_data`.
+        """
+        self._cached = None
+        if data is not None:
+            self._cached = _entry_from_data(data, inputs)
+        return self._cached is not None
+
+    def _build_uncached(self):
+        """
+        Build the operation in this process if its results were restored
+        from the cache or another process, since the OpenCASCADE algorithm
+        itself was not built then.
+        """
+        if self._cached is None:
+            return None
+        msg = ('Building {} again in this process since its results were '
+               'restored.'.format(self.__class__.__name__))
+        logger.info(msg)
+        self._cached = None
+        BopCore.build(self)
+
     @staticmethod
     def set_parallel_mode(flag):
         """
@@ -166,17 +840,25 @@ class BopAlgo(BopCore):
             execution on, *False* turns it off.
 
         :return: None.
+
+        .. seealso::
+
+            :meth:`afem.config.Settings.set_parallel`
         """
-        BOPAlgo_Options.SetParallelMode_(flag)
+        Settings.set_parallel(flag)
 
     def debug(self, path='.'):
         """
-        Export files for debugging Boolean operations.
+        Export files for debugging Boolean operations. If the results were
+        restored from the :class:`.BopCache` or another process, then the
+        operation is built again in this process first.
 
         :param path:
 
         :return:
         """
+        self._build_uncached()
+
         # Generate a suffix using timestamp
         now = datetime.now()
         timestamp = str(now.timestamp())
@@ -289,7 +971,9 @@ class BopAlgo(BopCore):
 
     def refine_edges(self):
         """
-        Fuse C1 edges.
+        Fuse C1 edges. If the results were restored from the
+        :class:`.BopCache` or another process, then the operation is built
+        again in this process first.
 
         :return: None.
         """
@@ -300,17 +984,22 @@ class BopAlgo(BopCore):
                    'Doing nothing.'.format(n))
             logger.warning(msg)
         else:
+            self._build_uncached()
             self._bop.RefineEdges()
 
     @property
     def fuse_edges(self):
         """
-        :return: The result flag of edge refining.
+        :return: The result flag of edge refining. This is *False* for
+            results restored from the :class:`.BopCache` or another process
+            since their edges have not been refined.
         :rtype: bool
         """
         if isinstance(self._bop, (BRepAlgoAPI_Splitter, BOPAlgo_MakerVolume,
                                   BRepFeat_MakeCylindricalHole)):
             return False
+        elif self._cached is not None:
+            return False
         else:
             return self._bop.FuseEdges()
 
@@ -328,6 +1017,8 @@ class BopAlgo(BopCore):
                    'Returning an empty list.'.format(n))
             logger.warn(msg)
             return []
+        elif self._cached is not None:
+            return list(self._cached.section_edges)
         else:
             return Shape.from_topods_list(self._bop.SectionEdges())
 
@@ -337,6 +1028,8 @@ class BopAlgo(BopCore):
         :return: *True* if there is at least one modified shape.
         :rtype: bool
         """
+        if self._cached is not None:
+            return self._cached.has_modified
         return self._bop.HasModified()
 
     @property
@@ -345,6 +1038,8 @@ class BopAlgo(BopCore):
         :return: *True* if there is at least one generated shape.
         :rtype: bool
         """
+        if self._cached is not None:
+            return self._cached.has_generated
         return self._bop.HasGenerated()
 
     @property
@@ -353,6 +1048,8 @@ class BopAlgo(BopCore):
         :return: *True* if there is at least one deleted shape.
         :rtype: bool
         """
+        if self._cached is not None:
+            return self._cached.has_deleted
         return self._bop.HasDeleted()
 
 
@@ -457,6 +1154,7 @@ class IntersectShapes(BopAlgo):
         self._bop.ComputePCurveOn1(compute_pcurve1)
         self._bop.ComputePCurveOn2(compute_pcurve2)
         self._bop.Approximation(approximate)
+        self._cache_opts = (compute_pcurve1, compute_pcurve2, approximate)
 
         build1, build2 = False, False
         if isinstance(shape1, (Shape, Surface)):
@@ -468,7 +1166,7 @@ class IntersectShapes(BopAlgo):
             build2 = True
 
         if build1 and build2:
-            self._bop.Build()
+            self.build()
 
     def has_ancestor_face1(self, edge):
         """
@@ -480,6 +1178,9 @@ class IntersectShapes(BopAlgo):
         :return: *True* and the face if available, *False* and *None* if not.
         :rtype: tuple(bool, afem.topology.entities.Face or None)
         """
+        if self._cached is not None:
+            f = self._cached.ancestor_face(edge, 0)
+            return f is not None, f
         f = TopoDS_Face()
         if self._bop.HasAncestorFaceOn1(edge.object, f):
             return True, Face(f)
@@ -495,6 +1196,9 @@ class IntersectShapes(BopAlgo):
         :return: *True* and the face if available, *False* and *None* if not.
         :rtype: tuple(bool, afem.topology.entities.Face or None)
         """
+        if self._cached is not None:
+            f = self._cached.ancestor_face(edge, 1)
+            return f is not None, f
         f = TopoDS_Face()
         if self._bop.HasAncestorFaceOn2(edge.object, f):
             return True, Face(f)
@@ -598,6 +1302,53 @@ class CutCylindricalHole(BopAlgo):
         self._bop.Perform(radius)
 
 
+class CutCylindricalHoles(CutShapes):
+    """
+    Cut many cylindrical holes on a shape in one Boolean operation. Each hole
+    is cut by a solid cylinder centered on the location of its axis.
+
+    :param afem.topology.entities.Shape shape: The shape.
+    :param float radius: The radius of the holes.
+    :param axes: The axis of each hole.
+    :type axes: collections.Sequence(afem.geometry.entities.Axis1)
+    :param float height: The length of each cylinder. If not provided, twice
+        the diagonal of the bounding box of the shape is used so each hole
+        passes through the shape like :class:`.CutCylindricalHole`.
+    :param float fuzzy_val: Fuzzy tolerance value.
+    :param bool nondestructive: Option to not modify the input shapes.
+    """
+
+    def __init__(self, shape, radius, axes, height=None, fuzzy_val=None,
+                 nondestructive=False):
+        super(CutCylindricalHoles, self).__init__(None, None, fuzzy_val,
+                                                  nondestructive)
+
+        if height is None:
+            bbox = BBox()
+            bbox.add_shape(shape)
+            height = 2. * bbox.diagonal
+
+        tools = []
+        for ax1 in axes:
+            d = ax1.Direction()
+            p0 = ax1.Location().Translated(gp_Vec(d).Multiplied(-height / 2.))
+            builder = BRepPrimAPI_MakeCylinder(gp_Ax2(p0, d), radius, height)
+            tools.append(Shape.wrap(builder.Solid()))
+        self._cylinders = tools
+
+        self.set_args([shape])
+        self.set_tools(tools)
+        self.build()
+
+    @property
+    def cylinders(self):
+        """
+        :return: The cylinders used to cut the holes.
+        :rtype: list(afem.topology.entities.Solid)
+        """
+        return self._cylinders
+
+
 class LocalSplit(BopCore):
     """
     Perform a local split of a shape in the context of a basis shape. This tool
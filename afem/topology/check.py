@@ -16,52 +16,163 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
-from OCC.Core.BRepCheck import BRepCheck_Analyzer, BRepCheck_NoError
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+
+from OCC.Core.BRep import BRep_Tool
+from OCC.Core.BRepCheck import (BRepCheck_Analyzer, BRepCheck_NoError,
+                                BRepCheck_Shell, BRepCheck_Status)
 from OCC.Core.BRepClass3d import BRepClass3d_SolidClassifier
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
 from OCC.Core.TopAbs import TopAbs_IN, TopAbs_ON, TopAbs_OUT, TopAbs_UNKNOWN
-
-from afem.config import logger
+from OCC.Core.TopExp import topexp
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.TopTools import TopTools_IndexedMapOfShape
+from OCC.Core.gp import gp_Pnt
+from numpy import (abs as np_abs, array, cross, empty, errstate, float64,
+                   full, int32, maximum, minimum, unique, zeros)
+
+from afem.config import Settings, logger
 from afem.geometry.check import CheckGeom
-from afem.topology.entities import Face
+from afem.topology.entities import BBox, Face, Shape
+
+__all__ = ["CheckShape", "ClassifyPointInSolid", "ClassifyPointsInSolid"]
 
-__all__ = ["CheckShape", "ClassifyPointInSolid"]
 
+_REPORT_DTYPE = [('index', int32), ('type', int32), ('status', int32)]
 
-def _invalid_subshapes(shape, check, errors):
+
+def _check_shape(topods_shape, geom, include_root=False):
     """
-    Find invalid sub-shapes.
+    Analyze a shape and find the errors of each of its sub-shapes. Each
+    sub-shape is visited once using an indexed map. The shape itself is the
+    first key of the map and is only included if requested.
     """
-    invalid = []
-    for sub_shape in shape.shape_iter:
-        result = check.Result(sub_shape.object)
-        list_of_status = result.Status()
-        for status in list_of_status:
+    check = BRepCheck_Analyzer(topods_shape, geom)
+    map_ = TopTools_IndexedMapOfShape()
+    topexp.MapShapes(topods_shape, map_)
+    rows = []
+    if check.IsValid():
+        return check, map_, rows
+
+    first = 1 if include_root else 2
+    for i in range(first, map_.Size() + 1):
+        sub_shape = map_.FindKey(i)
+        result = check.Result(sub_shape)
+        if result is None:
+            continue
+        for status in result.Status():
             if status != BRepCheck_NoError:
-                type_ = sub_shape.__class__.__name__
-                error = str(status).split('.')[-1]
-                msg = '\t{0}: {1}'.format(type_, error)
-                errors.append(msg)
-                invalid.append(sub_shape)
-        invalid += _invalid_subshapes(sub_shape, check, errors)
+                rows.append((i, int(sub_shape.ShapeType()), int(status)))
+    return check, map_, rows
 
-    return invalid
+
+def _check_shapes_worker(topods_shapes, geom):
+    """
+    Analyze shapes in a worker process. Each shape is a sub-shape of the
+    original shape, so its own errors are included.
+    """
+    results = []
+    for topods_shape in topods_shapes:
+        check, _, rows = _check_shape(topods_shape, geom, True)
+        results.append((check.IsValid(), rows))
+    return results
+
+
+def _independent_shapes(shape):
+    """
+    Expand nested compounds into a list of their non-compound members.
+    """
+    shapes = []
+    for sub_shape in shape.shape_iter:
+        if sub_shape.is_compound:
+            shapes += _independent_shapes(sub_shape)
+        else:
+            shapes.append(sub_shape)
+    return shapes
 
 
 class CheckShape(object):
     """
-    Check shape and its sub-shapes for errors.
+    Check shape and its sub-shapes for errors. Each unique sub-shape is only
+    reported once and the errors are available as a structured array. Only
+    the errors of the sub-shapes are reported and not those of the shape
+    itself.
 
     :param afem.topology.entities.Shape shape: The shape.
     :param bool geom: Option to check geometry in additional to topology.
+    :param bool parallel: Option to split a compound into its independent
+        members (e.g., solids and shells) and check them in separate
+        processes. Each member is analyzed with its own sub-shapes, so
+        sub-shapes shared between members are checked once per member
+        but still only reported once.
+    :param max_workers: The maximum number of worker processes. If *None*
+        then the value in :class:`.Settings` is used.
+    :type max_workers: int or None
     """
 
-    def __init__(self, shape, geom=True):
-        self._check = BRepCheck_Analyzer(shape.object, geom)
+    def __init__(self, shape, geom=True, parallel=False, max_workers=None):
+        self._check = None
+        members = []
+        if parallel and shape.is_compound:
+            members = _independent_shapes(shape)
+
+        if len(members) > 1:
+            self._map = TopTools_IndexedMapOfShape()
+            topexp.MapShapes(shape.object, self._map)
+            self._is_valid, rows = self._check_members(members, geom,
+                                                       max_workers)
+        else:
+            self._check, self._map, rows = _check_shape(shape.object, geom)
+            self._is_valid = self._check.IsValid()
+
+        self._report = array(sorted(set(rows)), dtype=_REPORT_DTYPE)
+
+        # Unique invalid shapes and error messages
         self._invalid = []
         self._errors = []
-        if not self._check.IsValid():
-            self._invalid = _invalid_subshapes(shape, self._check,
-                                               self._errors)
+        for i in unique(self._report['index']):
+            self._invalid.append(Shape.wrap(self._map.FindKey(int(i))))
+        for i, status in zip(self._report['index'], self._report['status']):
+            type_ = Shape.wrap(self._map.FindKey(int(i))).__class__.__name__
+            error = BRepCheck_Status(int(status)).name
+            msg = '\t{0}: {1}'.format(type_, error)
+            self._errors.append(msg)
+
+    def _check_members(self, members, geom, max_workers):
+        """
+        Check the members in a process pool and map the results back to the
+        indices of the original shape.
+        """
+        if max_workers is None:
+            max_workers = Settings.max_workers
+        if max_workers is None:
+            max_workers = cpu_count()
+        nchunks = min(len(members), 4 * max_workers)
+        chunks = [members[i::nchunks] for i in range(nchunks)]
+
+        with ProcessPoolExecutor(max_workers) as executor:
+            futures = []
+            for chunk in chunks:
+                topods_shapes = [member.object for member in chunk]
+                futures.append(executor.submit(_check_shapes_worker,
+                                               topods_shapes, geom))
+            results = [future.result() for future in futures]
+
+        is_valid = True
+        rows = []
+        for chunk, chunk_results in zip(chunks, results):
+            for member, (member_valid, member_rows) in zip(chunk,
+                                                           chunk_results):
+                if member_valid:
+                    continue
+                is_valid = False
+                member_map = TopTools_IndexedMapOfShape()
+                topexp.MapShapes(member.object, member_map)
+                for i, type_, status in member_rows:
+                    j = self._map.FindIndex(member_map.FindKey(i))
+                    rows.append((j, type_, status))
+        return is_valid, rows
 
     @property
     def is_valid(self):
@@ -70,7 +181,7 @@ class CheckShape(object):
             *False* if not.
         :rtype: bool
         """
-        return self._check.IsValid()
+        return self._is_valid
 
     @property
     def invalid_shapes(self):
@@ -80,6 +191,28 @@ class CheckShape(object):
         """
         return self._invalid
 
+    @property
+    def report(self):
+        """
+        :return: Structured array with one row per error. The fields are
+            the *index* of the sub-shape in the indexed map of the shape, the
+            *type* of the sub-shape (TopAbs_ShapeEnum), and the BRepCheck
+            *status* code.
+        :rtype: numpy.ndarray
+        """
+        return self._report
+
+    def sub_shape(self, index):
+        """
+        Get a sub-shape by its index in the report.
+
+        :param int index: The index.
+
+        :return: The sub-shape.
+        :rtype: afem.topology.entities.Shape
+        """
+        return Shape.wrap(self._map.FindKey(int(index)))
+
     def print_errors(self):
         """
         Print the errors.
@@ -106,7 +239,15 @@ class CheckShape(object):
 
         :return: *True* if valid, *False* if not.
         """
-        return self._check.IsValid(shape.object)
+        if self._check is not None:
+            return self._check.IsValid(shape.object)
+
+        map_ = TopTools_IndexedMapOfShape()
+        topexp.MapShapes(shape.object, map_)
+        for i in self._report['index']:
+            if map_.Contains(self._map.FindKey(int(i))):
+                return False
+        return True
 
 
 class ClassifyPointInSolid(object):
@@ -187,3 +328,232 @@ class ClassifyPointInSolid(object):
         :rtype: afem.topology.entities.Face
         """
         return Face(self._tool.Face())
+
+
+def _solid_triangles(solid, deflection):
+    """
+    Triangulate the faces of a solid and return the triangle vertices as
+    three arrays with shape (n, 3).
+    """
+    BRepMesh_IncrementalMesh(solid.object, deflection, False, 0.5,
+                             Settings.parallel)
+
+    v0, v1, v2 = [], [], []
+    for face in solid.faces:
+        loc = TopLoc_Location()
+        tri = BRep_Tool.Triangulation(face.object, loc)
+        if tri is None or tri.NbTriangles() == 0:
+            return None
+        trsf = loc.Transformation()
+        nodes = []
+        for i in range(1, tri.NbNodes() + 1):
+            p = tri.Node(i).Transformed(trsf)
+            nodes.append((p.X(), p.Y(), p.Z()))
+        for i in range(1, tri.NbTriangles() + 1):
+            n1, n2, n3 = tri.Triangle(i).Get()
+            v0.append(nodes[n1 - 1])
+            v1.append(nodes[n2 - 1])
+            v2.append(nodes[n3 - 1])
+
+    if not v0:
+        return None
+    return (array(v0, dtype=float64), array(v1, dtype=float64),
+            array(v2, dtype=float64))
+
+
+class ClassifyPointsInSolid(object):
+    """
+    Classify many points in a solid at once. The solid is loaded once and
+    points outside of its bounding box are rejected together. The remaining
+    points are classified by counting ray crossings against a triangulation
+    of the solid, and only points near the boundary, or whose result is
+    ambiguous, are classified by the exact classifier. All points are
+    classified exactly if the solid is infinite or not closed.
+
+    :param afem.topology.entities.Solid solid: The solid.
+    :param points: The points. If not provided the *perform()* method will
+        need to be used.
+    :type points: collections.Sequence(point_like) or numpy.ndarray or None
+    :param float tol: The tolerance.
+    :param float deflection: The linear deflection used to triangulate the
+        solid. If not provided then the value in :class:`.Settings` is used,
+        or a fraction of the bounding box diagonal if that is *None*.
+
+    :cvar int IN: State of a point inside the solid.
+    :cvar int OUT: State of a point outside the solid.
+    :cvar int ON: State of a point on the boundary of the solid.
+    :cvar int UNKNOWN: State of a point that could not be classified.
+    """
+    IN = int(TopAbs_IN)
+    OUT = int(TopAbs_OUT)
+    ON = int(TopAbs_ON)
+    UNKNOWN = int(TopAbs_UNKNOWN)
+
+    # Two ray directions that are unlikely to align with model features
+    _RAY1 = array([0.5901234567, 0.5538888901, 0.5870504923])
+    _RAY2 = array([-0.3141592653, 0.8660254037, 0.2718281828])
+
+    # Maximum number of point-triangle pairs evaluated at once
+    _CHUNK = 250000
+
+    def __init__(self, solid, points=None, tol=1.0e-7, deflection=None):
+        self._solid = solid
+        self._tool = BRepClass3d_SolidClassifier(solid.object)
+        self._states = empty(0, dtype=int32)
+        self._nexact = 0
+
+        # Solids without a closed boundary are always classified exactly
+        self._bbox = None
+        self._tris = None
+        is_closed = not solid.infinite
+        if is_closed:
+            for shell in solid.shells:
+                status = BRepCheck_Shell(shell.object).Closed()
+                if status != BRepCheck_NoError:
+                    is_closed = False
+                    break
+
+        if is_closed:
+            bbox = BBox()
+            bbox.add_shape(solid)
+            if not bbox.is_void:
+                if deflection is None:
+                    deflection = Settings.deflection
+                if deflection is None:
+                    deflection = 1.0e-3 * bbox.diagonal
+                self._bbox = array(bbox.Get(), dtype=float64)
+                self._margin = 2. * deflection + solid.tol_max
+                self._tris = _solid_triangles(solid, deflection)
+
+        if points is not None:
+            self.perform(points, tol)
+
+    @property
+    def states(self):
+        """
+        :return: The state of each point.
+        :rtype: numpy.ndarray
+        """
+        return self._states
+
+    @property
+    def is_in(self):
+        """
+        :return: Array that is *True* for points in the solid.
+        :rtype: numpy.ndarray
+        """
+        return self._states == self.IN
+
+    @property
+    def is_out(self):
+        """
+        :return: Array that is *True* for points outside the solid.
+        :rtype: numpy.ndarray
+        """
+        return self._states == self.OUT
+
+    @property
+    def is_on(self):
+        """
+        :return: Array that is *True* for points on the solid.
+        :rtype: numpy.ndarray
+        """
+        return self._states == self.ON
+
+    @property
+    def nexact(self):
+        """
+        :return: The number of points that were classified by the exact
+            classifier during the last *perform()*.
+        :rtype: int
+        """
+        return self._nexact
+
+    def _ray_parity(self, pnts, d):
+        """
+        Count crossings of a ray from each point with the triangles. Return
+        the parity and a flag for crossings too close to a triangle edge to
+        be trusted.
+        """
+        v0, v1, v2 = self._tris
+        e1 = v1 - v0
+        e2 = v2 - v0
+        pvec = cross(d, e2)
+        det = (e1 * pvec).sum(axis=-1)
+        valid = np_abs(det) > 1.0e-14 * (e1 * e1).sum(axis=-1)
+        with errstate(divide='ignore', invalid='ignore'):
+            inv = 1. / det
+            tvec = pnts[:, None, :] - v0[None, :, :]
+            u = (tvec * pvec).sum(axis=-1) * inv
+            qvec = cross(tvec, e1)
+            v = (qvec * d).sum(axis=-1) * inv
+            t = (qvec * e2).sum(axis=-1) * inv
+
+        eps = 1.0e-9
+        inside = (u >= 0.) & (v >= 0.) & (u + v <= 1.)
+        band = ((u > -eps) & (v > -eps) & (u + v < 1. + eps) &
+                ((u < eps) | (v < eps) | (u + v > 1. - eps)))
+        hit = valid & inside & (t > 0.)
+        ambiguous = (valid & band & (t > 0.)).any(axis=-1)
+        return hit.sum(axis=-1) % 2, ambiguous
+
+    def _near_boundary(self, pnts):
+        """
+        Flag points within the margin of the bounding box of any triangle.
+        """
+        v0, v1, v2 = self._tris
+        lo = minimum(minimum(v0, v1), v2) - self._margin
+        hi = maximum(maximum(v0, v1), v2) + self._margin
+        near = ((pnts[:, None, :] >= lo[None, :, :]) &
+                (pnts[:, None, :] <= hi[None, :, :])).all(axis=-1)
+        return near.any(axis=-1)
+
+    def perform(self, points, tol=1.0e-7):
+        """
+        Classify the points.
+
+        :param points: The points.
+        :type points: collections.Sequence(point_like) or numpy.ndarray
+        :param float tol: The tolerance.
+
+        :return: The state of each point.
+        :rtype: numpy.ndarray
+        """
+        pnts = array(points, dtype=float64).reshape(-1, 3)
+        npts = pnts.shape[0]
+        states = full(npts, self.UNKNOWN, dtype=int32)
+        exact = zeros(npts, dtype=bool)
+
+        if self._tris is None:
+            exact[:] = True
+        else:
+            # Reject points outside the bounding box
+            lo = self._bbox[:3] - tol
+            hi = self._bbox[3:] + tol
+            out = ((pnts < lo) | (pnts > hi)).any(axis=-1)
+            states[out] = self.OUT
+
+            # Ray parity for the rest in chunks
+            indx = (~out).nonzero()[0]
+            ntri = self._tris[0].shape[0]
+            step = max(1, self._CHUNK // ntri)
+            for i in range(0, indx.size, step):
+                chunk = indx[i:i + step]
+                p = pnts[chunk]
+                near = self._near_boundary(p)
+                parity1, amb1 = self._ray_parity(p, self._RAY1)
+                parity2, amb2 = self._ray_parity(p, self._RAY2)
+                check = near | amb1 | amb2 | (parity1 != parity2)
+                exact[chunk[check]] = True
+                states[chunk[~check & (parity1 == 1)]] = self.IN
+                states[chunk[~check & (parity1 == 0)]] = self.OUT
+
+        # Exact classification where needed
+        for i in exact.nonzero()[0]:
+            x, y, z = pnts[i]
+            self._tool.Perform(gp_Pnt(x, y, z), tol)
+            states[i] = int(self._tool.State())
+
+        self._nexact = int(exact.sum())
+        self._states = states
+        return states
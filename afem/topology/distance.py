@@ -21,7 +21,7 @@ from OCC.Core.BRepExtrema import (BRepExtrema_DistShapeShape, BRepExtrema_IsVert
 from OCC.Core.Extrema import Extrema_ExtFlag_MIN
 
 from afem.adaptor.entities import FaceAdaptorSurface
-from afem.config import logger
+from afem.config import Settings, logger
 from afem.geometry.check import CheckGeom
 from afem.geometry.entities import Point, Direction
 from afem.topology.entities import Shape, Vertex
@@ -46,9 +46,15 @@ class DistanceShapeToShape(object):
     def __init__(self, shape1, shape2, deflection=1.0e-7):
         shape1 = Shape.to_shape(shape1)
         shape2 = Shape.to_shape(shape2)
-        self._tool = BRepExtrema_DistShapeShape(shape1.object, shape2.object,
-                                                deflection,
-                                                Extrema_ExtFlag_MIN)
+        self._tool = BRepExtrema_DistShapeShape()
+        self._tool.SetDeflection(deflection)
+        self._tool.SetFlag(Extrema_ExtFlag_MIN)
+        # Multi-threading is only available in newer versions of OpenCASCADE
+        if hasattr(self._tool, 'SetMultiThread'):
+            self._tool.SetMultiThread(Settings.parallel)
+        self._tool.LoadS1(shape1.object)
+        self._tool.LoadS2(shape2.object)
+        self._tool.Perform()
 
     @property
     def is_done(self):
@@ -30,10 +30,8 @@ from OCC.Core.BRepBuilderAPI import (
     BRepBuilderAPI_MakePolygon,
 )
 from OCC.Core.BRepClass3d import brepclass3d
-from OCC.Core.BRepGProp import brepgprop
 from OCC.Core.BRepTools import breptools, BRepTools_WireExplorer
 from OCC.Core.Bnd import Bnd_Box
-from OCC.Core.GProp import GProp_GProps
 from OCC.Core.GeomConvert import GeomConvert_CompCurveToBSplineCurve
 from OCC.Core.ShapeAnalysis import ShapeAnalysis_Edge, ShapeAnalysis_ShapeTolerance
 from OCC.Core.ShapeFix import ShapeFix_Solid
@@ -46,14 +44,24 @@ from OCC.Core.TopoDS import (topods, TopoDS_Vertex, TopoDS_Edge, TopoDS_Wire,
                          TopoDS_Iterator)
 
 from afem.base.entities import ViewableItem
+from afem.config import Settings
 from afem.geometry.check import CheckGeom
 from afem.geometry.entities import Point, Curve, Surface
+from afem.occ import utils as occ_utils
 
 __all__ = ["Shape", "Vertex", "Edge", "Wire", "Face", "Shell", "Solid",
            "Compound", "CompSolid",
            "BBox"]
 
 
+def _load_shape(data, index, loc_index, orientation):
+    """
+    Load a pickled shape.
+    """
+    shape = occ_utils.topods_from_bytes(data, index, loc_index, orientation)
+    return Shape.wrap(shape)
+
+
 class Shape(ViewableItem):
     """
     Shape.
@@ -106,6 +114,15 @@ class Shape(ViewableItem):
             return False
         return self.is_same(other)
 
+    def __reduce__(self):
+        """
+        Pickle the shape using an in-memory shape set. Sub-shapes and
+        geometry shared within the shape remain shared when loaded.
+        """
+        state = self.__getstate__()
+        del state['_shape']
+        return _load_shape, occ_utils.topods_to_bytes(self._shape), state
+
     @property
     def displayed_shape(self):
         """
@@ -131,6 +148,26 @@ class Shape(ViewableItem):
         """
         return self.object.HashCode(99999)
 
+    def fingerprint(self, tol=1.0e-7):
+        """
+        Compute a content fingerprint of the shape. Unlike
+        :attr:`.Shape.hash_code`, this depends only on the topology and the
+        underlying geometry, so equivalent shapes have the same fingerprint
+        across sessions. It is not stored on the shape since tolerances may
+        be changed in place, but the fingerprints of its sub-shapes are
+        cached.
+
+        :param float tol: The tolerance used to quantize real values.
+
+        :return: The fingerprint as a hexadecimal string.
+        :rtype: str
+
+        .. seealso::
+
+            :func:`afem.occ.utils.topods_fingerprint`
+        """
+        return occ_utils.topods_fingerprint(self.object, tol)
+
     @property
     def is_null(self):
         """
@@ -321,6 +358,16 @@ class Shape(ViewableItem):
         topexp.MapShapes(self.object, Shape.FACE, map_)
         return map_.Size()
 
+    @property
+    def num_solids(self):
+        """
+        :return: The number of solids in the shape.
+        :rtype: int
+        """
+        map_ = TopTools_IndexedMapOfShape()
+        topexp.MapShapes(self.object, Shape.SOLID, map_)
+        return map_.Size()
+
     @property
     def tol_avg(self):
         """
@@ -365,32 +412,36 @@ class Shape(ViewableItem):
     @property
     def length(self):
         """
-        :return: The length of all edges of the shape.
+        :return: The length of all edges of the shape. The precision is
+            controlled by :class:`.Settings` and the result is cached.
         :rtype: float
         """
-        props = GProp_GProps()
-        brepgprop.LinearProperties(self.object, props, True)
-        return props.Mass()
+        from afem.topology.props import LinearProps
+
+        return LinearProps(self, Settings.props_skip_shared).length
 
     @property
     def area(self):
         """
-        :return: The area of all faces of the shape.
+        :return: The area of all faces of the shape. The precision is
+            controlled by :class:`.Settings` and the result is cached.
         :rtype: float
         """
-        props = GProp_GProps()
-        brepgprop.SurfaceProperties(self.object, props, True)
-        return props.Mass()
+        from afem.topology.props import SurfaceProps
+
+        return SurfaceProps(self, Settings.props_tol,
+                            Settings.props_skip_shared).area
 
     @property
     def volume(self):
         """
-        :return: The voume of all solids of the shape.
+        :return: The volume of all closed solids of the shape. The precision
+            is controlled by :class:`.Settings` and the result is cached.
         :rtype: float
         """
-        props = GProp_GProps()
-        brepgprop.VolumeProperties(self.object, props, True)
-        return props.Mass()
+        from afem.topology.props import VolumeProps
+
+        return VolumeProps(self, Settings.props_tol, True).volume
 
     @property
     def point(self):
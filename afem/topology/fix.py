@@ -19,7 +19,10 @@
 from OCC.Core.BRepCheck import BRepCheck_Analyzer
 from OCC.Core.ShapeBuild import ShapeBuild_ReShape
 from OCC.Core.ShapeFix import ShapeFix_Shape, ShapeFix_ShapeTolerance
+from OCC.Core.TopExp import topexp
+from OCC.Core.TopTools import TopTools_IndexedMapOfShape
 
+from afem.misc.progress import run_isolated
 from afem.topology.entities import Shape
 
 __all__ = ["FixShape"]
@@ -27,6 +30,37 @@ __all__ = ["FixShape"]
 _fix_tol = ShapeFix_ShapeTolerance()
 
 
+def _input_map(shape, context):
+    """
+    Map the shape, the context shape, and their sub-shapes so they can be
+    found by index in another process.
+    """
+    map_ = TopTools_IndexedMapOfShape()
+    topexp.MapShapes(shape.object, map_)
+    if context is not None:
+        topexp.MapShapes(context.object, map_)
+    return map_
+
+
+def _isolated_fix(data, options):
+    """
+    Fix a shape in a separate process and return the fixed shape and the
+    substitutions of the shape and its sub-shapes.
+    """
+    from afem.exchange import serialize
+
+    shape, context = serialize.loads(data)
+    fix = FixShape(shape, *options, context=context)
+
+    map_ = _input_map(shape, context)
+    applied = {}
+    for i in range(1, map_.Extent() + 1):
+        applied[i] = fix.apply(Shape.wrap(map_.FindKey(i)))
+
+    results = {'shape': fix.shape, 'applied': applied}
+    return serialize.dumps(results)
+
+
 class FixShape(object):
     """
     Attempt to fix the shape by applying a number of general fixes.
@@ -36,6 +70,20 @@ class FixShape(object):
     :param float min_tol: Minimum allowed tolerance.
     :param float max_tol: Maximum allowed tolerance.
     :param afem.topology.entities.Shape context: The context shape.
+    :param monitor: Optional progress monitor that is checked for
+        cancellation before the fixes are applied and updated after them.
+    :type monitor: afem.misc.progress.ProgressMonitor or None
+    :param timeout: Optional time limit in seconds. If provided, or if the
+        monitor has a time budget, the fixes are applied in a separate
+        process that is terminated if the limit is exceeded. The fixed shape
+        is restored in this process as a copy that does not share sub-shapes
+        with the original shape, which is left unchanged.
+    :type timeout: float or None
+
+    :raise afem.misc.progress.OperationCancelled: If the monitor is
+        cancelled.
+    :raise afem.misc.progress.OperationTimeout: If the time limit is
+        exceeded.
 
     .. note::
 
@@ -45,7 +93,9 @@ class FixShape(object):
     """
 
     def __init__(self, shape, precision=None, min_tol=None, max_tol=None,
-                 context=None):
+                 context=None, monitor=None, timeout=None):
+        self._results = None
+        self._input_map = None
         self._tool = ShapeFix_Shape()
 
         if precision is not None:
@@ -61,7 +111,32 @@ class FixShape(object):
             self._tool.SetContext(reshape)
 
         self._tool.Init(shape.object)
-        self._tool.Perform()
+        if monitor is not None:
+            monitor.update(message='Fixing shape')
+            if timeout is None:
+                timeout = monitor.remaining
+
+        if timeout is None:
+            self._tool.Perform()
+        else:
+            options = (precision, min_tol, max_tol)
+            self._perform_isolated(shape, context, options, timeout, monitor)
+
+        if monitor is not None:
+            monitor.update(1., 'Finished fixing shape')
+
+    def _perform_isolated(self, shape, context, options, timeout, monitor):
+        """
+        Apply the fixes in a separate process.
+        """
+        from afem.exchange import serialize
+
+        # Serialize the inputs together so shared sub-shapes remain shared
+        data = serialize.dumps((shape, context))
+        data = run_isolated(_isolated_fix, (data, options), timeout=timeout,
+                            monitor=monitor)
+        self._results = serialize.loads(data)
+        self._input_map = _input_map(shape, context)
 
     @property
     def shape(self):
@@ -69,14 +144,23 @@ class FixShape(object):
         :return: The fixed shape.
         :rtype: afem.topology.entities.Shape
         """
+        if self._results is not None:
+            return self._results['shape']
         return Shape.wrap(self._tool.Shape())
 
     @property
     def context(self):
         """
-        :return: The context.
+        :return: The context. It is not available if the fixes were applied
+            in a separate process.
         :rtype: OCC.Core.ShapeBuild.ShapeBuild_ReShape
+
+        :raise RuntimeError: If the fixes were applied in a separate process.
         """
+        if self._results is not None:
+            msg = ('The context is not available since the fixes were '
+                   'applied in a separate process.')
+            raise RuntimeError(msg)
         return self._tool.Context()
 
     def apply(self, shape):
@@ -88,6 +172,11 @@ class FixShape(object):
         :return: The new shape.
         :rtype: afem.topology.entities.Shape
         """
+        if self._results is not None:
+            i = self._input_map.FindIndex(shape.object)
+            if i == 0:
+                return shape
+            return self._results['applied'][i]
         return Shape.wrap(self.context.Apply(shape.object))
 
     @staticmethod
@@ -16,6 +16,7 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from OCC.Core.BRep import BRep_Builder
 from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_Sewing
 from OCC.Core.BRepTools import BRepTools_Modifier
 from OCC.Core.ShapeBuild import ShapeBuild_ReShape
@@ -23,10 +24,14 @@ from OCC.Core.ShapeCustom import ShapeCustom_BSplineRestriction
 from OCC.Core.ShapeUpgrade import (ShapeUpgrade_ShapeDivideClosed,
                                ShapeUpgrade_ShapeDivideContinuity,
                                ShapeUpgrade_UnifySameDomain)
-from OCC.Core.TopTools import (TopTools_MapOfShape,
-                           TopTools_IndexedMapOfShape)
+from OCC.Core.TopExp import topexp
+from OCC.Core.TopTools import (TopTools_DataMapOfShapeShape,
+                               TopTools_MapOfShape,
+                               TopTools_IndexedMapOfShape)
+from OCC.Core.TopoDS import TopoDS_Compound
 
 from afem.geometry.entities import Geometry
+from afem.misc.progress import run_isolated
 from afem.topology.entities import Shape, Edge, Compound
 
 __all__ = ["DivideClosedShape", "DivideContinuityShape", "DivideC0Shape",
@@ -35,6 +40,59 @@ __all__ = ["DivideClosedShape", "DivideContinuityShape", "DivideC0Shape",
            "ShapeBSplineRestriction"]
 
 
+def _sub_shapes(shape, type_):
+    """
+    Get the unique sub-shapes of a type from a TopoDS_Shape.
+    """
+    map_ = TopTools_IndexedMapOfShape()
+    topexp.MapShapes(shape, type_, map_)
+    return [map_.FindKey(i) for i in range(1, map_.Extent() + 1)]
+
+
+def _input_map(shapes):
+    """
+    Map the inputs of a sewing operation and their sub-shapes so they can
+    be found by index in another process.
+    """
+    map_ = TopTools_IndexedMapOfShape()
+    for _, shape in shapes:
+        topexp.MapShapes(shape.object, map_)
+    return map_
+
+
+def _isolated_sew(data, options):
+    """
+    Sew shapes in a separate process and return the results and history.
+    """
+    from afem.exchange import serialize
+
+    shapes = serialize.loads(data)
+    sew = SewShape(None, *options)
+    for is_context, shape in shapes:
+        if is_context:
+            sew.load(shape)
+        else:
+            sew.add(shape)
+    sew.perform()
+
+    # History of the inputs by their index in the input map
+    map_ = _input_map(shapes)
+    modified, modified_sub = {}, {}
+    for i in range(1, map_.Extent() + 1):
+        key = Shape.wrap(map_.FindKey(i))
+        modified[i] = (sew.is_modified(key), sew.modified(key))
+        modified_sub[i] = (sew.is_modified_subshape(key),
+                           sew.modified_subshape(key))
+
+    results = {'sewed_shape': sew.sewed_shape,
+               'free_edges': sew.free_edges,
+               'multiple_edges': sew.multiple_edges,
+               'manifold_edges': sew.manifold_edges,
+               'modified': modified,
+               'modified_sub': modified_sub}
+    return serialize.dumps(results)
+
+
 class DivideClosedShape(object):
     """
     Divide all closed faces in a shape.
@@ -172,6 +230,12 @@ class SewShape(object):
 
         If *shape* is *None* then the user is expected to manually load the
         shape and perform the operation.
+
+    .. note::
+
+        If the operation is performed in a separate process, the results and
+        history are restored in this process as copies that do not share
+        sub-shapes with the inputs.
     """
 
     def __init__(self, shape=None, tol=None, min_tol=None, max_tol=None,
@@ -182,6 +246,11 @@ class SewShape(object):
             else:
                 tol = shape.tol_max
 
+        self._options = (tol, min_tol, max_tol, cut_free_edges, non_manifold)
+        self._shapes = []
+        self._results = None
+        self._input_map = None
+
         self._tool = BRepBuilderAPI_Sewing(tol, True, True, cut_free_edges,
                                            non_manifold)
 
@@ -191,8 +260,8 @@ class SewShape(object):
             self._tool.SetMaxTolerance(max_tol)
 
         if shape is not None:
-            self._tool.Load(shape.object)
-            self._tool.Perform()
+            self.load(shape)
+            self.perform()
 
     def load(self, shape):
         """
@@ -203,6 +272,7 @@ class SewShape(object):
         :return: None.
         """
         self._tool.Load(shape.object)
+        self._shapes.append((True, shape))
 
     def add(self, shape):
         """
@@ -213,14 +283,64 @@ class SewShape(object):
         :return: None.
         """
         self._tool.Add(shape.object)
+        self._shapes.append((False, shape))
 
-    def perform(self):
+    def perform(self, monitor=None, timeout=None):
         """
         Perform the sewing operation.
 
+        :param monitor: Optional progress monitor that is checked for
+            cancellation before the operation and updated after it.
+        :type monitor: afem.misc.progress.ProgressMonitor or None
+        :param timeout: Optional time limit in seconds. If provided, or if
+            the monitor has a time budget, the operation is run in a separate
+            process that is terminated if the limit is exceeded. The results
+            and history are restored in this process.
+        :type timeout: float or None
+
         :return: None.
+
+        :raise afem.misc.progress.OperationCancelled: If the monitor is
+            cancelled.
+        :raise afem.misc.progress.OperationTimeout: If the time limit is
+            exceeded.
         """
-        self._tool.Perform()
+        self._results = None
+        self._input_map = None
+        if monitor is not None:
+            monitor.update(message='Sewing')
+            if timeout is None:
+                timeout = monitor.remaining
+
+        if timeout is None:
+            self._tool.Perform()
+        else:
+            self._perform_isolated(timeout, monitor)
+
+        if monitor is not None:
+            monitor.update(1., 'Finished sewing')
+
+    def _perform_isolated(self, timeout, monitor):
+        """
+        Perform the sewing operation in a separate process.
+        """
+        from afem.exchange import serialize
+
+        # Serialize the inputs together so shared sub-shapes remain shared
+        data = serialize.dumps(self._shapes)
+        data = run_isolated(_isolated_sew, (data, self._options),
+                            timeout=timeout, monitor=monitor)
+        self._results = serialize.loads(data)
+        self._input_map = _input_map(self._shapes)
+
+    def _history(self, key, shape):
+        """
+        Get the restored history of an input shape or sub-shape.
+        """
+        i = self._input_map.FindIndex(shape.object)
+        if i == 0:
+            return False, shape
+        return self._results[key][i]
 
     @property
     def sewed_shape(self):
@@ -229,6 +349,8 @@ class SewShape(object):
             constructed.
         :rtype: afem.topology.entities.Shape
         """
+        if self._results is not None:
+            return self._results['sewed_shape']
         return Shape.wrap(self._tool.SewedShape())
 
     @property
@@ -237,6 +359,8 @@ class SewShape(object):
         :return: Number of free edges.
         :rtype: int
         """
+        if self._results is not None:
+            return len(self._results['free_edges'])
         return self._tool.NbFreeEdges()
 
     @property
@@ -245,6 +369,8 @@ class SewShape(object):
         :return: Free edges.
         :rtype: list(afem.topology.entities.Edge)
         """
+        if self._results is not None:
+            return list(self._results['free_edges'])
         edges = []
         for i in range(1, self.n_free_edges + 1):
             e = Edge(self._tool.FreeEdge(i))
@@ -257,6 +383,8 @@ class SewShape(object):
         :return: Number of edges connected to more than two faces.
         :rtype: int
         """
+        if self._results is not None:
+            return len(self._results['multiple_edges'])
         return self._tool.NbMultipleEdges()
 
     @property
@@ -265,8 +393,10 @@ class SewShape(object):
         :return: Multiple edges.
         :rtype: list(afem.topology.entities.Edge)
         """
+        if self._results is not None:
+            return list(self._results['multiple_edges'])
         edges = []
-        for i in range(1, self.n_free_edges + 1):
+        for i in range(1, self.n_multiple_edges + 1):
             e = Edge(self._tool.MultipleEdge(i))
             edges.append(e)
         return edges
@@ -277,6 +407,8 @@ class SewShape(object):
         :return: Number of manifold edges.
         :rtype: int
         """
+        if self._results is not None:
+            return len(self._results['manifold_edges'])
         return self._tool.NbContigousEdges()
 
     @property
@@ -285,8 +417,10 @@ class SewShape(object):
         :return: Manifold edges.
         :rtype: list(afem.topology.entities.Edge)
         """
+        if self._results is not None:
+            return list(self._results['manifold_edges'])
         edges = []
-        for i in range(1, self.n_free_edges + 1):
+        for i in range(1, self.n_manifold_edges + 1):
             e = Edge(self._tool.ContigousEdge(i))
             edges.append(e)
         return edges
@@ -300,7 +434,9 @@ class SewShape(object):
         :return: *True* if modified, *False* if not.
         :rtype: bool
         """
-        self._tool.IsModified(shape.object)
+        if self._results is not None:
+            return self._history('modified', shape)[0]
+        return self._tool.IsModified(shape.object)
 
     def modified(self, shape):
         """
@@ -311,6 +447,8 @@ class SewShape(object):
         :return: The modified shape.
         :rtype: afem.topology.entities.Shape
         """
+        if self._results is not None:
+            return self._history('modified', shape)[1]
         return Shape.wrap(self._tool.Modified(shape.object))
 
     def is_modified_subshape(self, subshape):
@@ -322,7 +460,9 @@ class SewShape(object):
         :return: *True* if modified, *False* if not.
         :rtype: bool
         """
-        self._tool.IsModifiedSubShape(subshape.object)
+        if self._results is not None:
+            return self._history('modified_sub', subshape)[0]
+        return self._tool.IsModifiedSubShape(subshape.object)
 
     def modified_subshape(self, subshape):
         """
@@ -333,6 +473,8 @@ class SewShape(object):
         :return: The modified sub-shape.
         :rtype: afem.topology.entities.Shape
         """
+        if self._results is not None:
+            return self._history('modified_sub', subshape)[1]
         return Shape.wrap(self._tool.ModifiedSubShape(subshape.object))
 
 
@@ -447,6 +589,11 @@ class RebuildShapesByTool(object):
     make substitutions on the faces of the shape. If not faces exist it will
     try the edges. If no edges exist it will try the vertices.
 
+    The history of each sub-shape is only queried once, even if it is shared
+    by several old shapes, and old shapes without any substitutions are not
+    rebuilt. If the tool reports that nothing was modified or deleted, the
+    old shapes are returned as is.
+
     :param collections.Sequence(afem.topology.entities.Shape) old_shapes: The
         old shapes.
     :param tool: The tool.
@@ -455,42 +602,90 @@ class RebuildShapesByTool(object):
 
     def __init__(self, old_shapes, tool):
         reshape = ShapeBuild_ReShape()
-
-        self._new_shapes = TopTools_MapOfShape()
-        index_map = TopTools_IndexedMapOfShape()
+        self._new_shapes = TopTools_DataMapOfShapeShape()
+
+        # Only query the history the tool has
+        has_modified = getattr(tool, 'has_modified', True)
+        has_deleted = getattr(tool, 'has_deleted', True)
+        if not has_modified and not has_deleted:
+            for old_shape in old_shapes:
+                self._new_shapes.Bind(old_shape.object, old_shape.object)
+            return
+
+        types = [Shape.FACE, Shape.EDGE, Shape.VERTEX]
+        visited = TopTools_MapOfShape()
+        used = TopTools_MapOfShape()
+        recorded = TopTools_MapOfShape()
+        recorded_levels = set()
+        builder = BRep_Builder()
 
         for old_shape in old_shapes:
             # Old shapes
-            shapes = old_shape.faces
-            if not shapes:
-                shapes = old_shape.edges
-            if not shapes:
-                shapes = old_shape.vertices
-            if not shapes:
+            for level, type_ in enumerate(types):
+                sub_shapes = _sub_shapes(old_shape.object, type_)
+                if sub_shapes:
+                    break
+            else:
+                self._new_shapes.Bind(old_shape.object, old_shape.object)
                 continue
 
-            # Delete and replace
-            for shape in shapes:
+            # Delete and replace each sub-shape once. A sub-shape shared
+            # with an earlier old shape already has its substitution.
+            is_changed = False
+            for sub_shape in sub_shapes:
+                if not visited.Add(sub_shape):
+                    if recorded.Contains(sub_shape):
+                        is_changed = True
+                    continue
+
+                shape = Shape.wrap(sub_shape)
+
                 # Deleted
-                if tool.is_deleted(shape):
-                    reshape.Remove(shape.object)
+                if has_deleted and tool.is_deleted(shape):
+                    reshape.Remove(sub_shape)
+                    recorded.Add(sub_shape)
+                    recorded_levels.add(level)
+                    is_changed = True
+                    continue
+
+                if not has_modified:
                     continue
 
                 # Modified considering shapes already used
-                mod_shapes = tool.modified(shape)
-                replace_shapes = []
-                for mod_shape in mod_shapes:
-                    if index_map.Contains(mod_shape.object):
+                compound = None
+                for mod_shape in tool.modified(shape):
+                    if not used.Add(mod_shape.object):
                         continue
-                    replace_shapes.append(mod_shape)
-                    index_map.Add(mod_shape.object)
-
-                if replace_shapes:
-                    new_shape = Compound.by_shapes(replace_shapes)
-                    reshape.Replace(shape.object, new_shape.object)
-
-            new_shape = Shape.wrap(reshape.Apply(old_shape.object))
-            self._new_shapes.Bind(old_shape.object, new_shape.object)
+                    if compound is None:
+                        compound = TopoDS_Compound()
+                        builder.MakeCompound(compound)
+                    builder.Add(compound, mod_shape.object)
+
+                if compound is not None:
+                    reshape.Replace(sub_shape, compound)
+                    recorded.Add(sub_shape)
+                    recorded_levels.add(level)
+                    is_changed = True
+
+            # Substitutions of lower level sub-shapes made for other shapes
+            # also apply to this one
+            if not is_changed:
+                for lower in range(level + 1, len(types)):
+                    if lower not in recorded_levels:
+                        continue
+                    for sub_shape in _sub_shapes(old_shape.object,
+                                                 types[lower]):
+                        if recorded.Contains(sub_shape):
+                            is_changed = True
+                            break
+                    if is_changed:
+                        break
+
+            if is_changed:
+                new_shape = reshape.Apply(old_shape.object)
+            else:
+                new_shape = old_shape.object
+            self._new_shapes.Bind(old_shape.object, new_shape)
 
     def new_shape(self, old_shape):
         """
@@ -25,8 +25,12 @@ from OCC.Core.BRepOffsetAPI import (BRepOffsetAPI_MakeOffsetShape,
                                 BRepOffsetAPI_MakePipeShell,
                                 BRepOffsetAPI_NormalProjection,
                                 BRepOffsetAPI_ThruSections)
+from OCC.Core.TopAbs import TopAbs_EDGE
+from OCC.Core.TopExp import topexp
+from OCC.Core.TopTools import TopTools_IndexedMapOfShape
 
 from afem.geometry.entities import Geometry, Curve
+from afem.misc.progress import run_isolated
 from afem.topology.entities import Shape, Wire
 
 __all__ = ["ProjectShape", "OffsetShape", "LoftShape", "SweepShape",
@@ -178,6 +182,42 @@ class OffsetShape(object):
         return self._shape
 
 
+def _section_edges(sections):
+    """
+    Map the edges of the loft sections so they can be found by index in
+    another process.
+    """
+    map_ = TopTools_IndexedMapOfShape()
+    for section in sections:
+        topexp.MapShapes(section.object, TopAbs_EDGE, map_)
+    return map_
+
+
+def _isolated_loft(data, options):
+    """
+    Build a loft in a separate process and return its results and the faces
+    generated by the section edges, or *None* if it failed.
+    """
+    from afem.exchange import serialize
+
+    sections = serialize.loads(data)
+    loft = LoftShape(sections, **options)
+    if not loft.is_done:
+        return None
+
+    map_ = _section_edges(sections)
+    generated = {}
+    for i in range(1, map_.Extent() + 1):
+        edge = Shape.wrap(map_.FindKey(i))
+        generated[i] = loft.generated_face(edge)
+
+    results = {'shape': loft.shape,
+               'first_shape': loft.first_shape,
+               'last_shape': loft.last_shape,
+               'generated': generated}
+    return serialize.dumps(results)
+
+
 class LoftShape(object):
     """
     Loft a shape using a sequence of sections.
@@ -202,15 +242,30 @@ class LoftShape(object):
     :param OCC.Core.GeomAbs.GeomAbs_Shape continuity: The desired continuity.
     :param int max_degree: The maximum degree for the approximation
         algorithm.
+    :param monitor: Optional progress monitor that is checked for
+        cancellation before the loft is built and updated after it.
+    :type monitor: afem.misc.progress.ProgressMonitor or None
+    :param timeout: Optional time limit in seconds. If provided, or if the
+        monitor has a time budget, the loft is built in a separate process
+        that is terminated if the limit is exceeded. The results are restored
+        in this process as copies that do not share sub-shapes with the
+        sections.
+    :type timeout: float or None
 
     :raise TypeError: If any of the sections cannot be added to the tool
         because they are of the wrong type.
+    :raise afem.misc.progress.OperationCancelled: If the monitor is
+        cancelled.
+    :raise afem.misc.progress.OperationTimeout: If the time limit is
+        exceeded.
     """
 
     def __init__(self, sections, is_solid=False, make_ruled=False,
                  pres3d=1.0e-6, check_compatibility=None,
                  use_smoothing=None, par_type=None, continuity=None,
-                 max_degree=None):
+                 max_degree=None, monitor=None, timeout=None):
+        self._results = None
+        self._section_map = None
         self._tool = BRepOffsetAPI_ThruSections(is_solid, make_ruled, pres3d)
 
         if check_compatibility is not None:
@@ -239,7 +294,38 @@ class LoftShape(object):
             else:
                 raise TypeError('Invalid shape type in loft.')
 
-        self._tool.Build()
+        if monitor is not None:
+            monitor.update(message='Lofting')
+            if timeout is None:
+                timeout = monitor.remaining
+
+        if timeout is None:
+            self._tool.Build()
+        else:
+            options = {'is_solid': is_solid, 'make_ruled': make_ruled,
+                       'pres3d': pres3d,
+                       'check_compatibility': check_compatibility,
+                       'use_smoothing': use_smoothing, 'par_type': par_type,
+                       'continuity': continuity, 'max_degree': max_degree}
+            self._build_isolated(sections, options, timeout, monitor)
+
+        if monitor is not None:
+            monitor.update(1., 'Finished lofting')
+
+    def _build_isolated(self, sections, options, timeout, monitor):
+        """
+        Build the loft in a separate process.
+        """
+        from afem.exchange import serialize
+
+        sections = list(sections)
+        data = serialize.dumps(sections)
+        data = run_isolated(_isolated_loft, (data, options),
+                            timeout=timeout, monitor=monitor)
+        self._results = {}
+        if data is not None:
+            self._results = serialize.loads(data)
+        self._section_map = _section_edges(sections)
 
     @property
     def is_done(self):
@@ -247,6 +333,8 @@ class LoftShape(object):
         :return: *True* if done, *False* if not.
         :rtype: bool
         """
+        if self._results is not None:
+            return bool(self._results)
         return self._tool.IsDone()
 
     @property
@@ -255,6 +343,8 @@ class LoftShape(object):
         :return: The lofted shape.
         :rtype: afem.topology.entities.Shape
         """
+        if self._results is not None:
+            return self._results['shape']
         return Shape.wrap(self._tool.Shape())
 
     @property
@@ -264,6 +354,8 @@ class LoftShape(object):
             constructed.
         :rtype: afem.topology.entities.Shape
         """
+        if self._results is not None:
+            return self._results['first_shape']
         return Shape.wrap(self._tool.FirstShape())
 
     @property
@@ -272,6 +364,8 @@ class LoftShape(object):
         :return: The last/top shape of the loft if a solid was constructed.
         :rtype: afem.topology.entities.Shape
         """
+        if self._results is not None:
+            return self._results['last_shape']
         return Shape.wrap(self._tool.LastShape())
 
     @property
@@ -293,6 +387,9 @@ class LoftShape(object):
         :return: The face(s) generated by the edge.
         :rtype: afem.topology.entities.Shape
         """
+        if self._results is not None:
+            i = self._section_map.FindIndex(edge.object)
+            return self._results['generated'][i]
         return Shape.wrap(self._tool.GeneratedFace(edge.object))
 
 
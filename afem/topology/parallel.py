@@ -0,0 +1,410 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018  Laughlin Research, LLC (info@laughlinresearch.com)
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+from time import perf_counter
+
+from afem.config import Settings, logger
+from afem.occ import utils as occ_utils
+from afem.topology.bop import (CommonShapes, CutShapes, FuseShapes,
+                               IntersectShapes, SplitShapes, _isolated_bop)
+from afem.topology.entities import Shape
+
+__all__ = ["BopExecutor", "BopResult", "build_bops"]
+
+# Operations available by name
+_BOPS = {'fuse': FuseShapes,
+         'cut': CutShapes,
+         'common': CommonShapes,
+         'intersect': IntersectShapes,
+         'split': SplitShapes}
+
+# Shared inputs loaded once per worker process
+_shared_shapes = {}
+
+
+def _init_worker(shared_data):
+    """
+    Load the shared inputs in a worker process.
+    """
+    _shared_shapes.clear()
+    for key, data in shared_data.items():
+        _shared_shapes[key] = Shape.wrap(occ_utils.topods_from_bytes(*data))
+
+
+def _load_input(item, shared):
+    """
+    Load a request input that is either a key to a shared input or
+    serialized shape data.
+    """
+    is_shared, value = item
+    if is_shared:
+        return shared[value]
+    return Shape.wrap(occ_utils.topods_from_bytes(*value))
+
+
+def _run_request(op, arg, tool, kwargs, shared, serialize):
+    """
+    Run a single Boolean operation and return its status, result, error
+    message, and elapsed time.
+    """
+    start = perf_counter()
+    try:
+        if serialize:
+            arg = _load_input(arg, shared)
+            tool = _load_input(tool, shared)
+        bop = _BOPS[op](arg, tool, **kwargs)
+        is_done = bop.is_done
+        if not is_done:
+            shape, error = None, 'Boolean operation is not done.'
+        elif serialize:
+            shape, error = occ_utils.topods_to_bytes(bop.shape.object), None
+        else:
+            shape, error = bop.shape, None
+    except Exception as e:
+        is_done, shape = False, None
+        error = '{}: {}'.format(e.__class__.__name__, e)
+    return is_done, shape, error, perf_counter() - start
+
+
+def _run_requests(requests):
+    """
+    Run a chunk of requests in a worker process.
+    """
+    return [_run_request(op, arg, tool, kwargs, _shared_shapes, True)
+            for op, arg, tool, kwargs in requests]
+
+
+class BopResult(object):
+    """
+    Result of a single Boolean operation run by :class:`.BopExecutor`.
+
+    :param int index: The request index.
+    :param str op: The operation name.
+    :param bool is_done: Status of the operation.
+    :param shape: The resulting shape.
+    :type shape: afem.topology.entities.Shape or None
+    :param error: The error message if the operation failed.
+    :type error: str or None
+    :param float time: The time in seconds spent on the operation.
+    """
+
+    def __init__(self, index, op, is_done, shape, error, time):
+        self._index = index
+        self._op = op
+        self._is_done = is_done
+        self._shape = shape
+        self._error = error
+        self._time = time
+
+    @property
+    def index(self):
+        """
+        :return: The request index.
+        :rtype: int
+        """
+        return self._index
+
+    @property
+    def op(self):
+        """
+        :return: The operation name.
+        :rtype: str
+        """
+        return self._op
+
+    @property
+    def is_done(self):
+        """
+        :return: *True* if the operation is done, *False* if not.
+        :rtype: bool
+        """
+        return self._is_done
+
+    @property
+    def shape(self):
+        """
+        :return: The resulting shape. This is *None* if the operation failed.
+        :rtype: afem.topology.entities.Shape or None
+        """
+        return self._shape
+
+    @property
+    def error(self):
+        """
+        :return: The error message if the operation failed.
+        :rtype: str or None
+        """
+        return self._error
+
+    @property
+    def time(self):
+        """
+        :return: The time in seconds spent on the operation, including
+            loading its inputs and storing its result in a worker process.
+        :rtype: float
+        """
+        return self._time
+
+
+class BopExecutor(object):
+    """
+    Run a batch of independent Boolean operations in a pool of worker
+    processes. Inputs and results are sent between processes as the ASCII
+    text of an in-memory BRep shape set. Shared inputs (e.g., a body used by
+    every operation) are sent and loaded once per worker rather than once
+    per operation.
+
+    :param dict shared: Optional shared inputs by key. Requests may refer to
+        a shared input by its key in place of a shape.
+    :param max_workers: The maximum number of worker processes. If *None*
+        then the value in :class:`.Settings` is used.
+    :type max_workers: int or None
+    :param int chunk_size: The number of requests sent to a worker process
+        at once.
+
+    Operation names are *fuse*, *cut*, *common*, *intersect*, and *split*.
+
+    For example:
+
+    .. code-block:: python
+
+        executor = BopExecutor({'body': wing.shape})
+        for basis_shape in basis_shapes:
+            executor.add('common', basis_shape, 'body')
+        for result in executor.run():
+            print(result.is_done, result.time)
+    """
+
+    def __init__(self, shared=None, max_workers=None, chunk_size=1):
+        self._shared = {}
+        self._requests = []
+        if max_workers is None:
+            max_workers = Settings.max_workers
+        if max_workers is None:
+            max_workers = cpu_count()
+        self._max_workers = max(1, max_workers)
+        self._chunk_size = max(1, chunk_size)
+        self._results = []
+        self._wall_time = 0.
+
+        if shared is not None:
+            for key in shared:
+                self.add_shared(key, shared[key])
+
+    @property
+    def size(self):
+        """
+        :return: The number of requests.
+        :rtype: int
+        """
+        return len(self._requests)
+
+    @property
+    def results(self):
+        """
+        :return: The results of the last run in the same order as the
+            requests.
+        :rtype: list(afem.topology.parallel.BopResult)
+        """
+        return self._results
+
+    @property
+    def wall_time(self):
+        """
+        :return: The wall-clock time in seconds of the last run.
+        :rtype: float
+        """
+        return self._wall_time
+
+    def add_shared(self, key, shape):
+        """
+        Add a shared read-only input.
+
+        :param str key: The key.
+        :param afem.topology.entities.Shape shape: The shape.
+
+        :return: None.
+        """
+        self._shared[key] = Shape.to_shape(shape)
+
+    def add(self, op, shape1, shape2, **kwargs):
+        """
+        Add a Boolean operation request.
+
+        :param str op: The operation name.
+        :param shape1: The first shape or the key of a shared input.
+        :type shape1: afem.topology.entities.Shape or str
+        :param shape2: The second shape or the key of a shared input.
+        :type shape2: afem.topology.entities.Shape or str
+        :param kwargs: Other keyword arguments passed to the operation
+            (e.g., *fuzzy_val*).
+
+        :return: The request index.
+        :rtype: int
+
+        :raise KeyError: If the operation or a shared input key is unknown.
+        """
+        if op not in _BOPS:
+            raise KeyError('Unknown Boolean operation: {}'.format(op))
+        for shape in (shape1, shape2):
+            if isinstance(shape, str) and shape not in self._shared:
+                raise KeyError('Unknown shared input: {}'.format(shape))
+        self._requests.append((op, shape1, shape2, kwargs))
+        return len(self._requests) - 1
+
+    def clear(self):
+        """
+        Clear the requests and results. Shared inputs are kept.
+
+        :return: None.
+        """
+        self._requests = []
+        self._results = []
+        self._wall_time = 0.
+
+    def _input(self, shape):
+        """
+        Get a request input in the main process.
+        """
+        if isinstance(shape, str):
+            return self._shared[shape]
+        return shape
+
+    @staticmethod
+    def _serialize(shape):
+        """
+        Serialize a request input for a worker process.
+        """
+        if isinstance(shape, str):
+            return True, shape
+        return False, occ_utils.topods_to_bytes(shape.object)
+
+    def run(self, parallel=True):
+        """
+        Run the requests.
+
+        :param bool parallel: Option to run the requests in worker processes.
+            If *False* then they are run one after another in this process.
+
+        :return: The results in the same order as the requests.
+        :rtype: list(afem.topology.parallel.BopResult)
+        """
+        start = perf_counter()
+
+        if not parallel or self._max_workers == 1 or self.size <= 1:
+            rows = [_run_request(op, self._input(shape1),
+                                 self._input(shape2), kwargs, self._shared,
+                                 False)
+                    for op, shape1, shape2, kwargs in self._requests]
+        else:
+            rows = self._run_parallel()
+
+        self._results = [BopResult(i, request[0], *row)
+                         for i, (request, row) in enumerate(zip(self._requests,
+                                                                rows))]
+        self._wall_time = perf_counter() - start
+
+        nfailed = len([r for r in self._results if not r.is_done])
+        if nfailed > 0:
+            msg = '{} of {} Boolean operations failed.'.format(nfailed,
+                                                               self.size)
+            logger.warning(msg)
+
+        return self._results
+
+    def _run_parallel(self):
+        """
+        Run the requests in worker processes.
+        """
+        # Only send the shared inputs that are used
+        used = set()
+        for _, shape1, shape2, _ in self._requests:
+            for shape in (shape1, shape2):
+                if isinstance(shape, str):
+                    used.add(shape)
+        shared_data = {}
+        for key in used:
+            shared_data[key] = occ_utils.topods_to_bytes(
+                self._shared[key].object)
+
+        requests = [(op, self._serialize(shape1), self._serialize(shape2),
+                     kwargs) for op, shape1, shape2, kwargs in self._requests]
+        n = self._chunk_size
+        chunks = [requests[i:i + n] for i in range(0, len(requests), n)]
+
+        max_workers = min(self._max_workers, len(chunks))
+        rows = []
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                 initargs=(shared_data,)) as executor:
+            for chunk_rows in executor.map(_run_requests, chunks):
+                rows += chunk_rows
+
+        # Restore the resulting shapes
+        for i, (is_done, data, error, time) in enumerate(rows):
+            shape = None
+            if data is not None:
+                shape = Shape.wrap(occ_utils.topods_from_bytes(*data))
+            rows[i] = (is_done, shape, error, time)
+        return rows
+
+
+def build_bops(bops, max_workers=None):
+    """
+    Build independent Boolean operations in worker processes. Unlike
+    :class:`.BopExecutor`, the history of each operation is restored in this
+    process so it can be used to rebuild shapes (e.g., using
+    :class:`.RebuildShapesByTool`). Operations that fail in a worker process
+    are built again in this process.
+
+    :param bops: The Boolean operations. Their arguments and tools must be
+        set but they should not be built yet.
+    :type bops: collections.Sequence(afem.topology.bop.BopAlgo)
+    :param max_workers: The maximum number of worker processes. If *None*
+        then the value in :class:`.Settings` is used.
+    :type max_workers: int or None
+
+    :return: None.
+    """
+    bops = list(bops)
+    if max_workers is None:
+        max_workers = Settings.max_workers
+    if max_workers is None:
+        max_workers = cpu_count()
+    max_workers = min(max(1, max_workers), len(bops))
+
+    if max_workers <= 1:
+        for bop in bops:
+            bop.build()
+        return None
+
+    inputs = [bop.arguments + bop.tools for bop in bops]
+    with ProcessPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(_isolated_bop,
+                                   *bop._isolated_args(shapes))
+                   for bop, shapes in zip(bops, inputs)]
+        for bop, shapes, future in zip(bops, inputs, futures):
+            try:
+                data = future.result()
+            except Exception as e:
+                msg = 'Boolean operation failed in worker process: {}'
+                logger.warning(msg.format(e))
+                data = None
+            if not bop._restore(data, shapes):
+                bop.build()
@@ -16,15 +16,177 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
 from OCC.Core.BRepGProp import brepgprop
 from OCC.Core.GProp import GProp_GProps
-from numpy import array
+from numpy import array, zeros
 
+from afem.config import Settings
 from afem.geometry.entities import Point
 from afem.topology.entities import Shape
 
-__all__ = ["ShapeProps", "LinearProps", "SurfaceProps", "VolumeProps",
-           "LengthOfShapes", "AreaOfShapes"]
+__all__ = ["PropsCache", "ShapeProps", "LinearProps", "SurfaceProps",
+           "VolumeProps", "LengthOfShapes", "AreaOfShapes",
+           "MassPropertiesTable"]
+
+
+class _ShapeKey(object):
+    """
+    Hashable key for a shape based on its TShape, location, and orientation.
+    """
+    __slots__ = ('_shape', '_hash')
+
+    def __init__(self, shape):
+        self._shape = shape.object.Oriented(shape.object.Orientation())
+        self._hash = shape.object.HashCode(2147483647)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return self._shape.IsEqual(other._shape)
+
+    def is_same(self, shape):
+        return self._shape.IsSame(shape.object)
+
+
+def _copy_props(props):
+    """
+    Copy global properties so a cached entry cannot be changed by a user of
+    the properties (e.g., by adding other properties to them).
+    """
+    props_copy = GProp_GProps()
+    props_copy.Add(props)
+    return props_copy
+
+
+class PropsCache(object):
+    """
+    Least recently used cache of computed shape properties. Entries are keyed
+    on the shape (its TShape, location, and orientation) and the options used
+    to compute them. Shapes are not expected to be modified after they are
+    created. The key does not change if the geometry of a shape is changed
+    in place (e.g., by updating the curve of an edge), so its entries become
+    stale and should be removed using :meth:`.PropsCache.invalidate`.
+
+    Entries are copies of the properties and a copy is returned on each hit,
+    so changing the properties of one shape does not change the cache.
+
+    Each entry holds a reference to its shape until it is removed, so the
+    cache is cleared by :meth:`.GroupAPI.reset` to release the shapes of a
+    model that is no longer used.
+
+    :cvar int size: The maximum number of entries.
+    :cvar bool enabled: Option to use the cache.
+    :cvar int hits: Number of cache hits.
+    :cvar int misses: Number of cache misses.
+    """
+    size = Settings.props_cache_size
+    enabled = True
+    hits = 0
+    misses = 0
+    _data = OrderedDict()
+    _lock = Lock()
+
+    @classmethod
+    def get(cls, shape, key):
+        """
+        Get cached properties.
+
+        :param afem.topology.entities.Shape shape: The shape.
+        :param tuple key: The kind of properties and the options used to
+            compute them.
+
+        :return: The properties or *None* if not found.
+        :rtype: OCC.Core.GProp.GProp_GProps or None
+        """
+        if not cls.enabled or shape.is_null:
+            return None
+        data_key = (_ShapeKey(shape), key)
+        with cls._lock:
+            props = cls._data.get(data_key)
+            if props is None:
+                cls.misses += 1
+                return None
+            cls._data.move_to_end(data_key)
+            cls.hits += 1
+            return _copy_props(props)
+
+    @classmethod
+    def put(cls, shape, key, props):
+        """
+        Store properties in the cache.
+
+        :param afem.topology.entities.Shape shape: The shape.
+        :param tuple key: The kind of properties and the options used to
+            compute them.
+        :param OCC.Core.GProp.GProp_GProps props: The properties.
+
+        :return: None.
+        """
+        if not cls.enabled or shape.is_null:
+            return None
+        with cls._lock:
+            cls._data[(_ShapeKey(shape), key)] = _copy_props(props)
+            while len(cls._data) > cls.size:
+                cls._data.popitem(last=False)
+
+    @classmethod
+    def invalidate(cls, shape):
+        """
+        Remove all entries for a shape regardless of its orientation.
+
+        :param afem.topology.entities.Shape shape: The shape.
+
+        :return: None.
+        """
+        with cls._lock:
+            for data_key in list(cls._data):
+                if data_key[0].is_same(shape):
+                    del cls._data[data_key]
+
+    @classmethod
+    def clear(cls):
+        """
+        Remove all entries and reset the statistics.
+
+        :return: None.
+        """
+        with cls._lock:
+            cls._data.clear()
+            cls.hits = 0
+            cls.misses = 0
+
+    @classmethod
+    def set_size(cls, size):
+        """
+        Set the maximum number of entries, removing the least recently used
+        ones if needed.
+
+        :param int size: The maximum number of entries.
+
+        :return: None.
+        """
+        with cls._lock:
+            cls.size = size
+            while len(cls._data) > size:
+                cls._data.popitem(last=False)
+
+    @classmethod
+    def set_enabled(cls, enabled=True):
+        """
+        Enable or disable the cache. Disabling it also removes all entries.
+
+        :param bool enabled: Option to use the cache.
+
+        :return: None.
+        """
+        cls.enabled = enabled
+        if not enabled:
+            cls.clear()
 
 
 class ShapeProps(object):
@@ -35,6 +197,17 @@ class ShapeProps(object):
     def __init__(self):
         self._props = GProp_GProps()
 
+    def _perform(self, shape, key, method, *args):
+        """
+        Compute the properties using the method or get them from the cache.
+        """
+        props = PropsCache.get(shape, key)
+        if props is not None:
+            self._props = props
+            return None
+        method(shape.object, self._props, *args)
+        PropsCache.put(shape, key, self._props)
+
     @property
     def mass(self):
         """
@@ -100,7 +273,8 @@ class LinearProps(ShapeProps):
 
     def __init__(self, shape, skip_shared=True):
         super(LinearProps, self).__init__()
-        brepgprop.LinearProperties(shape.object, self._props, skip_shared)
+        self._perform(shape, ('linear', skip_shared),
+                      brepgprop.LinearProperties, skip_shared)
 
     @property
     def length(self):
@@ -116,15 +290,22 @@ class SurfaceProps(ShapeProps):
     Calculate surface properties of a shape.
 
     :param afem.topology.entities.Shape shape: The shape.
-    :param float tol: Maximum relative error of computed area for each face.
+    :param tol: Maximum relative error of computed area for each face. If
+        *None* then a fixed Gauss integration is used.
+    :type tol: float or None
     :param bool skip_shared: If *True*, faces shared by two or more shells are
         taken into calculation only once.
     """
 
     def __init__(self, shape, tol=1.0e-7, skip_shared=False):
         super(SurfaceProps, self).__init__()
-        brepgprop.SurfaceProperties(shape.object, self._props, tol,
-                                     skip_shared)
+        key = ('surface', tol, skip_shared)
+        if tol is None:
+            self._perform(shape, key, brepgprop.SurfaceProperties,
+                          skip_shared)
+        else:
+            self._perform(shape, key, brepgprop.SurfaceProperties, tol,
+                          skip_shared)
 
     @property
     def area(self):
@@ -140,7 +321,9 @@ class VolumeProps(ShapeProps):
     Calculate volume properties of a shape.
 
     :param afem.topology.entities.Shape shape: The shape.
-    :param float tol: Maximum relative error of computed volume for each solid.
+    :param tol: Maximum relative error of computed volume for each solid. If
+        *None* then a fixed Gauss integration is used.
+    :type tol: float or None
     :param bool only_closed: If *True*, then faces must belong to closed
         shells.
     :param bool skip_shared: If *True*, volumes formed by equal faces (i.e.,
@@ -151,8 +334,13 @@ class VolumeProps(ShapeProps):
     def __init__(self, shape, tol=1.0e-7, only_closed=False,
                  skip_shared=False):
         super(VolumeProps, self).__init__()
-        brepgprop.VolumeProperties(shape.object, self._props, tol,
-                                    only_closed, skip_shared)
+        key = ('volume', tol, only_closed, skip_shared)
+        if tol is None:
+            self._perform(shape, key, brepgprop.VolumeProperties, only_closed,
+                          skip_shared)
+        else:
+            self._perform(shape, key, brepgprop.VolumeProperties, tol,
+                          only_closed, skip_shared)
 
     @property
     def volume(self):
@@ -297,3 +485,143 @@ class AreaOfShapes(object):
         :rtype: list(afem.topology.entities.Shape)
         """
         return self._shapes
+
+
+def _mass_props_row(shape, tol, skip_shared):
+    """
+    Compute the length, area, volume, center of gravity, and matrix of
+    inertia of a shape as a flat tuple.
+    """
+    props = LinearProps(shape, skip_shared)
+    length = props.length
+    area, volume = 0., 0.
+    if shape.num_faces > 0:
+        props = SurfaceProps(shape, tol, skip_shared)
+        area = props.area
+    if shape.num_solids > 0:
+        props = VolumeProps(shape, tol, False, skip_shared)
+        volume = props.volume
+    cg = props.cg
+    row = [length, area, volume, cg.x, cg.y, cg.z]
+    row += props.matrix_of_inertia.ravel().tolist()
+    return row
+
+
+def _mass_props_rows(topods_shapes, tol, skip_shared):
+    """
+    Compute rows of the mass properties table in a worker process.
+    """
+    rows = []
+    for topods_shape in topods_shapes:
+        rows.append(_mass_props_row(Shape.wrap(topods_shape), tol,
+                                    skip_shared))
+    return rows
+
+
+class MassPropertiesTable(object):
+    """
+    Calculate the mass properties of many shapes at once. The center of
+    gravity and matrix of inertia of each shape are taken from its volume
+    properties if it has solids, from its surface properties if it has
+    faces, and from its linear properties otherwise.
+
+    :param collections.Sequence(afem.topology.entities.Shape) shapes: The
+        shapes.
+    :param tol: Maximum relative error of computed areas and volumes. If
+        *None* then the value in :class:`.Settings` is used.
+    :type tol: float or None
+    :param skip_shared: Option to only take shared edges and faces into
+        calculation once. If *None* then the value in :class:`.Settings` is
+        used.
+    :type skip_shared: bool or None
+    :param bool parallel: Option to compute the properties in separate
+        processes. Results computed this way are not added to the
+        :class:`.PropsCache`.
+    :param max_workers: The maximum number of worker processes. If *None*
+        then the value in :class:`.Settings` is used.
+    :type max_workers: int or None
+    :param int chunk_size: The number of shapes sent to a worker process at
+        once.
+    """
+
+    def __init__(self, shapes, tol=None, skip_shared=None, parallel=False,
+                 max_workers=None, chunk_size=16):
+        if tol is None:
+            tol = Settings.props_tol
+        if skip_shared is None:
+            skip_shared = Settings.props_skip_shared
+        if max_workers is None:
+            max_workers = Settings.max_workers
+
+        shapes = [Shape.to_shape(shape) for shape in shapes]
+        self._shapes = shapes
+        data = zeros((len(shapes), 15), dtype=float)
+
+        if parallel and len(shapes) > chunk_size:
+            chunks = []
+            for i in range(0, len(shapes), chunk_size):
+                chunk = [shape.object for shape in shapes[i:i + chunk_size]]
+                chunks.append(chunk)
+            with ProcessPoolExecutor(max_workers) as executor:
+                futures = [executor.submit(_mass_props_rows, chunk, tol,
+                                           skip_shared) for chunk in chunks]
+                i = 0
+                for future in futures:
+                    for row in future.result():
+                        data[i] = row
+                        i += 1
+        else:
+            for i, shape in enumerate(shapes):
+                data[i] = _mass_props_row(shape, tol, skip_shared)
+
+        self._data = data
+
+    @property
+    def shapes(self):
+        """
+        :return: The shapes in the same order as the rows of the table.
+        :rtype: list(afem.topology.entities.Shape)
+        """
+        return self._shapes
+
+    @property
+    def length(self):
+        """
+        :return: The length of each shape.
+        :rtype: numpy.ndarray
+        """
+        return self._data[:, 0]
+
+    @property
+    def area(self):
+        """
+        :return: The area of each shape.
+        :rtype: numpy.ndarray
+        """
+        return self._data[:, 1]
+
+    @property
+    def volume(self):
+        """
+        :return: The volume of each shape.
+        :rtype: numpy.ndarray
+        """
+        return self._data[:, 2]
+
+    @property
+    def cg(self):
+        """
+        :return: The center of gravity of each shape as an array with shape
+            (n, 3).
+        :rtype: numpy.ndarray
+        """
+        return self._data[:, 3:6]
+
+    @property
+    def inertia(self):
+        """
+        :return: The matrix of inertia of each shape as an array with shape
+            (n, 3, 3).
+        :rtype: numpy.ndarray
+        """
+        return self._data[:, 6:].reshape(-1, 3, 3)
@@ -0,0 +1,401 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018  Laughlin Research, LLC (info@laughlinresearch.com)
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from heapq import heappop, heappush
+
+from numpy import (abs as np_abs, arange, argpartition, argsort, array, empty,
+                   errstate, float64, inf, isfinite, maximum, minimum, sqrt,
+                   where)
+
+from afem.topology.entities import BBox
+
+__all__ = ["AABBTree", "shape_boxes", "box_clusters", "box_pairs"]
+
+
+def shape_boxes(shapes, tol=None):
+    """
+    Compute the axis-aligned bounding box of each shape.
+
+    :param collections.Sequence(afem.topology.entities.Shape) shapes: The
+        shapes.
+    :param float tol: Optional tolerance to enlarge each box by.
+
+    :return: Array of boxes with shape (n, 6). Each row is (xmin, ymin, zmin,
+        xmax, ymax, zmax). Void boxes are stored inverted so they never
+        intersect anything.
+    :rtype: numpy.ndarray
+    """
+    boxes = empty((len(shapes), 6), dtype=float64)
+    for i, shape in enumerate(shapes):
+        bbox = BBox()
+        bbox.add_shape(shape)
+        if bbox.is_void:
+            boxes[i] = (inf, inf, inf, -inf, -inf, -inf)
+            continue
+        if tol is not None:
+            bbox.enlarge(tol)
+        boxes[i] = bbox.Get()
+    return boxes
+
+
+def _ray_entry(origin, direction, lo, hi, tmax):
+    """
+    Slab test returning the entry parameter of a ray into each box, or inf
+    if the box is missed.
+    """
+    with errstate(divide='ignore', invalid='ignore'):
+        inv = 1. / direction
+        t1 = (lo - origin) * inv
+        t2 = (hi - origin) * inv
+    # Components parallel to a slab either always or never overlap it
+    par = direction == 0.
+    inside = (origin >= lo) & (origin <= hi)
+    tnear = where(par, -inf, minimum(t1, t2)).max(axis=-1)
+    tfar = where(par, inf, maximum(t1, t2)).min(axis=-1)
+    miss = (par & ~inside).any(axis=-1)
+    tnear = maximum(tnear, 0.)
+    hit = ~miss & (tnear <= tfar) & (tnear <= tmax)
+    return where(hit, tnear, inf)
+
+
+class AABBTree(object):
+    """
+    Static axis-aligned bounding box tree for fast spatial queries over a
+    collection of boxes. Queries return the indices of the boxes used to
+    build the tree.
+
+    :param array_like boxes: Array of boxes with shape (n, 6). Each row is
+        (xmin, ymin, zmin, xmax, ymax, zmax).
+    :param int leaf_size: Maximum number of boxes in a leaf node.
+    """
+
+    def __init__(self, boxes, leaf_size=4):
+        boxes = array(boxes, dtype=float64).reshape(-1, 6)
+        self._boxes = boxes
+        n = boxes.shape[0]
+
+        order = arange(n)
+        centers = 0.5 * (boxes[:, :3] + boxes[:, 3:])
+
+        lo, hi, first, last, left, right = [], [], [], [], [], []
+
+        def _new_node(i1, i2):
+            indx = order[i1:i2]
+            lo.append(boxes[indx, :3].min(axis=0))
+            hi.append(boxes[indx, 3:].max(axis=0))
+            first.append(i1)
+            last.append(i2)
+            left.append(-1)
+            right.append(-1)
+            return len(lo) - 1
+
+        if n > 0:
+            stack = [_new_node(0, n)]
+        else:
+            stack = []
+
+        # Split on the median center along the axis of largest spread
+        while stack:
+            node = stack.pop()
+            i1, i2 = first[node], last[node]
+            if i2 - i1 <= leaf_size:
+                continue
+            indx = order[i1:i2]
+            c = centers[indx]
+            c = where(isfinite(c), c, 0.)
+            axis = (c.max(axis=0) - c.min(axis=0)).argmax()
+            mid = (i2 - i1) // 2
+            order[i1:i2] = indx[argpartition(c[:, axis], mid)]
+            left[node] = _new_node(i1, i1 + mid)
+            right[node] = _new_node(i1 + mid, i2)
+            stack += [left[node], right[node]]
+
+        self._order = order
+        self._lo = array(lo, dtype=float64).reshape(-1, 3)
+        self._hi = array(hi, dtype=float64).reshape(-1, 3)
+        self._first = first
+        self._last = last
+        self._left = left
+        self._right = right
+
+    @classmethod
+    def by_shapes(cls, shapes, tol=None, leaf_size=4):
+        """
+        Build a tree from the bounding boxes of shapes.
+
+        :param collections.Sequence(afem.topology.entities.Shape) shapes: The
+            shapes.
+        :param float tol: Optional tolerance to enlarge each box by.
+        :param int leaf_size: Maximum number of boxes in a leaf node.
+
+        :return: The tree.
+        :rtype: afem.topology.spatial.AABBTree
+        """
+        return cls(shape_boxes(shapes, tol), leaf_size)
+
+    @property
+    def size(self):
+        """
+        :return: Number of boxes in the tree.
+        :rtype: int
+        """
+        return self._boxes.shape[0]
+
+    @property
+    def boxes(self):
+        """
+        :return: The boxes used to build the tree.
+        :rtype: numpy.ndarray
+        """
+        return self._boxes
+
+    def _traverse(self, node_test, leaf_test):
+        """
+        Depth-first traversal pruning nodes with *node_test* and filtering
+        leaf boxes with *leaf_test*.
+        """
+        if self.size == 0:
+            return []
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if not node_test(self._lo[node], self._hi[node]):
+                continue
+            if self._left[node] < 0:
+                indx = self._order[self._first[node]:self._last[node]]
+                b = self._boxes[indx]
+                found += indx[leaf_test(b[:, :3], b[:, 3:])].tolist()
+            else:
+                stack += [self._left[node], self._right[node]]
+        found.sort()
+        return found
+
+    def query_box(self, pmin, pmax):
+        """
+        Find boxes that intersect the given box.
+
+        :param array_like pmin: Lower corner of the box.
+        :param array_like pmax: Upper corner of the box.
+
+        :return: Sorted indices of intersecting boxes.
+        :rtype: list(int)
+        """
+        pmin = array(pmin, dtype=float64)
+        pmax = array(pmax, dtype=float64)
+
+        def _test(lo, hi):
+            return (lo <= pmax).all(axis=-1) & (hi >= pmin).all(axis=-1)
+
+        return self._traverse(_test, _test)
+
+    def query_plane(self, origin, normal, tol=0.):
+        """
+        Find boxes that are crossed by a plane.
+
+        :param array_like origin: A point on the plane.
+        :param array_like normal: The plane normal.
+        :param float tol: Tolerance added to the half-extent of each box.
+
+        :return: Sorted indices of boxes crossed by the plane.
+        :rtype: list(int)
+        """
+        origin = array(origin, dtype=float64)
+        normal = array(normal, dtype=float64)
+        normal /= sqrt((normal * normal).sum())
+        anormal = np_abs(normal)
+
+        def _test(lo, hi):
+            c = 0.5 * (lo + hi) - origin
+            r = (0.5 * (hi - lo) * anormal).sum(axis=-1)
+            s = (c * normal).sum(axis=-1)
+            return np_abs(s) <= r + tol
+
+        return self._traverse(_test, _test)
+
+    def query_ray(self, origin, direction, tmax=inf):
+        """
+        Find boxes hit by a ray.
+
+        :param array_like origin: The ray origin.
+        :param array_like direction: The ray direction.
+        :param float tmax: Maximum ray parameter.
+
+        :return: Indices of boxes hit by the ray and their entry parameters,
+            both sorted by entry parameter.
+        :rtype: tuple(list(int), list(float))
+        """
+        origin = array(origin, dtype=float64)
+        direction = array(direction, dtype=float64)
+        direction /= sqrt((direction * direction).sum())
+
+        def _test(lo, hi):
+            return _ray_entry(origin, direction, lo, hi, tmax) < inf
+
+        indx = self._traverse(_test, _test)
+        if not indx:
+            return [], []
+        b = self._boxes[indx]
+        t = _ray_entry(origin, direction, b[:, :3], b[:, 3:], tmax)
+        results = sorted(zip(t.tolist(), indx))
+        return [i for _, i in results], [ti for ti, _ in results]
+
+    def iter_nearest(self, pmin, pmax=None, distance=None):
+        """
+        Iterate over the boxes in order of increasing distance to a point or
+        box using a best-first search. Boxes that are void are skipped.
+
+        :param array_like pmin: The query point or the lower corner of the
+            query box.
+        :param array_like pmax: The upper corner of the query box. If *None*
+            then *pmin* is treated as a point.
+        :param distance: Optional function that takes an index and returns
+            the exact distance to the item it refers to. This must never be
+            less than the distance to its box. If *None* then box distances
+            are used.
+
+        :return: Generator of index and distance pairs.
+        :rtype: collections.Iterator(tuple(int, float))
+        """
+        if self.size == 0:
+            return
+
+        pmin = array(pmin, dtype=float64)
+        if pmax is None:
+            pmax = pmin
+        else:
+            pmax = array(pmax, dtype=float64)
+
+        def _dist(lo, hi):
+            d = maximum(maximum(lo - pmax, pmin - hi), 0.)
+            return sqrt((d * d).sum(axis=-1))
+
+        # Queue entries are (bound, is_item, is_exact, index) so nodes are
+        # expanded before items with the same bound
+        queue = [(float(_dist(self._lo[0], self._hi[0])), 0, 0, 0)]
+        while queue:
+            bound, is_item, is_exact, i = heappop(queue)
+            if bound == inf:
+                return
+            if is_item:
+                if is_exact or distance is None:
+                    yield i, bound
+                else:
+                    heappush(queue, (float(distance(i)), 1, 1, i))
+            elif self._left[i] < 0:
+                leaf = self._order[self._first[i]:self._last[i]]
+                b = self._boxes[leaf]
+                for j, d in zip(leaf.tolist(), _dist(b[:, :3], b[:, 3:])):
+                    heappush(queue, (float(d), 1, 0, j))
+            else:
+                for child in (self._left[i], self._right[i]):
+                    d = float(_dist(self._lo[child], self._hi[child]))
+                    heappush(queue, (d, 0, 0, child))
+
+    def query_nearest(self, pmin, pmax=None, distance=None, n=1):
+        """
+        Find the nearest boxes to a point or box.
+
+        :param array_like pmin: The query point or the lower corner of the
+            query box.
+        :param array_like pmax: The upper corner of the query box. If *None*
+            then *pmin* is treated as a point.
+        :param distance: Optional function that takes an index and returns
+            the exact distance to the item it refers to. This must never be
+            less than the distance to its box. If *None* then box distances
+            are used.
+        :param int n: Number of nearest items to return.
+
+        :return: Indices and distances of the nearest items sorted by
+            distance.
+        :rtype: tuple(list(int), list(float))
+        """
+        indx, dist = [], []
+        if n < 1:
+            return indx, dist
+        for i, d in self.iter_nearest(pmin, pmax, distance):
+            indx.append(i)
+            dist.append(d)
+            if len(indx) == n:
+                break
+        return indx, dist
+
+
+def box_clusters(boxes):
+    """
+    Group boxes into clusters that are the connected components of their
+    overlap graph. Boxes in different clusters do not intersect.
+
+    :param array_like boxes: Array of boxes with shape (n, 6). Each row is
+        (xmin, ymin, zmin, xmax, ymax, zmax).
+
+    :return: The clusters as sorted lists of box indices. The clusters are
+        sorted by their first index.
+    :rtype: list(list(int))
+    """
+    tree = AABBTree(boxes)
+    parent = list(range(tree.size))
+
+    def _root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, box in enumerate(tree.boxes):
+        if not isfinite(box).all():
+            continue
+        ri = _root(i)
+        for j in tree.query_box(box[:3], box[3:]):
+            rj = _root(j)
+            if rj != ri:
+                parent[rj] = ri
+
+    clusters = {}
+    for i in range(tree.size):
+        clusters.setdefault(_root(i), []).append(i)
+    return sorted(clusters.values(), key=lambda c: c[0])
+
+
+def box_pairs(boxes):
+    """
+    Find all pairs of intersecting boxes by sweeping along the x-axis and
+    pruning boxes that cannot overlap.
+
+    :param array_like boxes: Array of boxes with shape (n, 6). Each row is
+        (xmin, ymin, zmin, xmax, ymax, zmax).
+
+    :return: Sorted list of index pairs (i, j) where i < j.
+    :rtype: list(tuple(int, int))
+    """
+    boxes = array(boxes, dtype=float64).reshape(-1, 6)
+    pairs = []
+    active = []
+    for i in argsort(boxes[:, 0], kind='mergesort').tolist():
+        box = boxes[i]
+        if not isfinite(box).all():
+            continue
+        active = [j for j in active if boxes[j, 3] >= box[0]]
+        for j in active:
+            other = boxes[j]
+            if (other[1] <= box[4] and other[4] >= box[1] and
+                    other[2] <= box[5] and other[5] >= box[2]):
+                pairs.append((min(i, j), max(i, j)))
+        active.append(i)
+    pairs.sort()
+    return pairs
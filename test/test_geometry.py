@@ -16,6 +16,7 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import pickle
 import unittest
 
 from afem.geometry import *
@@ -362,6 +363,51 @@ class TestGeometryCreate(unittest.TestCase):
         self.assertAlmostEqual(p.z, 5.)
 
 
+class TestGeometryEntities(unittest.TestCase):
+    """
+    Test cases for afem.geometry.entities.
+    """
+
+    def test_pickle_nurbs_curve(self):
+        pnts = [(0., 0., 0.), (5., 5., 0.), (10., 0., 0.)]
+        c = NurbsCurveByInterp(pnts).curve
+        c.set_color(0., 1., 0.)
+        c2 = pickle.loads(pickle.dumps(c))
+        self.assertIsInstance(c2, NurbsCurve)
+        self.assertEqual(c2.p, c.p)
+        self.assertEqual(c2.n, c.n)
+        self.assertAlmostEqual(c2.eval(0.5).distance(c.eval(0.5)), 0.)
+        self.assertAlmostEqual(c2.color.Green(), 1.)
+
+    def test_pickle_trimmed_curve(self):
+        line = LineByPoints((0., 0., 0.), (10., 0., 0.)).line
+        c = TrimmedCurveByParameters(line, 2., 5.).curve
+        c2 = pickle.loads(pickle.dumps(c))
+        self.assertIsInstance(c2, TrimmedCurve)
+        self.assertAlmostEqual(c2.u1, 2.)
+        self.assertAlmostEqual(c2.u2, 5.)
+
+    def test_pickle_plane(self):
+        pln = PlaneByAxes((1., 2., 3.), 'xz').plane
+        pln2 = pickle.loads(pickle.dumps(pln))
+        self.assertIsInstance(pln2, Plane)
+        self.assertAlmostEqual(pln2.distance((1., 5., 3.)), 3.)
+
+    def test_fingerprint(self):
+        pnts = [(0., 0., 0.), (5., 5., 0.), (10., 0., 0.)]
+        c1 = NurbsCurveByInterp(pnts).curve
+        c2 = NurbsCurveByInterp(pnts).curve
+        self.assertEqual(c1.fingerprint(), c2.fingerprint())
+        c2.translate((0., 0., 1.))
+        self.assertNotEqual(c1.fingerprint(), c2.fingerprint())
+
+        pln1 = PlaneByAxes((1., 2., 3.), 'xz').plane
+        pln2 = PlaneByAxes((1., 2., 3.), 'xz').plane
+        pln3 = PlaneByAxes((1., 2., 3.), 'xy').plane
+        self.assertEqual(pln1.fingerprint(), pln2.fingerprint())
+        self.assertNotEqual(pln1.fingerprint(), pln3.fingerprint())
+
+
 class TestGeometryDistance(unittest.TestCase):
     """
     Test cases for afem.geometry.distance.
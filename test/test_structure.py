@@ -16,9 +16,13 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import shutil
+import tempfile
 import unittest
+from math import pi
+from unittest import mock
 
-from afem.exchange import brep
+from afem.exchange import brep, serialize
 from afem.geometry import *
 from afem.oml import *
 from afem.structure import *
@@ -110,12 +114,141 @@ class TestStructureEntities(unittest.TestCase):
             self.assertIsInstance(e, Edge)
         self.assertIsInstance(self.fspar.edge_compound, Compound)
 
+    def test_part_pickle(self):
+        data = serialize.dumps(self.fspar)
+        spar = serialize.loads(data)
+        self.assertIsInstance(spar, Spar)
+        self.assertEqual(spar.name, 'fspar')
+        self.assertEqual(spar.id, self.fspar.id)
+        self.assertTrue(spar.has_cref)
+        self.assertTrue(spar.has_sref)
+        self.assertAlmostEqual(spar.area, self.fspar.area, places=5)
+        self.assertListEqual(spar.groups, [])
+        self.assertNotIn(spar, GroupAPI.get_parts())
+
     def test_part_faces(self):
         self.assertEqual(self.fspar.shape.num_faces, 1)
         for f in self.fspar.shape.faces:
             self.assertIsInstance(f, Face)
         self.assertIsInstance(self.fspar.face_compound, Compound)
 
+    def test_part_ref_shapes(self):
+        spar = SparByParameters('spar', 0.15, 0.15, 0.15, 0.5,
+                                self.wing).part
+        edge = spar.cref_edge
+        self.assertIsInstance(edge, Edge)
+        self.assertIs(edge, spar.cref_edge)
+        self.assertIs(spar.cref_adaptor, spar.cref_adaptor)
+        self.assertIsInstance(spar.sref_face, Face)
+        self.assertIs(spar.sref_face, spar.sref_face)
+        self.assertIs(spar.sref_adaptor, spar.sref_adaptor)
+
+        u1, u2 = spar.cref.u1, spar.cref.u2
+        spar.set_u2(0.5 * (u1 + u2))
+        self.assertIsNot(edge, spar.cref_edge)
+        self.assertAlmostEqual(spar.cref_edge.length, spar.cref.length,
+                               places=5)
+
+    def test_part_discard(self):
+        spar = SparByParameters('spar', 0.15, 0.15, 0.15, 0.5,
+                                self.wing).part
+        self.assertFalse(spar.discard_by_cref())
+        self.assertFalse(spar.discard_by_cref(10.))
+        self.assertFalse(spar.discard_by_dmax(spar.cref, 1.))
+        p = (1.0e4, 1.0e4, 1.0e4)
+        self.assertFalse(spar.discard_by_dmin(p, 1.))
+        self.assertTrue(spar.discard_by_dmax(p, 1.))
+        self.assertEqual(spar.shape.num_faces, 0)
+
+    @staticmethod
+    def discard_by_cref_solids(part, size=None):
+        """
+        Discard shapes using solids at the ends of the reference curve like
+        Part.discard_by_cref did before it classified centroids directly.
+        """
+        u1, u2 = part.cref.u1, part.cref.u2
+        v1 = part.cref.deriv(u1, 1)
+        v2 = part.cref.deriv(u2, 1)
+        v1.reverse()
+        p1 = part.cref.eval(u1)
+        p2 = part.cref.eval(u2)
+        pln1 = PlaneByNormal(p1, v1).plane
+        pln2 = PlaneByNormal(p2, v2).plane
+        if size is None:
+            hs1 = HalfspaceBySurface(pln1, p1 + 100. * v1.ijk).solid
+            hs2 = HalfspaceBySurface(pln2, p2 + 100. * v2.ijk).solid
+        else:
+            w = size / 2.
+            f1 = FaceByPlane(pln1, -w, w, -w, w).face
+            f2 = FaceByPlane(pln2, -w, w, -w, w).face
+            v1.normalize()
+            v2.normalize()
+            v1.scale(size)
+            v2.scale(size)
+            hs1 = SolidByDrag(f1, v1).solid
+            hs2 = SolidByDrag(f2, v2).solid
+        status1 = part.discard_by_solid(hs1)
+        status2 = part.discard_by_solid(hs2)
+        return status1 or status2
+
+    def test_part_discard_split(self):
+        # Spar split into three faces by two ribs
+        spar = SparByParameters('spar', 0.15, 0.15, 0.15, 0.5,
+                                self.wing).part
+        ribs = []
+        for d in [0.25, 0.75]:
+            p1 = spar.point_from_parameter(d, is_rel=True)
+            p2 = self.rspar.point_from_parameter(d, is_rel=True)
+            ribs.append(RibByPoints('rib', p1, p2, self.wing).part)
+        FuseSurfaceParts([spar], ribs)
+        self.assertEqual(spar.shape.num_faces, 3)
+
+        # The outboard face is beyond the end of the shortened reference
+        # curve
+        p = spar.point_from_parameter(0.75, is_rel=True)
+        spar.set_u2(spar.cref.invert(p))
+        for size, expected in [(None, True), (100., True), (1., False)]:
+            part1 = serialize.loads(serialize.dumps(spar))
+            part2 = serialize.loads(serialize.dumps(spar))
+            self.assertEqual(part1.discard_by_cref(size), expected)
+            self.assertEqual(self.discard_by_cref_solids(part2, size),
+                             expected)
+            self.assertEqual(part1.shape.num_faces, part2.shape.num_faces)
+            areas1 = sorted(f.area for f in part1.shape.faces)
+            areas2 = sorted(f.area for f in part2.shape.faces)
+            for a1, a2 in zip(areas1, areas2):
+                self.assertAlmostEqual(a1, a2, places=5)
+        self.assertEqual(part1.shape.num_faces, 3)
+        part1 = serialize.loads(serialize.dumps(spar))
+        self.assertTrue(part1.discard_by_cref())
+        self.assertEqual(part1.shape.num_faces, 2)
+
+        # Only the inboard face touches the root of the spar
+        self.assertTrue(spar.discard_by_dmin(spar.cref.p1, 1.))
+        self.assertEqual(spar.shape.num_faces, 2)
+
+    def test_part_cut_holes(self):
+        n, d = 3, 1.
+        spar1 = SparByParameters('spar', 0.15, 0.15, 0.15, 0.5,
+                                 self.wing).part
+        spar2 = serialize.loads(serialize.dumps(spar1))
+        area = spar1.area
+
+        # All holes in one operation
+        self.assertTrue(spar1.cut_holes(n, d))
+        nholes = sum(len(f.wires) - 1 for f in spar1.shape.faces)
+        self.assertEqual(nholes, n)
+        self.assertAlmostEqual(area - spar1.area, n * pi * d ** 2 / 4.,
+                               delta=0.01 * n * pi * d ** 2 / 4.)
+
+        # Same result as cutting one hole at a time
+        pac = PointsAlongCurveByNumber(spar2.cref, n + 2)
+        for u in pac.parameters[1:-1]:
+            self.assertTrue(spar2.cut_hole(d, 0., u))
+        nholes = sum(len(f.wires) - 1 for f in spar2.shape.faces)
+        self.assertEqual(nholes, n)
+        self.assertAlmostEqual(spar1.area, spar2.area, places=3)
+
 
 class TestStructureCreate(unittest.TestCase):
     """
@@ -375,6 +508,56 @@ class TestStructureCreate(unittest.TestCase):
         for rib in builder.parts:
             self.assertIsInstance(rib, Rib)
 
+    def test_ribs_between_planes_batch(self):
+        builder = SparByParameters('fspar', 0.15, 0.15, 0.15, 0.5, self.wing)
+        fspar = builder.part
+        builder = SparByParameters('rspar', 0.65, 0.15, 0.65, 0.5, self.wing)
+        rspar = builder.part
+        pln1 = PlaneByAxes(fspar.cref.p1, 'xz').plane
+        pln2 = PlaneByAxes(fspar.cref.p2, 'xz').plane
+        ribs1 = RibsBetweenPlanesByNumber('rib', pln1, pln2, 5, fspar,
+                                          rspar, self.wing).parts
+        # Fail if the ribs are created one at a time
+        with mock.patch('afem.structure.create.SurfacePartBetweenShapes',
+                        side_effect=AssertionError('Batch was not used.')):
+            builder = RibsBetweenPlanesByNumber('rib', pln1, pln2, 5, fspar,
+                                                rspar, self.wing, batch=True)
+        self.assertEqual(builder.nparts, 5)
+        self.assertEqual(builder.next_index, 6)
+        for rib1, rib2 in zip(ribs1, builder.parts):
+            self.assertIsInstance(rib2, Rib)
+            self.assertEqual(rib1.name, rib2.name)
+            self.assertEqual(rib1.shape.num_faces, rib2.shape.num_faces)
+            self.assertAlmostEqual(rib1.cref.length, rib2.cref.length,
+                                   places=3)
+            self.assertAlmostEqual(rib1.area, rib2.area, places=2)
+
+    def test_ribs_between_planes_parallel(self):
+        builder = SparByParameters('fspar', 0.15, 0.15, 0.15, 0.5, self.wing)
+        fspar = builder.part
+        builder = SparByParameters('rspar', 0.65, 0.15, 0.65, 0.5, self.wing)
+        rspar = builder.part
+        pln1 = PlaneByAxes(fspar.cref.p1, 'xz').plane
+        pln2 = PlaneByAxes(fspar.cref.p2, 'xz').plane
+        ribs1 = RibsBetweenPlanesByNumber('rib', pln1, pln2, 5, fspar,
+                                          rspar, self.wing).parts
+        builder = RibsBetweenPlanesByNumber('rib', pln1, pln2, 5, fspar,
+                                            rspar, self.wing, parallel=True)
+        self.assertEqual(builder.nparts, 5)
+        self.assertEqual(builder.next_index, 6)
+        ribs2 = builder.parts
+        self.assertEqual([r.id for r in ribs2],
+                         list(range(ribs1[-1].id + 1, ribs1[-1].id + 6)))
+        for rib1, rib2 in zip(ribs1, ribs2):
+            self.assertIsInstance(rib2, Rib)
+            self.assertEqual(rib1.name, rib2.name)
+            self.assertEqual(rib1.shape.num_faces, rib2.shape.num_faces)
+            self.assertEqual(rib1.shape.num_edges, rib2.shape.num_edges)
+            self.assertEqual(rib1.shape.num_vertices,
+                             rib2.shape.num_vertices)
+            self.assertAlmostEqual(rib1.cref.length, rib2.cref.length,
+                                   places=6)
+
     def test_ribs_along_curve_and_surface_by_distance(self):
         builder = SparByParameters('fspar', 0.15, 0.15, 0.15, 0.5, self.wing)
         fspar = builder.part
@@ -446,5 +629,363 @@ class TestStructureCreate(unittest.TestCase):
         self.assertIsInstance(skin, Skin)
 
 
+class TestStructureGroup(unittest.TestCase):
+    """
+    Test cases for afem.structure.group.
+    """
+
+    def setUp(self):
+        self.group = GroupAPI.create_group('beams')
+        self.beams = []
+        for i in range(10):
+            x = 10. * i
+            beam = Beam1DByPoints('beam' + str(i), (x, 0., 0.),
+                                  (x, 10., 0.)).part
+            self.beams.append(beam)
+
+    def tearDown(self):
+        GroupAPI.reset()
+
+    def test_query_box(self):
+        bbox = BBox()
+        bbox.add_pnt((15., 5., 0.))
+        bbox.add_pnt((35., 6., 1.))
+        parts = self.group.query_box(bbox)
+        self.assertListEqual(parts, self.beams[2:4])
+
+    def test_query_plane(self):
+        pln = PlaneByAxes((40., 0., 0.), 'yz').plane
+        parts = self.group.query_plane(pln)
+        self.assertListEqual(parts, [self.beams[4]])
+
+    def test_query_ray(self):
+        parts = self.group.query_ray((100., 5., 0.), (-1., 0., 0.))
+        self.assertListEqual(parts, self.beams[::-1])
+
+    def test_query_nearest(self):
+        parts, dist = self.group.query_nearest((52., 20., 0.), 2)
+        self.assertListEqual(parts, [self.beams[5], self.beams[6]])
+        self.assertAlmostEqual(dist[0], 10.198, places=3)
+
+    def test_query_after_set_shape(self):
+        e = EdgeByPoints((0., 0., 50.), (0., 10., 50.)).edge
+        self.beams[0].set_shape(e)
+        parts, _ = self.group.query_nearest((0., 5., 50.))
+        self.assertListEqual(parts, [self.beams[0]])
+        bbox = BBox()
+        bbox.add_pnt((-1., 0., -1.))
+        bbox.add_pnt((1., 10., 1.))
+        self.assertListEqual(self.group.query_box(bbox), [])
+
+    def test_get_part(self):
+        beam = self.beams[3]
+        self.assertIs(self.group.get_part('beam3'), beam)
+        self.assertIs(self.group.get_part_by_id(beam.id), beam)
+        beam.set_name('renamed')
+        self.assertIs(self.group.get_part('renamed'), beam)
+        self.assertRaises(KeyError, self.group.get_part, 'beam3')
+        self.group.remove_part('renamed')
+        self.assertRaises(KeyError, self.group.get_part, 'renamed')
+        self.assertRaises(KeyError, self.group.get_part_by_id, beam.id)
+
+    def test_get_parts(self):
+        parts = self.group.get_parts(order=True)
+        self.assertListEqual(parts, self.beams)
+        self.assertListEqual(self.group.get_parts(rtype=Beam1D, order=True),
+                             self.beams)
+        self.assertListEqual(self.group.get_parts(rtype=SurfacePart), [])
+        # Cached lists are updated when parts are added or removed
+        parts.pop()
+        self.assertEqual(len(self.group.get_parts()), 10)
+        subgroup = self.group.create_subgroup('sub')
+        beam = Beam1DByPoints('sub beam', (0., 0., 10.), (0., 10., 10.)).part
+        self.assertIn(beam, self.group.get_parts())
+        self.assertNotIn(beam, self.group.get_parts(False))
+        subgroup.remove_part('sub beam')
+        self.assertNotIn(beam, self.group.get_parts())
+
+    def test_get_shape(self):
+        shape = self.group.get_shape()
+        self.assertEqual(shape.num_edges, 10)
+        self.assertIs(self.group.get_shape(), shape)
+        edges = self.beams[0].edge_compound
+        self.assertIs(self.beams[0].edge_compound, edges)
+
+        # Setting a part shape invalidates the cached compounds
+        version = self.beams[0].version
+        e = EdgeByPoints((0., 0., 50.), (0., 10., 50.)).edge
+        self.beams[0].set_shape(e)
+        self.assertEqual(self.beams[0].version, version + 1)
+        self.assertIsNot(self.beams[0].edge_compound, edges)
+        new_shape = self.group.get_shape()
+        self.assertIsNot(new_shape, shape)
+        self.assertTrue(new_shape.shared_edges(e))
+
+    def test_check_group(self):
+        check = CheckGroup(self.group, parallel=True, max_workers=2)
+        self.assertTrue(check.is_valid)
+        self.assertListEqual(check.invalid_parts, [])
+        self.assertEqual(check.report.size, 0)
+
+    def test_query_subgroup(self):
+        subgroup = self.group.create_subgroup('sub')
+        beam = Beam1DByPoints('sub beam', (0., 0., 10.), (0., 10., 10.)).part
+        self.assertIn(beam, subgroup.parts)
+        pln = PlaneByAxes((0., 0., 0.), 'yz').plane
+        parts = self.group.query_plane(pln)
+        self.assertListEqual(parts, [self.beams[0], beam])
+        parts = self.group.query_plane(pln, include_subgroup=False)
+        self.assertListEqual(parts, [self.beams[0]])
+
+
+class TestStructureJoin(unittest.TestCase):
+    """
+    Test cases for afem.structure.join.
+    """
+
+    def setUp(self):
+        self.group1 = GroupAPI.create_group('beams')
+        self.beams1 = []
+        for x in (0., 20.):
+            beam = Beam1DByPoints('beam', (x, 0., 0.), (x, 10., 0.)).part
+            self.beams1.append(beam)
+        self.group2 = GroupAPI.create_group('cross beams')
+        self.beams2 = []
+        for x in (0., 20.):
+            beam = Beam1DByPoints('cross beam', (x - 1., 5., 0.),
+                                  (x + 1., 5., 0.)).part
+            self.beams2.append(beam)
+
+    def tearDown(self):
+        GroupAPI.reset()
+
+    def test_fuse_groups(self):
+        fuse = FuseGroups([self.group1, self.group2])
+        self.assertTrue(fuse.is_done)
+        for beam in self.beams1 + self.beams2:
+            self.assertEqual(beam.shape.num_edges, 2)
+
+    def test_fuse_groups_partition(self):
+        fuse = FuseGroups([self.group1, self.group2], partition=True)
+        self.assertTrue(fuse.is_done)
+        for beam in self.beams1 + self.beams2:
+            self.assertEqual(beam.shape.num_edges, 2)
+        self.assertEqual(fuse.shape.num_edges, 8)
+
+    def test_fuse_new_parts(self):
+        FuseGroups([self.group1, self.group2])
+        parts = self.beams1 + self.beams2
+        beam = Beam1DByPoints('new beam', (-1., 2., 0.), (1., 2., 0.)).part
+        fuse = FuseNewParts(parts, [beam])
+        self.assertTrue(fuse.is_done)
+        self.assertListEqual(fuse.neighbors, [self.beams1[0]])
+        self.assertEqual(self.beams1[0].shape.num_edges, 3)
+        self.assertEqual(beam.shape.num_edges, 2)
+
+        # Same as fusing all the parts again
+        v = self.beams1[0].shape.shared_vertices(self.beams2[0].shape)
+        self.assertEqual(len(v), 1)
+        v = self.beams1[0].shape.shared_vertices(beam.shape)
+        self.assertEqual(len(v), 1)
+        shapes = [part.shape for part in parts + [beam]]
+        self.assertEqual(CompoundByShapes(shapes).compound.num_edges, 11)
+
+    def test_cut_parts(self):
+        box = BoxBy2Points((-2., -1., -1.), (22., 3., 1.)).solid
+        parts = self.beams1 + self.beams2
+        cut = CutParts(parts, box)
+        for beam in self.beams1:
+            self.assertTrue(cut.was_cut(beam))
+            self.assertEqual(cut.path(beam), CutParts.COMBINED)
+            self.assertAlmostEqual(beam.length, 7., places=5)
+        for beam in self.beams2:
+            self.assertFalse(cut.was_cut(beam))
+            self.assertEqual(cut.path(beam), CutParts.SKIPPED)
+            self.assertAlmostEqual(beam.length, 2., places=5)
+        self.assertEqual(cut.nbops, 1)
+
+
+class TestStructureJoinWing(unittest.TestCase):
+    """
+    Test cases for afem.structure.join using spars and ribs of a wing.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        shape = brep.read_brep('./test_io/rhs_wing.brep')
+        cls.wing = Body(shape, 'wing')
+        face = brep.read_brep('./test_io/rhs_wing_sref.brep')
+        cls.wing.set_sref(face.surface)
+
+    def tearDown(self):
+        GroupAPI.reset()
+
+    def build_parts(self):
+        fspar = SparByParameters('fspar', 0.15, 0.1, 0.15, 0.5,
+                                 self.wing).part
+        rspar = SparByParameters('rspar', 0.65, 0.1, 0.65, 0.5,
+                                 self.wing).part
+        ribs = []
+        for i, d in enumerate([0.25, 0.75]):
+            p1 = fspar.point_from_parameter(d, is_rel=True)
+            p2 = rspar.point_from_parameter(d, is_rel=True)
+            rib = RibByPoints('rib {}'.format(i + 1), p1, p2, self.wing).part
+            ribs.append(rib)
+        return [fspar, rspar] + ribs
+
+    def build_bays(self):
+        parts = []
+        for i, (v1, v2) in enumerate([(0.1, 0.3), (0.6, 0.9)]):
+            fspar = SparByParameters('fspar', 0.15, v1, 0.15, v2,
+                                     self.wing).part
+            rspar = SparByParameters('rspar', 0.65, v1, 0.65, v2,
+                                     self.wing).part
+            p1 = fspar.point_from_parameter(0.5, is_rel=True)
+            p2 = rspar.point_from_parameter(0.5, is_rel=True)
+            rib = RibByPoints('rib {}'.format(i + 1), p1, p2, self.wing).part
+            parts += [fspar, rspar, rib]
+        return parts
+
+    @staticmethod
+    def fused_topology(parts):
+        shared = []
+        for i, part1 in enumerate(parts):
+            for part2 in parts[i + 1:]:
+                shared.append(len(part1.shared_edges(part2)))
+        shapes = [part.shape for part in parts]
+        shape = CompoundByShapes(shapes).compound
+        nfree = len(ExploreFreeEdges(shape).free_edges)
+        return shared, nfree
+
+    def test_fuse_cached(self):
+        path = tempfile.mkdtemp()
+        BopCache.set_enabled(True, path)
+        try:
+            parts = self.build_parts()
+            fuse = FuseSurfaceParts(parts[:2], parts[2:])
+            self.assertTrue(fuse.is_done)
+            shared1, nfree1 = self.fused_topology(parts)
+            GroupAPI.reset()
+
+            parts = self.build_parts()
+            hits = BopCache.hits
+            fuse = FuseSurfaceParts(parts[:2], parts[2:])
+            self.assertTrue(fuse.is_done)
+            self.assertEqual(BopCache.hits, hits + 1)
+            shared2, nfree2 = self.fused_topology(parts)
+
+            # Each spar shares edges with each rib
+            for n in shared1[1:5]:
+                self.assertGreater(n, 0)
+            self.assertListEqual(shared2, shared1)
+            self.assertEqual(nfree2, nfree1)
+        finally:
+            BopCache.clear()
+            BopCache.set_enabled(False)
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_fuse_partition_parallel(self):
+        parts = self.build_bays()
+        fuse = FuseSurfaceParts(parts[:1], parts[1:])
+        self.assertTrue(fuse.is_done)
+        shared1, nfree1 = self.fused_topology(parts)
+        GroupAPI.reset()
+
+        # Each bay is a cluster fused in a worker process
+        parts = self.build_bays()
+        fuse = FuseSurfaceParts(parts[:1], parts[1:], partition=True,
+                                parallel=True)
+        self.assertTrue(fuse.is_done)
+        shared2, nfree2 = self.fused_topology(parts)
+        for rib, spars in [(parts[2], parts[:2]), (parts[5], parts[3:5])]:
+            for spar in spars:
+                self.assertGreater(len(rib.shared_edges(spar)), 0)
+        self.assertListEqual(shared2, shared1)
+        self.assertEqual(nfree2, nfree1)
+
+    def test_fuse_by_cref(self):
+        fspar, rspar, rib1, rib2 = self.build_parts()
+        with self.assertLogs('afem', level='INFO') as logs:
+            fuse = FuseSurfacePartsByCref([fspar, rspar, rib1, rib2])
+        self.assertTrue(fuse.is_done)
+        joints = [msg for msg in logs.output if 'Found joint' in msg]
+        self.assertEqual(len(joints), 4)
+
+        # Each spar shares edges with each rib and no others
+        for spar in [fspar, rspar]:
+            for rib in [rib1, rib2]:
+                self.assertGreater(len(spar.shared_edges(rib)), 0)
+        self.assertEqual(len(fspar.shared_edges(rspar)), 0)
+        self.assertEqual(len(rib1.shared_edges(rib2)), 0)
+
+
+class TestStructureModel(unittest.TestCase):
+    """
+    Test cases for afem.structure.model.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        shape = brep.read_brep('./test_io/rhs_wing.brep')
+        cls.wing = Body(shape, 'wing')
+        face = brep.read_brep('./test_io/rhs_wing_sref.brep')
+        cls.wing.set_sref(face.surface)
+
+    def tearDown(self):
+        GroupAPI.reset()
+
+    def test_rebuild(self):
+        model = Model()
+        fspar = model.build(SparByParameters, 'fspar', 0.15, 0.1, 0.15, 0.5,
+                            self.wing)
+        rspar = model.build(SparByParameters, 'rspar', 0.65, 0.1, 0.65, 0.5,
+                            self.wing)
+        spars = fspar.parts + rspar.parts
+        ribs = []
+        for i, v in enumerate([0.2, 0.3, 0.4]):
+            rib = model.build(RibBetweenShapes, 'rib {}'.format(i + 1),
+                              spars[0], spars[1], self.wing,
+                              PlaneByAxes((0., v * 200., 0.), 'xz').plane)
+            ribs.append(rib)
+        parts = spars + [rib.parts[0] for rib in ribs]
+        fuse = model.apply(FuseSurfaceParts, parts, parts)
+        self.assertEqual(len(model.steps), 6)
+        self.assertEqual(model.steps_of(parts[0]), [fspar, fuse])
+
+        ids = [part.id for part in parts]
+        nparts = len(GroupAPI.get_parts())
+        ribs[1].update('rib 2', spars[0], spars[1], self.wing,
+                       PlaneByAxes((0., 70., 0.), 'xz').plane)
+        rebuilt = model.rebuild([ribs[1]])
+        self.assertEqual(rebuilt, [ribs[1], fuse])
+        self.assertEqual([part.id for part in parts], ids)
+        self.assertEqual(len(GroupAPI.get_parts()), nparts)
+        self.assertTrue(fuse.result.is_done)
+
+        rebuilt = model.rebuild()
+        self.assertEqual(len(rebuilt), 6)
+
+    def test_rebuild_part_method(self):
+        model = Model()
+        fspar = model.build(SparByParameters, 'fspar', 0.15, 0.1, 0.15, 0.5,
+                            self.wing)
+        rspar = model.build(SparByParameters, 'rspar', 0.65, 0.1, 0.65, 0.5,
+                            self.wing)
+        spars = fspar.parts + rspar.parts
+        rib = model.build(RibBetweenShapes, 'rib', spars[0], spars[1],
+                          self.wing,
+                          PlaneByAxes((0., 60., 0.), 'xz').plane)
+        part = rib.parts[0]
+        discard = model.apply(part.discard_by_dmax, part.cref, 10.)
+        self.assertEqual(discard.parts, [part])
+        self.assertEqual(model.steps_of(part), [rib, discard])
+
+        rib.update('rib', spars[0], spars[1], self.wing,
+                   PlaneByAxes((0., 70., 0.), 'xz').plane)
+        rebuilt = model.rebuild([rib])
+        self.assertEqual(rebuilt, [rib, discard])
+        self.assertEqual(model.steps_of(part), [rib, discard])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -16,11 +16,26 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import asyncio
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
 import unittest
+from math import pi
+from unittest import mock
 
-from afem.exchange import brep
+from OCC.Core.BRepCheck import BRepCheck_NotClosed
+
+from afem import aio
+from afem.exchange import brep, serialize
 from afem.geometry import *
 from afem.graphics import Viewer
+from afem.misc.profiler import Profiler
+from afem.misc.progress import (OperationCancelled, OperationTimeout,
+                                ProgressMonitor, run_isolated)
 from afem.topology import *
 
 
@@ -30,6 +45,167 @@ def show_shapes(*shapes):
     gui.start()
 
 
+def hang(*args):
+    """
+    Stand-in for an isolated operation that does not finish.
+    """
+    time.sleep(60.)
+
+
+class TestTopologyEntities(unittest.TestCase):
+    """
+    Test cases for afem.topology.entities.
+    """
+
+    def test_pickle_shape(self):
+        solid = BoxBySize(10., 10., 10.).solid
+        solid2 = pickle.loads(pickle.dumps(solid))
+        self.assertIsInstance(solid2, Solid)
+        self.assertAlmostEqual(solid2.volume, 1000.)
+        self.assertEqual(solid2.num_faces, 6)
+        self.assertEqual(solid2.num_edges, 12)
+
+    def test_serialize_shared_shapes(self):
+        solid = BoxBySize(10., 10., 10.).solid
+        face = solid.faces[0]
+        solid2, face2 = serialize.loads(serialize.dumps([solid, face]))
+        self.assertIsInstance(solid2, Solid)
+        self.assertIn(face2, solid2.faces)
+        face3 = pickle.loads(pickle.dumps(face))
+        self.assertNotIn(face3, solid2.faces)
+
+    def test_serialize_size_and_time(self):
+        shape = brep.read_brep('./test_io/rhs_wing.brep')
+        path = tempfile.mkdtemp()
+        fn = os.path.join(path, 'wing.brep')
+        try:
+            # Best of a few round trips through a BRep file
+            file_times = []
+            for _ in range(3):
+                start = time.perf_counter()
+                brep.write_brep(shape, fn)
+                shape1 = brep.read_brep(fn)
+                file_times.append(time.perf_counter() - start)
+            file_size = os.path.getsize(fn)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+        # Best of a few round trips through bytes
+        data_times = []
+        for _ in range(3):
+            start = time.perf_counter()
+            data = serialize.dumps(shape)
+            shape2 = serialize.loads(data)
+            data_times.append(time.perf_counter() - start)
+
+        self.assertEqual(shape2.num_faces, shape1.num_faces)
+        self.assertAlmostEqual(shape2.area, shape1.area, places=3)
+
+        # The ASCII shape set is no larger than the BRep file and the round
+        # trip is not slower
+        self.assertLessEqual(len(data), 1.05 * file_size)
+        self.assertLessEqual(min(data_times), 1.5 * min(file_times) + 0.05)
+
+    def test_fingerprint(self):
+        box1 = BoxBySize(10., 10., 10.).solid
+        box2 = BoxBySize(10., 10., 10.).solid
+        box3 = BoxBySize(10., 10., 5.).solid
+        box4 = pickle.loads(pickle.dumps(box1))
+        self.assertNotEqual(box1.hash_code, box2.hash_code)
+        self.assertEqual(box1.fingerprint(), box2.fingerprint())
+        self.assertNotEqual(box1.fingerprint(), box3.fingerprint())
+        self.assertEqual(box1.fingerprint(), box4.fingerprint())
+
+        # Changing a tolerance in place changes the fingerprint
+        fp = box1.fingerprint()
+        FixShape.set_tolerance(box1, 1.0e-3)
+        self.assertNotEqual(box1.fingerprint(), fp)
+
+
+class TestTopologyCheck(unittest.TestCase):
+    """
+    Test cases for afem.topology.check.
+    """
+
+    def test_check_shape(self):
+        solid = BoxBySize(10., 10., 10.).solid
+        check = CheckShape(solid)
+        self.assertTrue(check.is_valid)
+        self.assertEqual(check.report.size, 0)
+        self.assertListEqual(check.invalid_shapes, [])
+
+    def test_check_shape_parallel(self):
+        solid1 = BoxBySize(10., 10., 10.).solid
+        solid2 = BoxBy2Points((20., 0., 0.), (30., 10., 10.)).solid
+        cmp = CompoundByShapes([solid1, solid2]).compound
+        check = CheckShape(cmp, parallel=True, max_workers=2)
+        self.assertTrue(check.is_valid)
+        self.assertEqual(check.report.size, 0)
+        self.assertTrue(check.is_subshape_valid(solid1))
+
+    def test_check_shape_invalid(self):
+        # A face with an open wire next to a valid solid
+        wire = WireByPoints([(0., 0., 0.), (10., 0., 0.),
+                             (10., 10., 0.)]).wire
+        face = FaceByPlanarWire(wire).face
+        solid = BoxBy2Points((20., 0., 0.), (30., 10., 10.)).solid
+        cmp = CompoundByShapes([solid, face]).compound
+
+        check = CheckShape(cmp)
+        self.assertFalse(check.is_valid)
+        self.assertGreater(check.report.size, 0)
+        self.assertFalse(check.is_subshape_valid(face))
+        self.assertTrue(check.is_subshape_valid(solid))
+
+        # Each row refers to a sub-shape of its type and the open wire is
+        # reported as not closed
+        for i, type_, status in check.report.tolist():
+            sub_shape = check.sub_shape(i)
+            self.assertEqual(type_, int(sub_shape.shape_type))
+            self.assertNotEqual(sub_shape, cmp)
+            self.assertNotIn(sub_shape, [solid] + solid.faces)
+        wire = face.wires[0]
+        rows = [row for row in check.report.tolist()
+                if check.sub_shape(row[0]) == wire]
+        self.assertIn((int(wire.shape_type), int(BRepCheck_NotClosed)),
+                      [row[1:] for row in rows])
+
+        # Same report when the members are checked in worker processes
+        check2 = CheckShape(cmp, parallel=True, max_workers=2)
+        self.assertFalse(check2.is_valid)
+        self.assertListEqual(check2.report.tolist(), check.report.tolist())
+        self.assertListEqual(check2.invalid_shapes, check.invalid_shapes)
+
+    def test_classify_points_in_solid(self):
+        solid = BoxBySize(10., 10., 10.).solid
+        pnts = [(5., 5., 5.), (5., 5., 10.), (5., 5., 20.), (-1., 5., 5.),
+                (0.5, 9.5, 0.5)]
+        tool = ClassifyPointsInSolid(solid, pnts)
+        states = tool.states
+        self.assertEqual(states[0], ClassifyPointsInSolid.IN)
+        self.assertEqual(states[1], ClassifyPointsInSolid.ON)
+        self.assertEqual(states[2], ClassifyPointsInSolid.OUT)
+        self.assertEqual(states[3], ClassifyPointsInSolid.OUT)
+        self.assertEqual(states[4], ClassifyPointsInSolid.IN)
+        self.assertListEqual(tool.is_in.tolist(),
+                             [True, False, False, False, True])
+
+    def test_classify_points_matches_exact(self):
+        solid = BoxBySize(10., 10., 10.).solid
+        pnts = [(x, y, z) for x in range(-2, 13, 3) for y in range(-2, 13, 3)
+                for z in range(-2, 13, 3)]
+        states = ClassifyPointsInSolid(solid, pnts).states
+        tool = ClassifyPointInSolid(solid)
+        for pnt, state in zip(pnts, states):
+            tool.perform(pnt)
+            if tool.is_in:
+                self.assertEqual(state, ClassifyPointsInSolid.IN)
+            elif tool.is_out:
+                self.assertEqual(state, ClassifyPointsInSolid.OUT)
+            else:
+                self.assertEqual(state, ClassifyPointsInSolid.ON)
+
+
 class TestTopologyCreate(unittest.TestCase):
     """
     Test cases for afem.topology.create.
@@ -397,6 +573,90 @@ class TestTopologyBop(unittest.TestCase):
         split.build()
         self.assertTrue(split.is_done)
 
+    def test_bop_cache(self):
+        path = tempfile.mkdtemp()
+        BopCache.set_enabled(True, path)
+        try:
+            box1 = BoxBySize(10., 10., 10.).solid
+            box2 = BoxBySize(5., 5., 5.).solid
+            cut1 = CutShapes(box1, box2)
+            self.assertFalse(cut1.is_cached)
+            self.assertGreater(BopCache.size(), 0)
+
+            # Equivalent but distinct shapes use the cached result
+            box3 = BoxBySize(10., 10., 10.).solid
+            box4 = BoxBySize(5., 5., 5.).solid
+            cut2 = CutShapes(box3, box4)
+            self.assertTrue(cut2.is_cached)
+            self.assertTrue(cut2.is_done)
+            self.assertAlmostEqual(cut1.shape.volume, cut2.shape.volume)
+            for f1, f2 in zip(box1.faces, box3.faces):
+                self.assertEqual(len(cut1.modified(f1)),
+                                 len(cut2.modified(f2)))
+                self.assertEqual(cut1.is_deleted(f1), cut2.is_deleted(f2))
+
+            # Eviction
+            BopCache.set_max_size(0)
+            self.assertEqual(BopCache.size(), 0)
+        finally:
+            BopCache.clear()
+            BopCache.set_max_size(1024 ** 3)
+            BopCache.set_enabled(False)
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_profiler(self):
+        Profiler.clear()
+        Profiler.enable()
+        try:
+            box1 = BoxBySize(10., 10., 10.).solid
+            box2 = BoxBySize(5., 5., 5.).solid
+            fuse = FuseShapes(box1, box2)
+            self.assertTrue(fuse.is_done)
+        finally:
+            Profiler.disable()
+        FuseShapes(box1, box2)
+
+        records = Profiler.records()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['op'], 'FuseShapes')
+        self.assertEqual(records[0]['outcome'], 'done')
+        self.assertEqual(records[0]['nfaces'], 12)
+        self.assertIn('test_topology.py', records[0]['site'])
+        self.assertEqual(Profiler.summary()['FuseShapes']['count'], 1)
+
+        path = tempfile.mkdtemp()
+        try:
+            fn = os.path.join(path, 'trace.json')
+            Profiler.export_chrome_trace(fn)
+            with open(fn) as f:
+                self.assertEqual(len(json.load(f)['traceEvents']), 1)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+            Profiler.clear()
+
+    def test_progress(self):
+        box1 = BoxBySize(10., 10., 10.).solid
+        box2 = BoxBySize(5., 5., 5.).solid
+
+        # Build in a separate process with a timeout
+        fuse = FuseShapes()
+        fuse.set_args([box1])
+        fuse.set_tools([box2])
+        fuse.build(timeout=60.)
+        self.assertTrue(fuse.is_done)
+        self.assertTrue(fuse.shape.is_valid)
+
+        # Cancelled by the callback
+        monitor = ProgressMonitor(lambda fraction, msg: False)
+        fuse = FuseShapes()
+        fuse.set_args([box1])
+        fuse.set_tools([box2])
+        self.assertRaises(OperationCancelled, fuse.build, monitor)
+
+        # Hard timeout
+        self.assertRaises(OperationTimeout, run_isolated, time.sleep, (10.,),
+                          timeout=0.5)
+
     def test_cut_cylindrical_hole(self):
         pln = PlaneByAxes().plane
         face = FaceByPlane(pln, -2., 2., -2., 2.).face
@@ -407,6 +667,17 @@ class TestTopologyBop(unittest.TestCase):
         cut = CutCylindricalHole(face, 1., ax1)
         self.assertTrue(cut.is_done)
 
+    def test_cut_cylindrical_holes(self):
+        pln = PlaneByAxes().plane
+        face = FaceByPlane(pln, -5., 5., -2., 2.).face
+        d = Direction(0., 1., 0.)
+        axes = [Axis1(Point(-2., 0., 0.), d), Axis1(Point(2., 0., 0.), d)]
+        cut = CutCylindricalHoles(face, 1., axes)
+        self.assertTrue(cut.is_done)
+        self.assertEqual(len(cut.cylinders), 2)
+        area = SurfaceProps(cut.shape).area
+        self.assertAlmostEqual(area, 40. - 2. * pi, places=3)
+
     def test_local_split(self):
         pln = PlaneByAxes().plane
         builder = SolidByPlane(pln, 5., 5., 5.)
@@ -520,6 +791,71 @@ class TestTopologyBop(unittest.TestCase):
         self.assertEqual(len(section.vertices), 2)
 
 
+class TestTopologyParallel(unittest.TestCase):
+    """
+    Test cases for afem.topology.parallel.
+    """
+
+    def test_bop_executor(self):
+        box = BoxBySize(10., 10., 10.).solid
+        executor = BopExecutor({'box': box}, max_workers=2)
+        for z in (2., 4., 6.):
+            pln = PlaneByAxes((0., 0., z), 'xy').plane
+            face = FaceByPlane(pln, -20., 20., -20., 20.).face
+            executor.add('common', face, 'box')
+        results = executor.run()
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertTrue(result.is_done)
+            self.assertIsNone(result.error)
+            self.assertAlmostEqual(result.shape.area, 100., places=5)
+        self.assertGreater(executor.wall_time, 0.)
+
+        # Same results in this process
+        results = executor.run(False)
+        for result in results:
+            self.assertAlmostEqual(result.shape.area, 100., places=5)
+
+    def test_aio_bop(self):
+        box1 = BoxBySize(10., 10., 10.).solid
+        box2 = BoxBySize(5., 5., 5.).solid
+        events = []
+
+        def progress(fraction, msg):
+            events.append(fraction)
+
+        loop = asyncio.new_event_loop()
+        try:
+            shape = loop.run_until_complete(
+                aio.bop('fuse', box1, box2, progress))
+        finally:
+            loop.close()
+        self.assertTrue(shape.is_valid)
+        self.assertAlmostEqual(shape.volume, 1000., places=5)
+        self.assertEqual(events[-1], 1.)
+
+
+class TestTopologySpatial(unittest.TestCase):
+    """
+    Test cases for afem.topology.spatial.
+    """
+
+    def setUp(self):
+        self.boxes = [(0., 0., 0., 1., 1., 1.),
+                      (0.5, 0.5, 0.5, 2., 2., 2.),
+                      (1.5, 1.5, 1.5, 3., 3., 3.),
+                      (5., 5., 5., 6., 6., 6.),
+                      (0.5, 5., 0., 1., 6., 1.)]
+
+    def test_box_pairs(self):
+        pairs = box_pairs(self.boxes)
+        self.assertListEqual(pairs, [(0, 1), (1, 2)])
+
+    def test_box_clusters(self):
+        clusters = box_clusters(self.boxes)
+        self.assertListEqual(clusters, [[0, 1, 2], [3], [4]])
+
+
 class TestTopologyDistance(unittest.TestCase):
     """
     Test cases for afem.topoloy.distance.
@@ -588,6 +924,24 @@ class TestTopologyModify(unittest.TestCase):
         shape = tool.sewed_shape
         self.assertEqual(len(shape.faces), 3)
 
+    def test_sew_shape_timeout(self):
+        box = BoxBySize(10., 10., 10.).solid
+        tool = SewShape()
+        for face in box.faces:
+            tool.add(face)
+
+        # Sewed in a separate process and restored here
+        tool.perform(timeout=60.)
+        shape = tool.sewed_shape
+        self.assertTrue(shape.is_shell)
+        self.assertEqual(shape.num_faces, 6)
+        self.assertEqual(tool.n_free_edges, 0)
+        face = tool.modified(box.faces[0])
+        self.assertIn(face, shape.faces)
+
+        with mock.patch('afem.topology.modify._isolated_sew', hang):
+            self.assertRaises(OperationTimeout, tool.perform, None, 0.5)
+
     def test_rebuild_shape_by_tool(self):
         pln1 = PlaneByAxes(axes='xy').plane
         box1 = SolidByPlane(pln1, 10., 10., 10.).solid
@@ -601,6 +955,47 @@ class TestTopologyModify(unittest.TestCase):
         shape = FixShape(new_shape).shape
         self.assertTrue(shape.is_shell)
 
+    def test_fix_shape_timeout(self):
+        box = BoxBySize(10., 10., 10.).solid
+
+        # Fixed in a separate process and restored here
+        fix = FixShape(box, timeout=60.)
+        self.assertTrue(fix.shape.is_solid)
+        self.assertAlmostEqual(fix.shape.volume, 1000.)
+        self.assertIn(fix.apply(box.faces[0]), fix.shape.faces)
+
+        with mock.patch('afem.topology.fix._isolated_fix', hang):
+            self.assertRaises(OperationTimeout, FixShape, box, timeout=0.5)
+
+        # Time budget of a monitor
+        monitor = ProgressMonitor(timeout=0.5)
+        with mock.patch('afem.topology.fix._isolated_fix', hang):
+            self.assertRaises(OperationTimeout, FixShape, box,
+                              monitor=monitor)
+
+    def test_rebuild_shapes_by_tool(self):
+        box = BoxBySize(10., 10., 10.).solid
+        faces = box.faces
+        pln = PlaneByAxes((0., 0., 5.), 'xy').plane
+        face = FaceByPlane(pln, -1., 11., -1., 11.).face
+        split = SplitShapes()
+        split.set_args(faces)
+        split.set_tools([face])
+        split.build()
+        self.assertTrue(split.is_done)
+
+        rebuild = RebuildShapesByTool(faces, split)
+        new_shapes = [rebuild.new_shape(f) for f in faces]
+        nfaces = sorted([shape.num_faces for shape in new_shapes])
+        self.assertListEqual(nfaces, [1, 1, 2, 2, 2, 2])
+        # Unchanged faces are not rebuilt
+        for old_shape, new_shape in zip(faces, new_shapes):
+            if new_shape.num_faces == 1:
+                self.assertTrue(new_shape.is_same(old_shape))
+        # Split edges are shared between adjacent faces
+        compound = CompoundByShapes(new_shapes).compound
+        self.assertEqual(compound.num_edges, 20)
+
 
 class TestTopologyOffset(unittest.TestCase):
     """
@@ -623,6 +1018,25 @@ class TestTopologyOffset(unittest.TestCase):
         loft = LoftShape([wire1, wire2])
         self.assertTrue(loft.is_done)
 
+    def test_loft_shape_timeout(self):
+        pnts1 = [(0., 0., 0.), (5., 0., 5.), (10., 0., 0.)]
+        wire1 = WireByPoints(pnts1).wire
+        pnts2 = [(0., 10., 0.), (5., 10., -5.), (10., 10., 0.)]
+        wire2 = WireByPoints(pnts2).wire
+
+        # Lofted in a separate process and restored here
+        loft1 = LoftShape([wire1, wire2], make_ruled=True)
+        loft2 = LoftShape([wire1, wire2], make_ruled=True, timeout=60.)
+        self.assertTrue(loft2.is_done)
+        self.assertEqual(loft2.shape.num_faces, loft1.shape.num_faces)
+        self.assertAlmostEqual(loft2.shape.area, loft1.shape.area, places=5)
+        face = loft2.generated_face(wire1.edges[0])
+        self.assertIn(face, loft2.shape.faces)
+
+        with mock.patch('afem.topology.offset._isolated_loft', hang):
+            self.assertRaises(OperationTimeout, LoftShape, [wire1, wire2],
+                              timeout=0.5)
+
 
 class TestTopologyProps(unittest.TestCase):
     """
@@ -659,6 +1073,38 @@ class TestTopologyProps(unittest.TestCase):
         self.assertAlmostEqual(p.y, 0.5)
         self.assertAlmostEqual(p.z, 0.5)
 
+    def test_props_cache(self):
+        PropsCache.clear()
+        e = EdgeByPoints((0., 0., 0.), (1., 0., 0.)).edge
+        self.assertAlmostEqual(e.length, 1.)
+        self.assertAlmostEqual(e.length, 1.)
+        self.assertEqual(PropsCache.misses, 1)
+        self.assertEqual(PropsCache.hits, 1)
+        PropsCache.invalidate(e)
+        self.assertAlmostEqual(e.length, 1.)
+        self.assertEqual(PropsCache.misses, 2)
+
+        # Changing the properties of one wrapper does not change the cache
+        props = LinearProps(e)
+        props._props.Add(LinearProps(e)._props)
+        self.assertAlmostEqual(props.length, 2.)
+        self.assertAlmostEqual(LinearProps(e).length, 1.)
+
+    def test_mass_properties_table(self):
+        e = EdgeByPoints((0., 0., 0.), (1., 0., 0.)).edge
+        f = FaceByDrag(e, (0., 1., 0.)).face
+        solid = SolidByDrag(f, (0., 0., 1.)).solid
+        table = MassPropertiesTable([e, f, solid])
+        self.assertEqual(table.length.shape, (3,))
+        self.assertAlmostEqual(table.length[0], 1.)
+        self.assertAlmostEqual(table.area[1], 1.)
+        self.assertAlmostEqual(table.area[2], 6.)
+        self.assertAlmostEqual(table.volume[2], 1.)
+        self.assertAlmostEqual(table.volume[1], 0.)
+        self.assertAlmostEqual(table.cg[1, 1], 0.5)
+        self.assertAlmostEqual(table.cg[2, 2], 0.5)
+        self.assertEqual(table.inertia.shape, (3, 3, 3))
+
 
 if __name__ == '__main__':
     unittest.main()